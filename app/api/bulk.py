@@ -0,0 +1,79 @@
+import csv
+import json
+from typing import AsyncIterator, List, Union
+from uuid import UUID
+from fastapi import HTTPException, Request, status
+from app.core.pagination import MAX_PAGE_SIZE
+
+CSV = "text/csv"
+BULK_BATCH_SIZE = 1000
+#most ids one multi-get may ask for
+MAX_IDS = MAX_PAGE_SIZE
+
+
+async def _lines(request: Request) -> AsyncIterator[bytes]:
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    yield pending
+
+
+async def body_rows(request: Request) -> AsyncIterator[Union[dict, ValueError]]:
+    """Rows of a bulk upload as it arrives: NDJSON (one object per line) or,
+    with Content-Type: text/csv, a header line naming the fields and one row
+    per line (fields can't contain line breaks). A line that can't be parsed
+    yields a ValueError in its place, so row numbers stay aligned."""
+    is_csv = request.headers.get("content-type", "").startswith(CSV)
+    header = None
+    async for raw in _lines(request):
+        try:
+            line = raw.decode("utf-8-sig" if header is None else "utf-8").strip()
+        except UnicodeDecodeError:
+            yield ValueError("Row is not valid UTF-8")
+            continue
+        if not line:
+            continue
+        if not is_csv:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield ValueError("Row is not valid JSON")
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield ValueError(f"Expected {len(header)} columns, got {len(values)}")
+        else:
+            yield dict(zip(header, values))
+
+
+async def body_batches(request: Request, size: int = BULK_BATCH_SIZE) -> AsyncIterator[List[Union[dict, ValueError]]]:
+    batch = []
+    async for row in body_rows(request):
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_ids(values: List[str]) -> List[UUID]:
+    """Ids from ?ids=a,b&ids=c (comma-separated, repeatable), without
+    repeats; 400 when one isn't a UUID or there are more than MAX_IDS."""
+    ids = {}
+    for value in values:
+        for part in value.split(","):
+            if part.strip():
+                try:
+                    ids[UUID(part.strip())] = None
+                except ValueError:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid id: {part.strip()}")
+    if len(ids) > MAX_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_IDS} ids per request")
+    return list(ids)
+
@@ -1,11 +1,13 @@
-from fastapi import HTTPException, status, Header, Depends
+import math
+from fastapi import HTTPException, Request, status, Header, Depends
 from app.schemas.user_schema import UserRole, UserResponse
 from app.services.user_services import UserService
-from app.core.db import users_db, enrollments_db
+from app.core.db import users_db, enrollments_db, rate_limits
+from app.core.offload import run
 from uuid import UUID
 
 
-def get_current_user(x_user_id: UUID = Header(...)):
+async def get_current_user(x_user_id: UUID = Header(...)):
     try:
         user_id = x_user_id
     except ValueError:
@@ -13,7 +15,7 @@ def get_current_user(x_user_id: UUID = Header(...)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid user ID format"
         )
-    user = users_db.get(user_id)
+    user = await run(users_db.get, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -22,7 +24,7 @@ def get_current_user(x_user_id: UUID = Header(...)):
     return user
 
 
-def is_admin_user(current_user: UserResponse = Depends(get_current_user)):
+async def is_admin_user(current_user: UserResponse = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -30,10 +32,57 @@ def is_admin_user(current_user: UserResponse = Depends(get_current_user)):
         )
     return current_user
 
-def is_student_user(current_user: UserResponse = Depends(get_current_user)):
+async def is_student_user(current_user: UserResponse = Depends(get_current_user)):
     if current_user.role != UserRole.STUDENT:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only students can enroll in courses"
         )
     return current_user
+
+
+def _needs_admin(dependant) -> bool:
+    return any(dep.call is is_admin_user or _needs_admin(dep) for dep in dependant.dependencies)
+
+#id(route) -> route class, worked out on its first request (routes live as long as the app)
+_route_classes = {}
+
+def route_class(request: Request) -> str:
+    """"admin" for routes behind is_admin_user, "reads" for GETs and the
+    POST lookups, "writes" for everything else."""
+    route = request.scope["route"]
+    key = id(route)
+    if key not in _route_classes:
+        if _needs_admin(route.dependant):
+            _route_classes[key] = "admin"
+        elif request.method in ("GET", "HEAD") or route.path.endswith("/lookup"):
+            _route_classes[key] = "reads"
+        else:
+            _route_classes[key] = "writes"
+    return _route_classes[key]
+
+
+async def _caller(request: Request) -> str:
+    #X-User-Id only counts when it names a user: made-up ids would each get a
+    #fresh bucket, so they share the client address's budget instead
+    try:
+        user_id = UUID(request.headers.get("x-user-id", ""))
+    except ValueError:
+        user_id = None
+    if user_id is not None and await run(users_db.__contains__, user_id):
+        return str(user_id)
+    return request.client.host if request.client else ""
+
+
+async def rate_limit(request: Request):
+    #runs before the route's own dependencies, so a caller over budget is
+    #turned away before the route does any work
+    if rate_limits is None:
+        return
+    wait = rate_limits.take(await _caller(request), route_class(request))
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.api.deps import is_admin_user
+from app.core.offload import run
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.schemas.change_schema import ChangeFeed
+from app.services.change_services import ChangeService
+from typing import Optional
+
+
+change_router = APIRouter()
+
+#Admin: users, courses and enrollments written after ?since=; pass back `latest`
+#next time. resync_required means the log no longer reaches back that far, or
+#since came from another worker's log
+@change_router.get("/", response_model=ChangeFeed, status_code=status.HTTP_200_OK)
+async def get_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    admin_user = Depends(is_admin_user),
+):
+    try:
+        return await run(ChangeService.changes_since, since, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
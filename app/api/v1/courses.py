@@ -1,73 +1,149 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from app.api.bulk import MAX_IDS, body_rows, parse_ids
 from uuid import uuid4, UUID
+from app.core.config import settings
+from app.core.offload import run, run_threaded
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.versioning import etag_matches
 from app.services.course_services import CourseService
-from app.schemas.course_schema import CourseCreate, CourseUpdate
+from app.schemas.course_schema import CourseCreate, CourseResponse, CourseSeats, CourseUpdate, CourseUpsertSummary
+from app.schemas.page_schema import ByIds, IdsRequest
 from app.api.deps import is_admin_user
-from typing import List
+from typing import List, Optional
 
 
 course_router = APIRouter()
 
 #Admin create courses
 @course_router.post("/", status_code=status.HTTP_201_CREATED)
-def create_course(
+async def create_course(
     course_in: CourseCreate,
     admin_user = Depends(is_admin_user)
 ):
     try:
-        return CourseService.create_course(course_in)
+        return await run(CourseService.create_course, course_in)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
-#Retrieve all courses
+#Admin catalog upsert, keyed by course code: the catalog as NDJSON or CSV
+#(Content-Type: text/csv, with a code,title header). remove_missing=true also
+#deletes the courses (and their enrollments) that are not in the feed
+@course_router.post("/bulk", response_model=CourseUpsertSummary, status_code=status.HTTP_200_OK)
+async def upsert_courses(
+    request: Request,
+    remove_missing: bool = False,
+    admin_user = Depends(is_admin_user),
+):
+    rows = [row async for row in body_rows(request)]
+    return await run_threaded(CourseService.upsert_courses, rows, remove_missing)
+
+#Retrieve the courses with the given ids in one request (for lists too long for ?ids=)
+@course_router.post("/lookup", response_model=ByIds[CourseResponse], status_code=status.HTTP_200_OK)
+async def lookup_courses(request: IdsRequest):
+    if len(request.ids) > MAX_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_IDS} ids per request")
+    return await run(CourseService.get_courses_by_ids, request.ids)
+
+#Retrieve all courses; with limit or cursor, one page at a time; with ?ids=a,b,c just those.
+#The ETag is taken before reading, so a concurrent write can only make it older
+#than the body (the next poll refetches), never newer
 @course_router.get("/", status_code=status.HTTP_200_OK)
-def get_all_courses():
+async def get_all_courses(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[List[str]] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    etag = await run(CourseService.courses_etag)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    if ids is not None:
+        return await run(CourseService.get_courses_by_ids, parse_ids(ids))
+    if limit is not None or cursor is not None:
+        try:
+            if settings.json_cache:
+                return Response(
+                    await run(CourseService.get_courses_page_json, limit or DEFAULT_PAGE_SIZE, cursor),
+                    media_type="application/json", headers={"ETag": etag},
+                )
+            return await run(CourseService.get_courses_page, limit or DEFAULT_PAGE_SIZE, cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     try:
-        return CourseService.get_all_courses()
+        if settings.json_cache:
+            return Response(await run_in_threadpool(CourseService.get_all_courses_json), media_type="application/json", headers={"ETag": etag})
+        return await run_in_threadpool(CourseService.get_all_courses)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
 
+#Retrieve a course by its code
+@course_router.get("/by-code/{code}", status_code=status.HTTP_200_OK)
+async def get_course_by_code(code: str):
+    try:
+        return await run(CourseService.get_course_by_code, code)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+
 #Retrieve a course by unique id
 @course_router.get("/{course_id}", status_code=status.HTTP_200_OK)
-def get_course(course_id: UUID):
+async def get_course(course_id: UUID, response: Response, if_none_match: Optional[str] = Header(None)):
+    etag = await run(CourseService.course_etag, course_id)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     try:
-        return CourseService.get_course(course_id)
+        if settings.json_cache:
+            return Response(await run(CourseService.get_course_json, course_id), media_type="application/json", headers={"ETag": etag})
+        return await run(CourseService.get_course, course_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+
+#Seats taken and left in a course
+@course_router.get("/{course_id}/seats", response_model=CourseSeats, status_code=status.HTTP_200_OK)
+async def get_course_seats(course_id: UUID):
+    try:
+        return await run(CourseService.get_seats, course_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
 
 #Admin fully replace course: PUT
 @course_router.put("/{course_id}", status_code=status.HTTP_200_OK)
-def replace_course(
+async def replace_course(
     course_id: UUID,
     course_update: CourseCreate,
     admin_user = Depends(is_admin_user)
 ):
     try:
-        updated_course = CourseService.replace_course(course_id, course_update)
+        updated_course = await run(CourseService.replace_course, course_id, course_update)
         return updated_course
     except ValueError as exc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+        if "not found" in str(exc):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
     
 #Admin Partially update course: PATCH
 @course_router.patch("/{course_id}")
-def partial_update_course(course_id: UUID, course_update: CourseUpdate, admin_user = Depends(is_admin_user)):
+async def partial_update_course(course_id: UUID, course_update: CourseUpdate, admin_user = Depends(is_admin_user)):
     try:
-        return CourseService.partial_update_course(course_id, course_update)
+        return await run(CourseService.partial_update_course, course_id, course_update)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 #Admin delete course
 @course_router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_course(
+async def delete_course(
     course_id: UUID,
     admin_user = Depends(is_admin_user)
 ):
     try:
-        CourseService.delete_course(course_id)
+        await run(CourseService.delete_course, course_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
     except Exception:
@@ -1,21 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Header, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Union
+from app.core.offload import run, run_threaded
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.services.enrollment_services import EnrollmentService
-from app.schemas.enrollment_schema import EnrollmentResponse, EnrollmentRequest, EnrollmentDetails
+from app.schemas.enrollment_schema import (
+    CohortEnrollmentRequest, EnrollmentBatchRequest, EnrollmentBatchResult, EnrollmentCreate, EnrollmentDetails,
+    EnrollmentRequest, EnrollmentResponse, EnrollmentSideloaded, StudentDashboard, WaitlistPosition,
+)
 from app.api.deps import is_admin_user, is_student_user
+from app.schemas.page_schema import Page
 from uuid import UUID
 
 
 enrollment_router = APIRouter()
 
+NDJSON = "application/x-ndjson"
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield row.model_dump_json().encode() + b"\n"
+
 @enrollment_router.post("/", status_code=status.HTTP_201_CREATED)
-def enroll_student(
+async def enroll_student(
     learner_data: EnrollmentRequest,
     current_student = Depends(is_student_user)
 ):
     try:
-        return EnrollmentService.enroll_student(
-            user_id=current_student.id, 
+        return await run(
+            EnrollmentService.enroll_student,
+            user_id=current_student.id,
             course_id=learner_data.course_id
         )
     except ValueError as exc:
@@ -23,59 +38,167 @@ def enroll_student(
 
 
 @enrollment_router.get("/student/{user_id}/courses")
-def student_retrieve_enrollment(
+async def student_retrieve_enrollment(
         user_id: UUID,
         current_student = Depends(is_student_user)
     ):
     if current_student.id != user_id:
         raise HTTPException(status_code=403, detail="Not allowed")
-    enrollments = EnrollmentService.retrieve_student_enrollments(user_id)
+    enrollments = await run(EnrollmentService.retrieve_student_enrollments, user_id)
     return enrollments
 
 
+#Student dashboard: their profile and the full details of each enrolled course, in one request
+@enrollment_router.get("/student/{user_id}/dashboard", response_model=StudentDashboard, status_code=status.HTTP_200_OK)
+async def student_dashboard(
+        user_id: UUID,
+        current_student = Depends(is_student_user)
+    ):
+    if current_student.id != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    try:
+        return await run(EnrollmentService.student_dashboard, user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+
+
 @enrollment_router.delete("/", status_code=status.HTTP_200_OK)
-def student_deregister(
+async def student_deregister(
         user_id: UUID, 
         course_id: UUID
     ):
     """Student cancel their own enrollment"""
     try:
-        return EnrollmentService.student_deregister(user_id, course_id)
+        return await run(EnrollmentService.student_deregister, user_id, course_id)
     except ValueError as exc:
         if "not found" in str(exc):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 
+#Waitlists: a full course queues students, who are enrolled in joining order as seats free up
+@enrollment_router.post("/waitlist/{course_id}", response_model=WaitlistPosition, status_code=status.HTTP_201_CREATED)
+async def join_waitlist(
+        course_id: UUID,
+        current_student = Depends(is_student_user)
+    ):
+    try:
+        return await run(EnrollmentService.join_waitlist, current_student.id, course_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+#position and leave only touch the in-process waitlist, so they run inline on any backend
+@enrollment_router.get("/waitlist/{course_id}", response_model=WaitlistPosition, status_code=status.HTTP_200_OK)
+async def waitlist_position(
+        course_id: UUID,
+        current_student = Depends(is_student_user)
+    ):
+    try:
+        return EnrollmentService.waitlist_position(current_student.id, course_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+
+
+@enrollment_router.delete("/waitlist/{course_id}", status_code=status.HTTP_200_OK)
+async def leave_waitlist(
+        course_id: UUID,
+        current_student = Depends(is_student_user)
+    ):
+    try:
+        return EnrollmentService.leave_waitlist(current_student.id, course_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+
+
 
 #ADMIN ENDPOINTS
-#Admin retrieve enrollments
+#Admin retrieve enrollments; with limit or cursor, one page at a time;
+#with ?stream=true or Accept: application/x-ndjson, one JSON line per enrollment;
+#with ?format=compact, rows carry ids and users/courses are listed once
 @enrollment_router.get("/admin/enrollments")
-def admin_retrieve_enrollments(admin_id: UUID = Depends(is_admin_user)):
+async def admin_retrieve_enrollments(
+    admin_id: UUID = Depends(is_admin_user),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    accept: Optional[str] = Header(None),
+    response_format: Literal["full", "compact"] = Query("full", alias="format"),
+):
+    if stream or (accept is not None and NDJSON in accept):
+        return StreamingResponse(ndjson_lines(EnrollmentService.stream_enrollment_details()), media_type=NDJSON)
+    if response_format == "compact":
+        try:
+            return await run_in_threadpool(EnrollmentService.admin_enrollments_compact, limit, cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if limit is not None or cursor is not None:
+        try:
+            return await run(EnrollmentService.admin_enrollments_page, limit or DEFAULT_PAGE_SIZE, cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     try:
-        return EnrollmentService.admin_retrieve_enrollments()
+        return await run_in_threadpool(EnrollmentService.admin_retrieve_enrollments)
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
 
-#Admin retrieve course enrollments
-@enrollment_router.get("/admin/{course_id}/enrollments", response_model=List[EnrollmentDetails], status_code=status.HTTP_200_OK)
-def admin_retrieve_course_enrollments(
+#Admin retrieve course enrollments; with limit or cursor, one page at a time;
+#with ?format=compact, rows carry ids and students/the course are listed once
+@enrollment_router.get(
+    "/admin/{course_id}/enrollments",
+    response_model=Union[Page[EnrollmentDetails], EnrollmentSideloaded, List[EnrollmentDetails]],
+    status_code=status.HTTP_200_OK,
+)
+async def admin_retrieve_course_enrollments(
     course_id: UUID,
-    admin_id: UUID = Depends(is_admin_user)
+    admin_id: UUID = Depends(is_admin_user),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    response_format: Literal["full", "compact"] = Query("full", alias="format"),
     ):
+    if response_format == "compact" or limit is not None or cursor is not None:
+        try:
+            if response_format == "compact":
+                return await run_in_threadpool(EnrollmentService.admin_course_enrollments_compact, course_id, limit, cursor)
+            return await run(EnrollmentService.admin_course_enrollments_page, course_id, limit or DEFAULT_PAGE_SIZE, cursor)
+        except ValueError as exc:
+            if "does not exist" in str(exc):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     try:
-        return EnrollmentService.admin_retrieve_course_enrollments(course_id)
+        return await run_in_threadpool(EnrollmentService.admin_retrieve_course_enrollments, course_id)
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
 
+#Admin batch enroll (user_id, course_id) pairs; mode=atomic enrolls all or none,
+#mode=per_row enrolls the valid pairs. Every pair gets a result either way
+@enrollment_router.post("/admin/enrollments/batch", response_model=EnrollmentBatchResult, status_code=status.HTTP_200_OK)
+async def admin_enroll_batch(
+    batch: EnrollmentBatchRequest,
+    mode: Literal["atomic", "per_row"] = "atomic",
+    admin_id: UUID = Depends(is_admin_user),
+):
+    return await run_threaded(EnrollmentService.enroll_batch, batch.pairs, atomic=mode == "atomic")
+
+#Admin enroll a cohort of students into one course, as the batch above
+@enrollment_router.post("/admin/{course_id}/enrollments/batch", response_model=EnrollmentBatchResult, status_code=status.HTTP_200_OK)
+async def admin_enroll_cohort(
+    course_id: UUID,
+    cohort: CohortEnrollmentRequest,
+    mode: Literal["atomic", "per_row"] = "atomic",
+    admin_id: UUID = Depends(is_admin_user),
+):
+    pairs = [EnrollmentCreate(user_id=user_id, course_id=course_id) for user_id in cohort.user_ids]
+    return await run_threaded(EnrollmentService.enroll_batch, pairs, atomic=mode == "atomic")
+
 #Admin remove enrollments
 @enrollment_router.delete("/admin/force-deregister")
-def admin_force_deregister(
+async def admin_force_deregister(
     user_id: UUID,
     course_id: UUID,
     admin_id: UUID = Depends(is_admin_user)
     ):
     try:
-        return EnrollmentService.admin_force_deregister(user_id, course_id)
+        return await run(EnrollmentService.admin_force_deregister, user_id, course_id)
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
\ No newline at end of file
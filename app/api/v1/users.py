@@ -1,7 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.services.user_services import UserService
-from app.schemas.user_schema import UserResponse, UserUpdate, UserCreate
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from app.api.bulk import MAX_IDS, body_batches, parse_ids
+from app.api.deps import is_admin_user
+from app.core.config import settings
+from app.core.offload import run, run_threaded
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.user_services import UserImporter, UserService
+from app.schemas.page_schema import ByIds, IdsRequest, Page
+from app.schemas.user_schema import UserImportSummary, UserResponse, UserUpdate, UserCreate
+from typing import List, Literal, Optional, Union
 from uuid import UUID
 
 
@@ -9,26 +16,72 @@ user_router = APIRouter()
 
 #Create a User
 @user_router.post("/",response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(user_data: UserCreate):
+async def create_user(user_data: UserCreate):
     try:
-        created_user = UserService.create_user(user_data)
+        created_user = await run(UserService.create_user, user_data)
         return created_user
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
+#Admin bulk import: NDJSON (one user object per line) or CSV (Content-Type: text/csv,
+#with a name,email,role header), read and checked a batch at a time as it streams in.
+#mode=atomic stores every row or none; mode=per_row stores the valid rows
+@user_router.post("/import", response_model=UserImportSummary, status_code=status.HTTP_200_OK)
+async def import_users(
+    request: Request,
+    mode: Literal["atomic", "per_row"] = "atomic",
+    admin_user = Depends(is_admin_user),
+):
+    importer = UserImporter(atomic=mode == "atomic")
+    async for batch in body_batches(request):
+        await run_threaded(importer.add, batch)
+    return await run_threaded(importer.finish)
+
+#Get the users with the given ids in one request (for lists too long for ?ids=)
+@user_router.post("/lookup", response_model=ByIds[UserResponse], status_code=status.HTTP_200_OK)
+async def lookup_users(request: IdsRequest):
+    if len(request.ids) > MAX_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_IDS} ids per request")
+    return await run(UserService.get_users_by_ids, request.ids)
+
+#Get a user by email
+@user_router.get("/by-email/{email}", response_model=UserResponse, status_code=status.HTTP_200_OK)
+async def get_user_by_email(email: str):
+    try:
+        return await run(UserService.get_user_by_email, email)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+
 #Get a user by ID
 @user_router.get("/{user_id}", status_code=status.HTTP_200_OK)
-def get_user_by_id(user_id: UUID):
+async def get_user_by_id(user_id: UUID):
     try:
-        return UserService.get_user_by_id(user_id)
+        if settings.json_cache:
+            return Response(await run(UserService.get_user_json, user_id), media_type="application/json")
+        return await run(UserService.get_user_by_id, user_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
 
-#Get all Users
-@user_router.get("/", response_model=List[UserResponse], status_code=status.HTTP_200_OK)
-def get_all_users():
+#Get all Users; with limit or cursor, one page at a time; with ?ids=a,b,c just those
+@user_router.get("/", response_model=Union[Page[UserResponse], ByIds[UserResponse], List[UserResponse]], status_code=status.HTTP_200_OK)
+async def get_all_users(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[List[str]] = Query(None),
+):
+    if ids is not None:
+        return await run(UserService.get_users_by_ids, parse_ids(ids))
+    if limit is not None or cursor is not None:
+        try:
+            if settings.json_cache:
+                return Response(await run(UserService.get_users_page_json, limit or DEFAULT_PAGE_SIZE, cursor), media_type="application/json")
+            return await run(UserService.get_users_page, limit or DEFAULT_PAGE_SIZE, cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     try:
-        return UserService.get_all_users()
+        if settings.json_cache:
+            return Response(await run_in_threadpool(UserService.get_all_users_json), media_type="application/json")
+        return await run_in_threadpool(UserService.get_all_users)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
     except Exception:
@@ -36,29 +89,33 @@ def get_all_users():
 
 #update fully and partially a user: PUT
 @user_router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: UUID, payload: UserUpdate):
+async def update_user(user_id: UUID, payload: UserUpdate):
     try:
-        return UserService.update_user(user_id, payload)
+        return await run(UserService.update_user, user_id, payload)
     except ValueError as exc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+        if "not found" in str(exc):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
 
 #partial Update of user
 @user_router.patch("/{user_id}")
-def partial_update_user(user_id: UUID, user_update: UserUpdate):
+async def partial_update_user(user_id: UUID, user_update: UserUpdate):
     try:
-        return UserService.update_user(user_id, user_update)
+        return await run(UserService.update_user, user_id, user_update)
     except ValueError as exc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+        if "not found" in str(exc):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     except Exception:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred")
 
 #Delete a User
 @user_router.delete("/{user_id}")
-def delete_user(user_id: UUID):
+async def delete_user(user_id: UUID):
     try:
-        return UserService.delete_user(user_id)
+        return await run(UserService.delete_user, user_id)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
     except Exception:
@@ -0,0 +1,99 @@
+"""Bounded log of the writes made through the services, for delta sync.
+
+Every create/update/delete of a user, course or enrollment is appended with
+the next sequence number; only the newest `capacity` entries are kept. A
+client that last synced at N reads the entries after N, unless some of them
+have already been dropped, in which case it has to download everything again.
+With the memory stores the log lives in the process and its sequence numbers
+restart with it; with SQLite the database keeps it (StoredChangeLog), shared
+by every worker. Clients get positions as "<epoch>:<seq>" tokens carrying the
+log's random epoch: a token from another log (an earlier process, or another
+database) is noticed and the client told to resync, rather than read against
+the wrong log.
+"""
+import threading
+from collections import deque
+from itertools import count, islice
+from typing import List, NamedTuple, Optional
+from uuid import UUID, uuid4
+
+
+class ChangeEntry(NamedTuple):
+    seq: int
+    entity: str
+    id: UUID
+    op: str
+
+
+class ChangeLog:
+    def __init__(self, capacity: int = 10_000):
+        self.epoch = uuid4().hex[:12]
+        self._entries = deque(maxlen=capacity)
+        self._seq = count(1)
+        self._latest = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def latest(self) -> int:
+        return self._latest
+
+    def token(self, seq: int) -> str:
+        return f"{self.epoch}:{seq}"
+
+    def position(self, token: Optional[str]) -> Optional[int]:
+        """The seq a token stands for (0 when there's none); None when the
+        token is from another log."""
+        if token is None:
+            return 0
+        epoch, _, seq = token.partition(":")
+        if not epoch or not seq.isdigit():
+            raise ValueError("Invalid since token")
+        return int(seq) if epoch == self.epoch else None
+
+    def record(self, entity: str, entity_id: UUID, op: str) -> int:
+        with self._lock:
+            self._latest = next(self._seq)
+            self._entries.append(ChangeEntry(self._latest, entity, entity_id, op))
+            return self._latest
+
+    def since(self, seq: int, limit: int) -> Optional[List[ChangeEntry]]:
+        """Up to limit entries after seq, oldest first; None when entries
+        after seq have been dropped (or seq is from a later/other log)."""
+        with self._lock:
+            if seq > self._latest:
+                return None
+            if not self._entries:
+                return []
+            first = self._entries[0].seq
+            if seq < first - 1:
+                return None
+            #sequence numbers are consecutive, so seq maps straight to a position
+            start = seq - first + 1
+            return list(islice(self._entries, start, start + limit))
+
+
+class StoredChangeLog(ChangeLog):
+    """A log the store keeps itself (the SQLite triggers), in the same
+    transaction as each write, so a feed from any worker covers the writes
+    of every worker sharing the store, and it outlives restarts. The epoch
+    belongs to the store too: it's made when the database is."""
+
+    def __init__(self, changes):
+        self._changes = changes
+        self.epoch = changes.epoch()
+
+    def __len__(self):
+        return len(self._changes)
+
+    def latest(self) -> int:
+        return self._changes.latest()
+
+    def record(self, entity: str, entity_id: UUID, op: str) -> int:
+        #the write that called this has already been logged
+        return self.latest()
+
+    def since(self, seq: int, limit: int) -> Optional[List[ChangeEntry]]:
+        rows = self._changes.since(seq, limit)
+        return None if rows is None else [ChangeEntry(*row) for row in rows]
@@ -0,0 +1,58 @@
+from typing import Literal, Optional
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    #"memory" keeps everything in process; "sqlite" persists to sqlite_path
+    storage_backend: Literal["memory", "sqlite"] = "memory"
+    sqlite_path: str = "course_enrollment.db"
+    sqlite_timeout: float = 5.0
+    #Concurrency: lock shards per store / for services, and enrollment partitions
+    lock_shards: int = 64
+    enrollment_partitions: int = 4
+    #Serve user/course GETs from cached JSON fragments (app/core/json_cache.py);
+    #memory backend only, as the cache only sees its own worker's writes
+    json_cache: bool = False
+    #Writes kept for GET /api/v1/changes; older clients must resync
+    change_log_size: int = 10_000
+    #Run service calls on the event loop when no store blocks (app/core/offload.py);
+    #False sends every call to the threadpool
+    inline_services: bool = True
+    #Responses kept for retried POSTs with an Idempotency-Key (app/core/idempotency.py)
+    idempotency_keys: int = 10_000
+    idempotency_ttl: float = 3600.0
+    #Token buckets per X-User-Id and route class (app/core/rate_limit.py): requests
+    #per second and burst size for each class; over the limit is a 429 with Retry-After.
+    #Rates must be positive and bursts hold at least one request
+    rate_limit: bool = False
+    rate_limit_reads: float = Field(50.0, gt=0)
+    rate_limit_reads_burst: int = Field(100, ge=1)
+    rate_limit_writes: float = Field(10.0, gt=0)
+    rate_limit_writes_burst: int = Field(20, ge=1)
+    rate_limit_admin: float = Field(20.0, gt=0)
+    rate_limit_admin_burst: int = Field(50, ge=1)
+    rate_limit_idle: float = Field(300.0, ge=0)
+    rate_limit_buckets: int = Field(100_000, ge=1)
+
+    #Optional durability for the memory backend: operation log + snapshots
+    journal_dir: Optional[str] = None
+    journal_fsync_batch: int = 64
+    journal_fsync_interval: float = 0.05
+    journal_snapshot_every: int = 100_000
+    #"binary" snapshots are memory-mapped and decoded lazily on startup
+    journal_snapshot_format: Literal["json", "binary"] = "json"
+
+    @model_validator(mode="after")
+    def _check_json_cache(self):
+        if self.json_cache and self.storage_backend != "memory":
+            raise ValueError(
+                "json_cache needs the memory backend: SQLite workers share the data but not the cache, "
+                "so one worker's writes would leave stale JSON in the others"
+            )
+        return self
+
+
+settings = Settings()
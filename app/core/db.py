@@ -1,6 +1,105 @@
+import logging
+from app.core.changes import ChangeLog, StoredChangeLog
+from app.core.idempotency import IdempotencyTable
+from app.core.config import Settings, settings
+from app.core.json_cache import JsonFragments
+from app.core.rate_limit import Limit, TokenBuckets
+from app.core.versioning import StoredVersions, VersionCounters
+from app.core.waitlists import Waitlists
+from app.repositories.journal import Journal
+from app.repositories.memory_repository import (
+    MemoryCourseStore,
+    MemoryEnrollmentStore,
+    MemoryUserStore,
+)
+from app.repositories.sqlite_repository import (
+    SqliteChanges,
+    SqliteCourseStore,
+    SqliteDatabase,
+    SqliteEnrollmentStore,
+    SqliteUserStore,
+    SqliteWaitlistStore,
+)
+from app.repositories.sharding import ShardLocks
 
 
+logger = logging.getLogger(__name__)
 
-users_db = {}
-courses_db = {}
-enrollments_db = {}
\ No newline at end of file
+
+def create_stores(config: Settings):
+    """Build the (users, courses, enrollments) repositories for the configured backend."""
+    if config.storage_backend == "sqlite":
+        database = SqliteDatabase(config.sqlite_path, timeout=config.sqlite_timeout)
+        return SqliteUserStore(database), SqliteCourseStore(database), SqliteEnrollmentStore(database)
+    return (
+        MemoryUserStore(config.lock_shards),
+        MemoryCourseStore(config.lock_shards),
+        MemoryEnrollmentStore(config.lock_shards, config.enrollment_partitions),
+    )
+
+
+def attach_journal(config: Settings, *stores):
+    """Recover the memory stores from config.journal_dir and log every later write."""
+    journal = Journal(
+        config.journal_dir,
+        {store.name: store for store in stores},
+        fsync_batch=config.journal_fsync_batch,
+        fsync_interval=config.journal_fsync_interval,
+        snapshot_every=config.journal_snapshot_every,
+        snapshot_format=config.journal_snapshot_format,
+    )
+    stats = journal.recover()
+    logger.info(
+        "Recovered %d snapshot rows and %d log records in %.3fs",
+        stats.snapshot_rows, stats.replayed, stats.seconds,
+    )
+    for store in stores:
+        store.journal = journal
+    return journal
+
+
+def close_stores():
+    if journal is not None:
+        journal.close()
+
+
+users_db, courses_db, enrollments_db = create_stores(settings)
+#Services lock the entities an operation spans (e.g. a user and a course)
+entity_locks = ShardLocks(settings.lock_shards)
+#Encoded JSON per user/course; services invalidate on every write
+user_fragments, course_fragments = JsonFragments(), JsonFragments()
+#Versions behind the course ETags; bumped by every course write (by the
+#database itself with SQLite, so every worker sends the same ETags)
+if settings.storage_backend == "sqlite":
+    course_versions = StoredVersions(courses_db)
+else:
+    course_versions = VersionCounters()
+#Every service write, for delta sync (logged by the database itself with
+#SQLite, so every worker's feed covers every worker's writes)
+if settings.storage_backend == "sqlite":
+    change_log = StoredChangeLog(SqliteChanges(users_db.database, settings.change_log_size))
+else:
+    change_log = ChangeLog(settings.change_log_size)
+#Students queued for full courses, promoted as seats free up (kept by the
+#database with SQLite, so every worker promotes from the same queues)
+if settings.storage_backend == "sqlite":
+    waitlists = SqliteWaitlistStore(users_db.database)
+else:
+    waitlists = Waitlists()
+#Stored responses of POSTs sent with an Idempotency-Key, replayed to retries
+idempotency_keys = IdempotencyTable(settings.idempotency_keys, settings.idempotency_ttl)
+#Request budgets per caller and route class; None when rate limiting is off
+rate_limits = None
+if settings.rate_limit:
+    rate_limits = TokenBuckets(
+        {
+            "reads": Limit(settings.rate_limit_reads, settings.rate_limit_reads_burst),
+            "writes": Limit(settings.rate_limit_writes, settings.rate_limit_writes_burst),
+            "admin": Limit(settings.rate_limit_admin, settings.rate_limit_admin_burst),
+        },
+        idle=settings.rate_limit_idle,
+        capacity=settings.rate_limit_buckets,
+    )
+journal = None
+if settings.storage_backend == "memory" and settings.journal_dir:
+    journal = attach_journal(settings, users_db, courses_db, enrollments_db, waitlists)
@@ -0,0 +1,179 @@
+"""Idempotency-Key support for the create endpoints.
+
+A POST carrying an `Idempotency-Key` header is remembered, per caller
+(X-User-Id, or the client address for anonymous requests such as sign-ups)
+and path, together with a hash of its body and the response it got. A retry with the same key is answered with that stored response
+before it reaches the router, so the services never see it. Reusing a key
+with a different body is a 422, and a retry that arrives while the first
+request is still running is a 409. Redirects, 429s and 5xx responses
+aren't kept, so those requests go through again.
+
+Keys expire `ttl` seconds after their first request, and only the newest
+`capacity` are kept. Every key gets the same ttl, so insertion order is
+expiry order and eviction only ever looks at the oldest entry.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+MAX_KEY_LENGTH = 255
+
+#begin() outcomes
+NEW, REPLAY, IN_FLIGHT, MISMATCH = "new", "replay", "in_flight", "mismatch"
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires", "response")
+
+    def __init__(self, fingerprint: bytes, expires: float):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.response: Optional[StoredResponse] = None
+
+
+class IdempotencyTable:
+    def __init__(self, capacity: int = 10_000, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def begin(self, key: tuple, fingerprint: bytes) -> Tuple[str, Optional[StoredResponse]]:
+        """Claim key for a request, or say why it can't run."""
+        with self._lock:
+            now = self._clock()
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if oldest.expires > now:
+                    break
+                self._entries.popitem(last=False)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    return MISMATCH, None
+                if entry.response is None:
+                    return IN_FLIGHT, None
+                return REPLAY, entry.response
+            while len(self._entries) >= self.capacity:
+                self._entries.popitem(last=False)
+            self._entries[key] = _Entry(fingerprint, now + self.ttl)
+            return NEW, None
+
+    def finish(self, key: tuple, response: StoredResponse):
+        with self._lock:
+            entry = self._entries.get(key)
+            #evicted while the request ran: nothing to keep it in
+            if entry is not None:
+                entry.response = response
+
+    def release(self, key: tuple):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def _error(status: int, detail: str) -> StoredResponse:
+    body = json.dumps({"detail": detail}).encode()
+    return StoredResponse(status, [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())], body)
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware applying `table` to POSTs on `paths` (no trailing slash)."""
+
+    def __init__(self, app, table: IdempotencyTable, paths: Iterable[str]):
+        self.app = app
+        self.table = table
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        path = scope["path"].rstrip("/")
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key")
+        if path not in self.paths or idempotency_key is None:
+            return await self.app(scope, receive, send)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return await self._send(send, _error(400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"))
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        key = (self._caller(scope, headers), path, idempotency_key)
+        state, stored = self.table.begin(key, hashlib.sha256(body).digest())
+        if state == REPLAY:
+            return await self._send(send, stored, replayed=True)
+        if state == MISMATCH:
+            return await self._send(send, _error(422, "Idempotency-Key was already used with a different request"))
+        if state == IN_FLIGHT:
+            return await self._send(send, _error(409, "A request with this Idempotency-Key is still in progress"))
+
+        delivered = False
+
+        async def replay_body():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start, parts = None, []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                parts.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            self.table.release(key)
+            raise
+        #redirects (e.g. to the path with a trailing slash) are followed under the
+        #same key, and a request turned away by the rate limit hasn't been answered yet
+        if start is None or start["status"] >= 500 or 300 <= start["status"] < 400 or start["status"] == 429:
+            self.table.release(key)
+        else:
+            self.table.finish(key, StoredResponse(start["status"], list(start.get("headers", [])), b"".join(parts)))
+
+    @staticmethod
+    def _caller(scope, headers) -> tuple:
+        #anonymous callers don't share a scope: one client's key can't replay another's response
+        user_id = headers.get(b"x-user-id")
+        if user_id:
+            return ("user", user_id)
+        client = scope.get("client")
+        return ("client", client[0] if client else None)
+
+    @staticmethod
+    async def _send(send, response: StoredResponse, replayed: bool = False):
+        headers = list(response.headers)
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
@@ -0,0 +1,59 @@
+"""Pre-encoded JSON for users and courses, so unchanged entities are not
+serialized again on every GET.
+
+Each cache maps an entity id to its JSON bytes; list and page responses are
+assembled by joining the fragments. Services call `invalidate(id)` after
+every write to an entity. A reader takes `clock()` before reading the store
+and only keeps what it serialized if no write to that id (or one sharing
+its stripe) happened since, so a slow reader can't put back a version a
+writer has just replaced.
+"""
+import json
+import threading
+from itertools import count
+from typing import Iterable, Optional
+from pydantic import BaseModel
+
+
+class JsonFragments:
+    def __init__(self, stripes: int = 64):
+        self._fragments = {}
+        #clock value of the last invalidation per stripe of ids
+        self._written = [0] * stripes
+        self._clock = count(1)
+        self._now = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._now = next(self._clock)
+            self._written = [self._now] * len(self._written)
+
+    def clock(self) -> int:
+        return self._now
+
+    def invalidate(self, entity_id):
+        with self._lock:
+            self._now = next(self._clock)
+            self._written[hash(entity_id) % len(self._written)] = self._now
+            self._fragments.pop(entity_id, None)
+
+    def dump(self, entity: BaseModel, since: int) -> bytes:
+        data = self._fragments.get(entity.id)
+        if data is None:
+            data = entity.model_dump_json().encode()
+            with self._lock:
+                if self._written[hash(entity.id) % len(self._written)] <= since:
+                    self._fragments[entity.id] = data
+        return data
+
+    def dump_list(self, entities: Iterable[BaseModel], since: int) -> bytes:
+        return b"[" + b",".join([self.dump(entity, since) for entity in entities]) + b"]"
+
+    def dump_page(self, entities: Iterable[BaseModel], next_cursor: Optional[str], since: int) -> bytes:
+        #same shape as schemas.page_schema.Page
+        return b'{"items":' + self.dump_list(entities, since) + b',"next_cursor":' + json.dumps(next_cursor).encode() + b"}"
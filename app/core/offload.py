@@ -0,0 +1,49 @@
+"""How the async routes call the (synchronous) services.
+
+With the memory stores a service call is a few microseconds of CPU work
+that never waits, so it runs right on the event loop: no threadpool hop
+per request, and the number of requests in flight isn't capped by the
+threadpool's size. When a store can block (SQLite, or memory stores
+writing a journal) the call goes to a worker thread instead; once every
+worker is busy, further calls queue on the threadpool's limiter in the
+event loop rather than holding a thread each.
+
+Inline calls need no extra locking: a synchronous call never yields to the
+loop, so no other request's inline call can run in the middle of it, and
+the entity and store locks still keep out the calls made from threads
+(bulk imports, streams, unbounded listings). Those are the calls routes
+make on a worker thread directly, whatever the store. The bulk writes among
+them go through run_threaded: they hold entity or store locks for a whole
+batch, and an inline call waiting on one would stall the loop and every
+request on it, so while one is in flight run() sends calls to the
+threadpool too, where waiting holds up only their own request.
+"""
+from typing import Callable, TypeVar
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.db import courses_db, enrollments_db, users_db
+
+T = TypeVar("T")
+
+#run_threaded calls in flight; only ever changed on the event loop
+_threaded_writes = 0
+
+
+def stores_block() -> bool:
+    return users_db.blocking or courses_db.blocking or enrollments_db.blocking
+
+
+async def run(function: Callable[..., T], *args, **kwargs) -> T:
+    if settings.inline_services and not stores_block() and not _threaded_writes:
+        return function(*args, **kwargs)
+    return await run_in_threadpool(function, *args, **kwargs)
+
+
+async def run_threaded(function: Callable[..., T], *args, **kwargs) -> T:
+    """Run a bulk write on a worker thread, keeping run() off the loop until it's done."""
+    global _threaded_writes
+    _threaded_writes += 1
+    try:
+        return await run_in_threadpool(function, *args, **kwargs)
+    finally:
+        _threaded_writes -= 1
@@ -0,0 +1,62 @@
+"""Token-bucket rate limits per caller and route class.
+
+Each (identity, route class) pair has a bucket holding up to `burst`
+tokens, refilled at `rate` per second; a request takes one token or is
+told how long until the next one. Buckets are refilled lazily when they're
+used, so a take is O(1). The table is kept in least-recently-used order:
+buckets idle for `idle` seconds are dropped from the front as others are
+used. `idle` is never shorter than a bucket's refill time, so a dropped
+bucket was full anyway and forgetting it changes nothing. Past `capacity`
+buckets the least recently used one is dropped however recently it was
+used, so the table stays bounded even when callers keep appearing.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple
+
+
+class Limit(NamedTuple):
+    rate: float
+    burst: float
+
+
+class TokenBuckets:
+    def __init__(
+        self, limits: Dict[str, Limit], idle: float = 300.0, capacity: int = 100_000, clock: Callable[[], float] = time.monotonic
+    ):
+        self.limits = dict(limits)
+        self.capacity = capacity
+        self.idle = max([idle] + [limit.burst / limit.rate for limit in self.limits.values()])
+        self._clock = clock
+        #(identity, route class) -> [tokens, last refill]
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, identity: str, route_class: str) -> float:
+        """Take a token: 0 if there was one, else seconds until there is."""
+        limit = self.limits[route_class]
+        key = (identity, route_class)
+        with self._lock:
+            now = self._clock()
+            while self._buckets:
+                oldest = next(iter(self._buckets.values()))
+                if now - oldest[1] < self.idle:
+                    break
+                self._buckets.popitem(last=False)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                while len(self._buckets) >= self.capacity:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[key] = [limit.burst, now]
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / limit.rate
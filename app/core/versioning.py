@@ -0,0 +1,70 @@
+"""Version counters behind the ETags of cached reads.
+
+One clock per collection; every write through the services bumps it and
+stamps the written entity with the new value, so both the collection's and
+the entity's versions only ever grow. ETags also carry a random epoch
+chosen at startup: counters restart with the process, and the epoch keeps
+an old ETag from matching a new version. In-process counters only see
+their own worker's writes, so a store shared between workers keeps the
+versions itself (StoredVersions).
+"""
+import threading
+from itertools import count
+from typing import Optional
+from uuid import uuid4
+
+
+class VersionCounters:
+    def __init__(self):
+        self.epoch = uuid4().hex[:12]
+        self._clock = count(1)
+        self._collection = 0
+        #entities keep their last version after a delete so their ETag moves on
+        self._entities = {}
+        self._lock = threading.Lock()
+
+    def bump(self, entity_id) -> int:
+        with self._lock:
+            version = self._collection = next(self._clock)
+            self._entities[entity_id] = version
+            return version
+
+    def collection(self) -> int:
+        return self._collection
+
+    def of(self, entity_id) -> int:
+        return self._entities.get(entity_id, 0)
+
+    def collection_etag(self) -> str:
+        return f'"{self.epoch}-{self.collection()}"'
+
+    def entity_etag(self, entity_id) -> str:
+        return f'"{self.epoch}-{self.of(entity_id)}"'
+
+
+class StoredVersions(VersionCounters):
+    """Versions the store keeps itself (the SQLite triggers), in the same
+    transaction as each write, so workers sharing the store agree on them.
+    The epoch belongs to the store too: it's made when the database is."""
+
+    def __init__(self, store):
+        self._store = store
+        self.epoch = store.version_epoch()
+
+    def bump(self, entity_id) -> int:
+        #the write that called this has already moved the version
+        return self._store.version_of(entity_id)
+
+    def collection(self) -> int:
+        return self._store.catalog_version()
+
+    def of(self, entity_id) -> int:
+        return self._store.version_of(entity_id)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match uses: W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in tags)
@@ -0,0 +1,198 @@
+"""FIFO waitlists for full courses.
+
+Each course's queue is a deque of (ticket, user_id), tickets counting up in
+joining order, plus a user -> ticket index. Leaving only drops the index
+entry; the stale deque entry is skipped once it reaches the head, so
+joining, leaving and taking the head are O(1) amortized. A Fenwick tree
+over the tickets (1 while waiting, 0 once gone) counts the users still
+waiting up to any ticket, so a position is O(log n) however many people
+ahead have left. Tickets are renumbered when gone ones pile up.
+
+This is the memory backend's waitlist store. Every entry is also kept as a
+WaitlistEntry in joining order, which is what the journal logs, snapshots
+and replays (through the same put/delete/clear calls as the other memory
+stores), so the queues come back after a restart. With SQLite the database
+keeps them instead (sqlite_repository.SqliteWaitlistStore).
+"""
+import threading
+from collections import deque
+from typing import Dict, Optional
+from uuid import UUID
+from app.repositories.base_repository import WaitlistRepository, waitlist_entry_id
+from app.schemas.enrollment_schema import WaitlistEntry
+
+
+class _Queue:
+    def __init__(self):
+        self.entries = deque()
+        self.tickets: Dict[UUID, int] = {}
+        self._tree = [0]
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def _add(self, index, delta):
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, index):
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def push(self, user_id) -> int:
+        ticket = len(self._tree) - 1
+        index = ticket + 1
+        #the new node covers (index - lowbit, index]: this ticket and those before it in range
+        self._tree.append(1 + self._prefix(index - 1) - self._prefix(index - (index & -index)))
+        self.entries.append((ticket, user_id))
+        self.tickets[user_id] = ticket
+        return self._prefix(index)
+
+    def remove(self, user_id) -> bool:
+        ticket = self.tickets.pop(user_id, None)
+        if ticket is None:
+            return False
+        self._add(ticket + 1, -1)
+        if len(self._tree) > 4 * len(self.tickets) + 64:
+            self._renumber()
+        return True
+
+    def position(self, user_id) -> Optional[int]:
+        ticket = self.tickets.get(user_id)
+        return None if ticket is None else self._prefix(ticket + 1)
+
+    def head(self) -> Optional[UUID]:
+        while self.entries:
+            ticket, user_id = self.entries[0]
+            if self.tickets.get(user_id) == ticket:
+                return user_id
+            self.entries.popleft()
+        return None
+
+    def _renumber(self):
+        live = [user_id for ticket, user_id in self.entries if self.tickets.get(user_id) == ticket]
+        self.entries = deque(enumerate(live))
+        self.tickets = {user_id: ticket for ticket, user_id in self.entries}
+        #every ticket is waiting: build the tree in O(n)
+        tree = [0] + [1] * len(live)
+        for index in range(1, len(tree)):
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+
+class Waitlists(WaitlistRepository):
+    name = "waitlists"
+    journal = None
+
+    def __init__(self):
+        self._queues: Dict[UUID, _Queue] = {}
+        #(course_id, user_id) of every entry, in joining order; entries and their
+        #ids are only built for the journal, which keeps joins and leaves cheap
+        self._joined: Dict[tuple, None] = {}
+        #entry id -> pair for the entries recovery put back, so it can replay deletes
+        self._recovered: Dict[UUID, tuple] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def blocking(self):
+        return self.journal is not None
+
+    def clear(self):
+        with self._lock:
+            self._queues.clear()
+            self._joined.clear()
+            self._recovered.clear()
+            if self.journal is not None:
+                self.journal.clear(self.name)
+
+    def join(self, course_id, user_id) -> int:
+        with self._lock:
+            queue = self._queues.setdefault(course_id, _Queue())
+            if user_id in queue.tickets:
+                raise ValueError("Student is already on the waitlist for this course")
+            self._joined[(course_id, user_id)] = None
+            if self.journal is not None:
+                self.journal.put(self.name, _entry((course_id, user_id)))
+            position = queue.push(user_id)
+        self._written()
+        return position
+
+    def leave(self, course_id, user_id) -> bool:
+        with self._lock:
+            queue = self._queues.get(course_id)
+            if queue is None or not queue.remove(user_id):
+                return False
+            if not queue:
+                del self._queues[course_id]
+            self._forget(course_id, user_id)
+        self._written()
+        return True
+
+    def _forget(self, course_id, user_id):
+        del self._joined[(course_id, user_id)]
+        if self.journal is not None:
+            entry_id = waitlist_entry_id(course_id, user_id)
+            self._recovered.pop(entry_id, None)
+            self.journal.delete(self.name, entry_id)
+
+    def _written(self):
+        #outside the lock: a snapshot locks every store, then the journal
+        if self.journal is not None:
+            self.journal.maybe_snapshot()
+
+    def position(self, course_id, user_id) -> Optional[int]:
+        with self._lock:
+            queue = self._queues.get(course_id)
+            return None if queue is None else queue.position(user_id)
+
+    def waiting(self, course_id) -> int:
+        queue = self._queues.get(course_id)
+        return 0 if queue is None else len(queue)
+
+    def head(self, course_id) -> Optional[UUID]:
+        with self._lock:
+            queue = self._queues.get(course_id)
+            return None if queue is None else queue.head()
+
+    def drop_course(self, course_id):
+        with self._lock:
+            queue = self._queues.pop(course_id, None)
+            if queue is None:
+                return
+            for user_id in queue.tickets:
+                self._forget(course_id, user_id)
+        self._written()
+
+    #what the journal needs of a store: replaying puts and deletes, capturing snapshots
+    def __setitem__(self, entry_id, entry):
+        self.join(entry.course_id, entry.user_id)
+        self._recovered[entry_id] = (entry.course_id, entry.user_id)
+
+    def pop(self, entry_id, default=None):
+        pair = self._recovered.pop(entry_id, None)
+        if pair is None or not self.leave(*pair):
+            return default
+        return _entry(pair)
+
+    def attach_base(self, table):
+        for row in range(len(table)):
+            entry = table.decode(row)
+            self[entry.id] = entry
+
+    def locked(self):
+        return self._lock
+
+    def frozen_values(self):
+        pairs = list(self._joined)
+        return (_entry(pair) for pair in pairs)
+
+
+def _entry(pair) -> WaitlistEntry:
+    course_id, user_id = pair
+    return WaitlistEntry(id=waitlist_entry_id(course_id, user_id), course_id=course_id, user_id=user_id)
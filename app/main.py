@@ -1,14 +1,34 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from app.api.deps import rate_limit
+from app.core.db import close_stores, idempotency_keys
+from app.core.idempotency import IdempotencyMiddleware
 from app.api.v1.users import user_router
 from app.api.v1.courses import course_router
 from app.api.v1.enrollments import enrollment_router
+from app.api.v1.changes import change_router
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    close_stores()
 
-app.include_router(user_router, prefix="/api/v1/users", tags=["User Routes"])
-app.include_router(course_router, prefix="/api/v1/courses", tags=["Course Routes"])
-app.include_router(enrollment_router, prefix="/api/v1/enrollments", tags=["Student Enrollments Routes"])
+
+app = FastAPI(lifespan=lifespan)
+#retried creates with the same Idempotency-Key get the first response back
+app.add_middleware(
+    IdempotencyMiddleware,
+    table=idempotency_keys,
+    paths=["/api/v1/users", "/api/v1/courses", "/api/v1/enrollments"],
+)
+
+#every API route is rate limited per caller when RATE_LIMIT is on
+limited = [Depends(rate_limit)]
+app.include_router(user_router, prefix="/api/v1/users", tags=["User Routes"], dependencies=limited)
+app.include_router(course_router, prefix="/api/v1/courses", tags=["Course Routes"], dependencies=limited)
+app.include_router(enrollment_router, prefix="/api/v1/enrollments", tags=["Student Enrollments Routes"], dependencies=limited)
+app.include_router(change_router, prefix="/api/v1/changes", tags=["Change Feed Routes"], dependencies=limited)
 
 app.get("/")
 def root():
@@ -0,0 +1,22 @@
+"""One-off maintenance tasks against the configured stores.
+
+    python -m app.maintenance purge-orphans
+"""
+import argparse
+from app.core.db import close_stores
+from app.services.enrollment_services import EnrollmentService
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance")
+    parser.add_argument("task", choices=("purge-orphans",))
+    parser.parse_args()
+    try:
+        removed = EnrollmentService.purge_orphaned_enrollments()
+        print(f"Removed {removed} orphaned enrollments")
+    finally:
+        close_stores()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid5
+from app.schemas.user_schema import UserResponse
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse
+
+
+#raised when an enrollment would go over its course's capacity
+COURSE_FULL = "Course is full"
+
+
+def normalize_key(value: str) -> str:
+    return value.strip().lower()
+
+
+class Repository(MutableMapping):
+    """Entities keyed by id, in a stable insertion order."""
+
+    #whether a call may wait on I/O; async routes call non-blocking stores
+    #on the event loop and the others from a worker thread (app/core/offload.py)
+    blocking = True
+
+    @abstractmethod
+    def page(self, after: Optional[int], limit: int) -> Tuple[list, Optional[int]]:
+        """Return up to limit entities positioned after `after` (None to start
+        at the beginning) and the position to pass for the next page, which
+        is None once the end is reached. Costs O(limit), however deep."""
+
+    def get_many(self, ids: Iterable[UUID]) -> Dict[UUID, object]:
+        """Map each of ids that exists to its entity."""
+        found = {entity_id: self.get(entity_id) for entity_id in ids}
+        return {entity_id: entity for entity_id, entity in found.items() if entity is not None}
+
+    def put_many(self, entities: Iterable) -> None:
+        """Store every entity (keyed by its id) or none of them: when one
+        conflicts, the ones already written are put back as they were and
+        the ValueError propagates."""
+        written = []
+        try:
+            for entity in entities:
+                previous = self.get(entity.id)
+                self[entity.id] = entity
+                written.append((entity.id, previous))
+        except ValueError:
+            for entity_id, previous in reversed(written):
+                if previous is None:
+                    self.pop(entity_id, None)
+                else:
+                    self[entity_id] = previous
+            raise
+
+    def insert_many(self, entities: Iterable) -> None:
+        """Like put_many for entities with new ids, skipping the lookups
+        put_many needs to put replaced rows back."""
+        self.put_many(entities)
+
+
+class UserRepository(Repository):
+    """Users keyed by id. Writes raise ValueError when the email is taken."""
+
+    conflict_message = "A user with this email already exist"
+
+    @abstractmethod
+    def owner_of(self, email: str) -> Optional[UUID]:
+        """Return the id of the user holding email (case-insensitive), or None."""
+
+    def owners_of(self, emails: Iterable[str]) -> Dict[str, UUID]:
+        """Map each normalized email that is taken to its user's id."""
+        owners = {normalize_key(email): self.owner_of(email) for email in emails}
+        return {key: owner for key, owner in owners.items() if owner is not None}
+
+    def get_by_email(self, email: str) -> Optional[UserResponse]:
+        user_id = self.owner_of(email)
+        return None if user_id is None else self.get(user_id)
+
+    def delete_with_enrollments(self, user_id: UUID, enrollments: "EnrollmentRepository") -> None:
+        """Delete user_id and every enrollment of theirs, as one write where the store can."""
+        enrollments.delete_for_user(user_id)
+        del self[user_id]
+
+
+class CourseRepository(Repository):
+    """Courses keyed by id. Writes raise ValueError when the code is taken."""
+
+    conflict_message = "Course code already exists"
+
+    @abstractmethod
+    def owner_of(self, code: str) -> Optional[UUID]:
+        """Return the id of the course holding code (case-insensitive), or None."""
+
+    def owners_of(self, codes: Iterable[str]) -> Dict[str, UUID]:
+        """Map each normalized code that is taken to its course's id."""
+        owners = {normalize_key(code): self.owner_of(code) for code in codes}
+        return {key: owner for key, owner in owners.items() if owner is not None}
+
+    def get_by_code(self, code: str) -> Optional[CourseResponse]:
+        course_id = self.owner_of(code)
+        return None if course_id is None else self.get(course_id)
+
+    def delete_with_enrollments(self, course_id: UUID, enrollments: "EnrollmentRepository") -> None:
+        """Delete course_id and every enrollment in it, as one write where the store can."""
+        enrollments.delete_for_course(course_id)
+        del self[course_id]
+
+
+class EnrollmentRepository(Repository):
+    """Enrollments keyed by id, unique on (user_id, course_id)."""
+
+    conflict_message = "Student is already enrolled in this course"
+
+    @abstractmethod
+    def find(self, user_id: UUID, course_id: UUID) -> Optional[EnrollmentResponse]:
+        """Return the enrollment of user_id in course_id, or None."""
+
+    @abstractmethod
+    def for_user(self, user_id: UUID) -> List[EnrollmentResponse]:
+        ...
+
+    @abstractmethod
+    def for_course(self, course_id: UUID) -> List[EnrollmentResponse]:
+        ...
+
+    @abstractmethod
+    def page_for_course(
+        self, course_id: UUID, after: Optional[int], limit: int
+    ) -> Tuple[List[EnrollmentResponse], Optional[int]]:
+        """Like `page`, over the enrollments in course_id."""
+
+    def seats_taken(self, course_id: UUID) -> int:
+        """How many enrollments course_id has; stores keep a count so this is O(1)."""
+        return len(self.for_course(course_id))
+
+    def delete_for_user(self, user_id: UUID) -> int:
+        """Delete every enrollment of user_id; return how many were removed."""
+        return self._delete_all(self.for_user(user_id))
+
+    def delete_for_course(self, course_id: UUID) -> int:
+        """Delete every enrollment in course_id; return how many were removed."""
+        return self._delete_all(self.for_course(course_id))
+
+    def _delete_all(self, enrollments):
+        removed = 0
+        for enrollment in enrollments:
+            if self.pop(enrollment.id, None) is not None:
+                removed += 1
+        return removed
+
+
+def waitlist_entry_id(course_id: UUID, user_id: UUID) -> UUID:
+    #a student is queued for a course at most once, so the pair names the entry
+    return uuid5(course_id, user_id.hex)
+
+
+class WaitlistRepository(ABC):
+    """FIFO queues of students per course, each student at most once per queue."""
+
+    blocking = True
+
+    @abstractmethod
+    def join(self, course_id: UUID, user_id: UUID) -> int:
+        """Queue user_id at the back; returns their position (1 is next).
+        Raises ValueError if they're already queued."""
+
+    @abstractmethod
+    def leave(self, course_id: UUID, user_id: UUID) -> bool:
+        """Take user_id off the queue; False if they weren't on it."""
+
+    @abstractmethod
+    def position(self, course_id: UUID, user_id: UUID) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def waiting(self, course_id: UUID) -> int:
+        ...
+
+    @abstractmethod
+    def head(self, course_id: UUID) -> Optional[UUID]:
+        ...
+
+    @abstractmethod
+    def drop_course(self, course_id: UUID) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
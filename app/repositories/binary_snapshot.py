@@ -0,0 +1,367 @@
+"""Fixed-width, memory-mapped snapshot format for the memory stores.
+
+Layout: an 8 byte magic, a little-endian u32 header length and a JSON
+header describing where every section starts, then the sections, each
+aligned to 8 bytes. Every table stores its rows column by column in
+insertion order:
+
+- UUIDs as 16 raw bytes
+- timestamps as int64 microseconds since the epoch, with a per-row flags
+  byte recording which timestamps are present and timezone-aware
+- strings as u32 indexes into a shared string table
+  (u32 offsets followed by one UTF-8 blob)
+
+Each table also carries u32 row permutations sorted by id and by its
+lookup keys (normalized email/code, (user_id, course_id), course_id), so
+point lookups are binary searches over the mapped file. Nothing is decoded
+until a row is asked for.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from app.repositories.base_repository import normalize_key
+from app.schemas.user_schema import UserResponse, UserRole
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse, WaitlistEntry
+
+
+MAGIC = b"CESNAP01"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_ROLES = list(UserRole)
+
+#flags byte bits
+_FIRST_AWARE = 1
+_SECOND_SET = 2
+_SECOND_AWARE = 4
+
+
+def _micros(value):
+    if value.tzinfo is None:
+        return (value - _EPOCH_NAIVE) // timedelta(microseconds=1)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value, aware):
+    return (_EPOCH if aware else _EPOCH_NAIVE) + timedelta(microseconds=value)
+
+
+def _time_flags(first, second=None):
+    flags = _FIRST_AWARE if first.tzinfo is not None else 0
+    if second is not None:
+        flags |= _SECOND_SET | (_SECOND_AWARE if second.tzinfo is not None else 0)
+    return flags
+
+
+class _Writer:
+    def __init__(self):
+        self.strings = []
+        self.sections = []
+        self.size = 0
+
+    def string(self, value):
+        self.strings.append(value.encode())
+        return len(self.strings) - 1
+
+    def section(self, data):
+        data = bytes(data)
+        offset = self.size
+        self.sections.append(data + b"\0" * (-len(data) % 8))
+        self.size += len(self.sections[-1])
+        return [offset, len(data)]
+
+
+def _perm(count, key):
+    return array("I", sorted(range(count), key=key))
+
+
+def _write_users(writer, users):
+    ids, names, emails, keys = bytearray(), array("I"), array("I"), array("I")
+    roles, flags, created, updated = bytearray(), bytearray(), array("q"), array("q")
+    key_bytes = []
+    for user in users:
+        ids += user.id.bytes
+        names.append(writer.string(user.name))
+        emails.append(writer.string(str(user.email)))
+        key = normalize_key(str(user.email))
+        keys.append(writer.string(key))
+        key_bytes.append(key.encode())
+        roles.append(_ROLES.index(UserRole(user.role)))
+        flags.append(_time_flags(user.created_at, user.updated_at))
+        created.append(_micros(user.created_at))
+        updated.append(0 if user.updated_at is None else _micros(user.updated_at))
+    count = len(names)
+    return count, {
+        "id": writer.section(ids), "name": writer.section(names), "email": writer.section(emails),
+        "key": writer.section(keys), "role": writer.section(roles), "flags": writer.section(flags),
+        "created": writer.section(created), "updated": writer.section(updated),
+        "by_id": writer.section(_perm(count, lambda r: ids[r * 16:r * 16 + 16])),
+        "by_key": writer.section(_perm(count, key_bytes.__getitem__)),
+    }
+
+
+def _write_courses(writer, courses):
+    ids, codes, keys, titles = bytearray(), array("I"), array("I"), array("I")
+    flags, created, updated, capacities = bytearray(), array("q"), array("q"), array("q")
+    key_bytes = []
+    for course in courses:
+        ids += course.id.bytes
+        codes.append(writer.string(course.code))
+        key = normalize_key(course.code)
+        keys.append(writer.string(key))
+        key_bytes.append(key.encode())
+        titles.append(writer.string(course.title))
+        flags.append(_time_flags(course.created_at, course.updated_at))
+        created.append(_micros(course.created_at))
+        updated.append(0 if course.updated_at is None else _micros(course.updated_at))
+        #0 for no limit; capacities are at least 1
+        capacities.append(course.capacity or 0)
+    count = len(codes)
+    return count, {
+        "id": writer.section(ids), "code": writer.section(codes), "key": writer.section(keys),
+        "title": writer.section(titles), "flags": writer.section(flags),
+        "created": writer.section(created), "updated": writer.section(updated),
+        "capacity": writer.section(capacities),
+        "by_id": writer.section(_perm(count, lambda r: ids[r * 16:r * 16 + 16])),
+        "by_key": writer.section(_perm(count, key_bytes.__getitem__)),
+    }
+
+
+def _write_enrollments(writer, enrollments):
+    ids, user_ids, course_ids = bytearray(), bytearray(), bytearray()
+    flags, enrolled = bytearray(), array("q")
+    for enrollment in enrollments:
+        ids += enrollment.id.bytes
+        user_ids += enrollment.user_id.bytes
+        course_ids += enrollment.course_id.bytes
+        flags.append(_time_flags(enrollment.enrolled_on))
+        enrolled.append(_micros(enrollment.enrolled_on))
+    count = len(enrolled)
+    return count, {
+        "id": writer.section(ids), "user_id": writer.section(user_ids),
+        "course_id": writer.section(course_ids), "flags": writer.section(flags),
+        "enrolled": writer.section(enrolled),
+        "by_id": writer.section(_perm(count, lambda r: ids[r * 16:r * 16 + 16])),
+        "by_pair": writer.section(_perm(
+            count, lambda r: user_ids[r * 16:r * 16 + 16] + course_ids[r * 16:r * 16 + 16]
+        )),
+        "by_course": writer.section(_perm(count, lambda r: (course_ids[r * 16:r * 16 + 16], r))),
+    }
+
+
+def _write_waitlists(writer, entries):
+    #small, and loaded whole on recovery: no lookup permutations
+    ids, course_ids, user_ids = bytearray(), bytearray(), bytearray()
+    count = 0
+    for entry in entries:
+        ids += entry.id.bytes
+        course_ids += entry.course_id.bytes
+        user_ids += entry.user_id.bytes
+        count += 1
+    return count, {
+        "id": writer.section(ids), "course_id": writer.section(course_ids), "user_id": writer.section(user_ids),
+    }
+
+
+_WRITERS = {
+    "users": _write_users, "courses": _write_courses, "enrollments": _write_enrollments,
+    "waitlists": _write_waitlists,
+}
+
+
+def write_binary_snapshot(path, seq, stores):
+    """Write {store name: iterable of entities} to path."""
+    writer = _Writer()
+    tables = {}
+    for name, entities in stores.items():
+        count, columns = _WRITERS[name](writer, entities)
+        tables[name] = {"count": count, "columns": columns}
+    offsets = array("I", [0])
+    for value in writer.strings:
+        offsets.append(offsets[-1] + len(value))
+    strings = {"offsets": writer.section(offsets), "blob": writer.section(b"".join(writer.strings))}
+    header = json.dumps({"seq": seq, "tables": tables, "strings": strings}).encode()
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % 8)
+    with open(path, "wb") as snapshot:
+        snapshot.write(prefix)
+        for data in writer.sections:
+            snapshot.write(data)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+
+
+class _StringTable:
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def raw(self, index):
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]])
+
+    def __getitem__(self, index):
+        return self.raw(index).decode()
+
+
+class _Table:
+    """Read-only view of one table in a mapped snapshot."""
+
+    _formats = {"by_id": "I", "by_key": "I", "by_pair": "I", "by_course": "I",
+                "name": "I", "email": "I", "key": "I", "code": "I", "title": "I",
+                "created": "q", "updated": "q", "enrolled": "q", "capacity": "q"}
+
+    def __init__(self, view, spec, strings):
+        self._count = spec["count"]
+        self._strings = strings
+        for column, (offset, length) in spec["columns"].items():
+            data = view[offset:offset + length]
+            fmt = self._formats.get(column)
+            setattr(self, "_" + column, data.cast(fmt) if fmt else data)
+
+    def __len__(self):
+        return self._count
+
+    def _id_bytes(self, row):
+        return bytes(self._id[row * 16:row * 16 + 16])
+
+    def id_at(self, row):
+        return UUID(bytes=self._id_bytes(row))
+
+    def ids(self):
+        return (self.id_at(row) for row in range(self._count))
+
+    def find(self, entity_id):
+        """Return the row holding entity_id, or -1."""
+        if not isinstance(entity_id, UUID):
+            return -1
+        target = entity_id.bytes
+        position = bisect_left(self._by_id, target, key=self._id_bytes)
+        if position < self._count and self._id_bytes(self._by_id[position]) == target:
+            return self._by_id[position]
+        return -1
+
+    def _time(self, values, row, aware):
+        return _from_micros(values[row], aware)
+
+
+class _KeyedTable(_Table):
+    def _key_bytes(self, row):
+        return self._strings.raw(self._key[row])
+
+    def owner_of(self, key):
+        target = normalize_key(key).encode()
+        position = bisect_left(self._by_key, target, key=self._key_bytes)
+        if position < self._count and self._key_bytes(self._by_key[position]) == target:
+            return self.id_at(self._by_key[position])
+        return None
+
+
+class UserTable(_KeyedTable):
+    def decode(self, row):
+        flags = self._flags[row]
+        return UserResponse.model_construct(
+            id=self.id_at(row),
+            name=self._strings[self._name[row]],
+            email=self._strings[self._email[row]],
+            role=_ROLES[self._role[row]],
+            created_at=self._time(self._created, row, flags & _FIRST_AWARE),
+            updated_at=self._time(self._updated, row, flags & _SECOND_AWARE) if flags & _SECOND_SET else None,
+        )
+
+
+class CourseTable(_KeyedTable):
+    #snapshots written before capacities have no such column
+    _capacity = None
+
+    def decode(self, row):
+        flags = self._flags[row]
+        return CourseResponse.model_construct(
+            id=self.id_at(row),
+            code=self._strings[self._code[row]],
+            title=self._strings[self._title[row]],
+            created_at=self._time(self._created, row, flags & _FIRST_AWARE),
+            updated_at=self._time(self._updated, row, flags & _SECOND_AWARE) if flags & _SECOND_SET else None,
+            capacity=None if self._capacity is None else self._capacity[row] or None,
+        )
+
+
+class EnrollmentTable(_Table):
+    def _user_bytes(self, row):
+        return bytes(self._user_id[row * 16:row * 16 + 16])
+
+    def _course_bytes(self, row):
+        return bytes(self._course_id[row * 16:row * 16 + 16])
+
+    def _pair_bytes(self, row):
+        return self._user_bytes(row) + self._course_bytes(row)
+
+    def decode(self, row):
+        return EnrollmentResponse.model_construct(
+            id=self.id_at(row),
+            user_id=UUID(bytes=self._user_bytes(row)),
+            course_id=UUID(bytes=self._course_bytes(row)),
+            enrolled_on=self._time(self._enrolled, row, self._flags[row] & _FIRST_AWARE),
+        )
+
+    def find_pair(self, user_id, course_id):
+        target = user_id.bytes + course_id.bytes
+        position = bisect_left(self._by_pair, target, key=self._pair_bytes)
+        if position < self._count and self._pair_bytes(self._by_pair[position]) == target:
+            return self.id_at(self._by_pair[position])
+        return None
+
+    def ids_for_user(self, user_id):
+        target = user_id.bytes
+        user_of = lambda row: self._user_bytes(row)
+        start = bisect_left(self._by_pair, target, key=user_of)
+        end = bisect_right(self._by_pair, target, lo=start, key=user_of)
+        return [self.id_at(row) for row in sorted(self._by_pair[start:end])]
+
+    def ids_for_course(self, course_id):
+        target = course_id.bytes
+        start = bisect_left(self._by_course, target, key=self._course_bytes)
+        end = bisect_right(self._by_course, target, lo=start, key=self._course_bytes)
+        return [self.id_at(row) for row in self._by_course[start:end]]
+
+
+class WaitlistTable(_Table):
+    def decode(self, row):
+        return WaitlistEntry.model_construct(
+            id=self.id_at(row),
+            course_id=UUID(bytes=bytes(self._course_id[row * 16:row * 16 + 16])),
+            user_id=UUID(bytes=bytes(self._user_id[row * 16:row * 16 + 16])),
+        )
+
+
+_TABLES = {"users": UserTable, "courses": CourseTable, "enrollments": EnrollmentTable, "waitlists": WaitlistTable}
+
+
+class BinarySnapshot:
+    """A snapshot file mapped into memory; `tables` holds one view per store."""
+
+    def __init__(self, path):
+        with open(path, "rb") as snapshot:
+            self._mmap = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if bytes(view[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a binary snapshot")
+        (header_length,) = struct.unpack_from("<I", view, 8)
+        header = json.loads(bytes(view[12:12 + header_length]))
+        base = 12 + header_length + (-(12 + header_length) % 8)
+        self.seq = header["seq"]
+
+        def section(offset_length):
+            offset, length = offset_length
+            return view[base + offset:base + offset + length]
+
+        strings = _StringTable(section(header["strings"]["offsets"]).cast("I"),
+                               section(header["strings"]["blob"]))
+        self.tables = {}
+        for name, spec in header["tables"].items():
+            columns = {column: [base + offset, length] for column, (offset, length) in spec["columns"].items()}
+            self.tables[name] = _TABLES[name](view, {"count": spec["count"], "columns": columns}, strings)
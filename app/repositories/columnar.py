@@ -0,0 +1,467 @@
+"""Compact column storage for enrollments.
+
+An EnrollmentResponse in a dict costs several hundred bytes: the model,
+its __dict__, three UUID objects and a datetime. EnrollmentColumns keeps
+the same data in flat arrays instead:
+
+- user and course UUIDs are interned to dense integer ids, stored as u32
+- enrollment ids are 16 raw bytes
+- enrolled_on is int64 microseconds plus a flags byte
+- an open-addressing hash table of row numbers (array of int64)
+  replaces the id -> object dict
+- per-user and per-course row lists are u32 arrays
+- a u64 sequence number per row records the global insertion order
+
+EnrollmentResponse objects are built only when a row is read.
+
+ShardedColumns splits the table into partitions by user id, each behind
+its own lock, for concurrent writers.
+"""
+import contextlib
+import heapq
+import itertools
+import threading
+from array import array
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from app.schemas.enrollment_schema import EnrollmentResponse
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+#flags byte bits
+_AWARE = 1
+_DELETED = 2
+
+_EMPTY = 0
+_TOMBSTONE = -1
+
+
+class _Interner:
+    """Maps UUIDs to dense integer ids and back. Safe to share between
+    threads: lookups are lock-free, new ids are assigned under a lock."""
+
+    def __init__(self):
+        self.ids = []
+        self.index = {}
+        self._lock = threading.Lock()
+
+    def intern(self, value):
+        number = self.index.get(value)
+        if number is None:
+            with self._lock:
+                number = self.index.get(value)
+                if number is None:
+                    self.ids.append(value)
+                    number = self.index[value] = len(self.ids) - 1
+        return number
+
+
+class EnrollmentColumns:
+    """Dict-like table of enrollments keyed by enrollment id, in insertion
+    order, with (user_id, course_id) lookup and per-user / per-course listings.
+
+    Deleted rows are flagged and skipped; once they outnumber live rows the
+    table is rebuilt, which renumbers rows but keeps their order.
+    """
+
+    def __init__(self, users=None, courses=None, sequence=None):
+        self._users = users or _Interner()
+        self._courses = courses or _Interner()
+        #shared between partitions so their rows can be merged in order
+        self._sequence = sequence or itertools.count()
+        self._clear_rows()
+
+    def _clear_rows(self):
+        self._ids = bytearray()
+        self._user = array("I")
+        self._course = array("I")
+        self._enrolled = array("q")
+        self._flags = bytearray()
+        self._seq = array("Q")
+        self._slots = array("q", bytes(8 * 8))
+        self._used_slots = 0
+        self._by_user = {}
+        self._by_course = {}
+        self._live = 0
+
+    def clear(self):
+        self._users = _Interner()
+        self._courses = _Interner()
+        self._clear_rows()
+
+    #--- id hash table
+    def _probe(self, entity_id):
+        """Return (slot, row) for entity_id; row is -1 and slot is the
+        insertion slot when the id is absent."""
+        if not isinstance(entity_id, UUID):
+            return -1, -1
+        target = entity_id.bytes
+        slots = self._slots
+        mask = len(slots) - 1
+        position = hash(entity_id) & mask
+        free = -1
+        while True:
+            value = slots[position]
+            if value == _EMPTY:
+                return (position if free < 0 else free), -1
+            if value == _TOMBSTONE:
+                if free < 0:
+                    free = position
+            elif self._ids[(value - 1) * 16:value * 16] == target:
+                return position, value - 1
+            position = (position + 1) & mask
+
+    def _rehash(self, capacity):
+        self._slots = array("q", bytes(8 * capacity))
+        self._used_slots = 0
+        for row in range(len(self._enrolled)):
+            if not self._flags[row] & _DELETED:
+                slot, _ = self._probe(self._id_at(row))
+                self._slots[slot] = row + 1
+                self._used_slots += 1
+
+    #--- row access
+    def _id_at(self, row):
+        return UUID(bytes=bytes(self._ids[row * 16:row * 16 + 16]))
+
+    def _materialize(self, row, entity_id=None):
+        micros = self._enrolled[row]
+        if self._flags[row] & _AWARE:
+            enrolled_on = _EPOCH + micros * _MICROSECOND
+        else:
+            enrolled_on = _EPOCH_NAIVE + micros * _MICROSECOND
+        return EnrollmentResponse.model_construct(
+            id=entity_id or self._id_at(row),
+            user_id=self._users.ids[self._user[row]],
+            course_id=self._courses.ids[self._course[row]],
+            enrolled_on=enrolled_on,
+        )
+
+    def _rows(self):
+        flags = self._flags
+        return (row for row in range(len(flags)) if not flags[row] & _DELETED)
+
+    def get(self, entity_id, default=None):
+        _, row = self._probe(entity_id)
+        return default if row < 0 else self._materialize(row, entity_id)
+
+    def __getitem__(self, entity_id):
+        _, row = self._probe(entity_id)
+        if row < 0:
+            raise KeyError(entity_id)
+        return self._materialize(row, entity_id)
+
+    def __contains__(self, entity_id):
+        return self._probe(entity_id)[1] >= 0
+
+    def __len__(self):
+        return self._live
+
+    def __iter__(self):
+        return (self._id_at(row) for row in self._rows())
+
+    def values(self):
+        return [self._materialize(row) for row in self._rows()]
+
+    def items(self):
+        return [(entity.id, entity) for entity in self.values()]
+
+    #--- writes
+    def __setitem__(self, entity_id, enrollment):
+        enrolled_on = enrollment.enrolled_on
+        aware = enrolled_on.tzinfo is not None
+        micros = (enrolled_on - (_EPOCH if aware else _EPOCH_NAIVE)) // _MICROSECOND
+        user = self._users.intern(enrollment.user_id)
+        course = self._courses.intern(enrollment.course_id)
+        slot, row = self._probe(entity_id)
+        if row >= 0:
+            if self._user[row] != user:
+                self._move(self._by_user, self._user[row], user, row)
+                self._user[row] = user
+            if self._course[row] != course:
+                self._move(self._by_course, self._course[row], course, row)
+                self._course[row] = course
+            self._enrolled[row] = micros
+            self._flags[row] = _AWARE if aware else 0
+            return
+        row = len(self._enrolled)
+        self._ids += entity_id.bytes
+        self._user.append(user)
+        self._course.append(course)
+        self._enrolled.append(micros)
+        self._flags.append(_AWARE if aware else 0)
+        self._seq.append(next(self._sequence))
+        self._by_user.setdefault(user, array("I")).append(row)
+        self._by_course.setdefault(course, array("I")).append(row)
+        self._live += 1
+        if self._slots[slot] == _EMPTY:
+            self._used_slots += 1
+        self._slots[slot] = row + 1
+        if self._used_slots * 2 > len(self._slots):
+            self._rehash(len(self._slots) * 2 if self._live * 4 > len(self._slots) else len(self._slots))
+
+    @staticmethod
+    def _move(index, old, new, row):
+        rows = index[old]
+        rows.remove(row)
+        if not rows:
+            del index[old]
+        insort(index.setdefault(new, array("I")), row)
+
+    def __delitem__(self, entity_id):
+        slot, row = self._probe(entity_id)
+        if row < 0:
+            raise KeyError(entity_id)
+        self._slots[slot] = _TOMBSTONE
+        self._flags[row] |= _DELETED
+        for index, key in ((self._by_user, self._user[row]), (self._by_course, self._course[row])):
+            rows = index[key]
+            rows.remove(row)
+            if not rows:
+                del index[key]
+        self._live -= 1
+        if len(self._enrolled) > 1024 and self._live * 2 < len(self._enrolled):
+            self._compact()
+
+    def _compact(self):
+        keep = list(self._rows())
+        ids, users, courses = self._ids, self._user, self._course
+        enrolled, flags, seqs = self._enrolled, self._flags, self._seq
+        self._clear_rows()
+        for new_row, row in enumerate(keep):
+            self._ids += ids[row * 16:row * 16 + 16]
+            self._by_user.setdefault(users[row], array("I")).append(new_row)
+            self._by_course.setdefault(courses[row], array("I")).append(new_row)
+        self._user = array("I", (users[row] for row in keep))
+        self._course = array("I", (courses[row] for row in keep))
+        self._enrolled = array("q", (enrolled[row] for row in keep))
+        self._flags = bytearray(flags[row] for row in keep)
+        self._seq = array("Q", (seqs[row] for row in keep))
+        self._live = len(keep)
+        capacity = 8
+        while capacity < self._live * 4:
+            capacity *= 2
+        self._rehash(capacity)
+
+    #--- secondary lookups
+    def find(self, user_id, course_id):
+        """Return the id of the enrollment of user_id in course_id, or None."""
+        user = self._users.index.get(user_id)
+        course = self._courses.index.get(course_id)
+        if user is None or course is None:
+            return None
+        return self._find_interned(user, course)
+
+    def _find_interned(self, user, course):
+        rows = self._by_user.get(user, ())
+        other = self._by_course.get(course, ())
+        if len(other) < len(rows):
+            for row in other:
+                if self._user[row] == user:
+                    return self._id_at(row)
+            return None
+        for row in rows:
+            if self._course[row] == course:
+                return self._id_at(row)
+        return None
+
+    def for_user(self, user_id):
+        user = self._users.index.get(user_id)
+        return [self._materialize(row) for row in self._by_user.get(user, ())]
+
+    def for_course(self, course_id):
+        course = self._courses.index.get(course_id)
+        return [self._materialize(row) for row in self._by_course.get(course, ())]
+
+    def count_for_course(self, course_id):
+        course = self._courses.index.get(course_id)
+        return len(self._by_course.get(course, ()))
+
+    #--- (seq, value) listings for merging partitions
+    def sequenced(self, rows=None, ids_only=False):
+        rows = self._rows() if rows is None else rows
+        if ids_only:
+            return [(self._seq[row], self._id_at(row)) for row in rows]
+        return [(self._seq[row], self._materialize(row)) for row in rows]
+
+
+    def rows_after(self, after, limit, course_id=None):
+        """(seq, row) for up to limit live rows with seq > after, in
+        order, optionally only those in course_id. Rows are in seq order, so
+        this seeks by bisection and costs O(limit) however deep `after` is."""
+        seqs = self._seq
+        if course_id is None:
+            rows = range(bisect_right(seqs, after), len(seqs))
+            flags = self._flags
+            rows = (row for row in rows if not flags[row] & _DELETED)
+        else:
+            listing = self._by_course.get(self._courses.index.get(course_id), ())
+            rows = listing[bisect_right(listing, after, key=seqs.__getitem__):]
+        return [(seqs[row], row) for row in itertools.islice(rows, limit)]
+
+    def copy(self):
+        """Independent copy of the columns (the interners are shared; they only grow)."""
+        other = EnrollmentColumns.__new__(EnrollmentColumns)
+        other._users = self._users
+        other._courses = self._courses
+        other._sequence = self._sequence
+        other._ids = bytearray(self._ids)
+        other._user = array("I", self._user)
+        other._course = array("I", self._course)
+        other._enrolled = array("q", self._enrolled)
+        other._flags = bytearray(self._flags)
+        other._seq = array("Q", self._seq)
+        other._slots = array("q", self._slots)
+        other._used_slots = self._used_slots
+        other._by_user = {key: array("I", rows) for key, rows in self._by_user.items()}
+        other._by_course = {key: array("I", rows) for key, rows in self._by_course.items()}
+        other._live = self._live
+        return other
+
+
+class ShardedColumns:
+    """EnrollmentColumns split into partitions by user id, each guarded by
+    its own lock, with the same dict-like interface.
+
+    A user's rows live in one partition, so (user_id, course_id) lookups and
+    per-user listings touch a single partition and its lock; lookups by
+    enrollment id probe the partitions in turn. Writers for users in
+    different partitions proceed in parallel. Rows carry a global sequence
+    number and listings merge the partitions back into insertion order.
+    """
+
+    def __init__(self, partitions=4):
+        self._count = partitions
+        self.clear()
+
+    def clear(self):
+        users, courses, sequence = _Interner(), _Interner(), itertools.count()
+        self._parts = [EnrollmentColumns(users, courses, sequence) for _ in range(self._count)]
+        self._locks = [threading.RLock() for _ in range(self._count)]
+
+    def _for(self, user_id):
+        index = hash(user_id) % self._count
+        return self._parts[index], self._locks[index]
+
+    def _locate(self, entity_id, skip=None):
+        """Return (partition, lock) holding entity_id, or (None, None)."""
+        for part, lock in zip(self._parts, self._locks):
+            if part is skip:
+                continue
+            with lock:
+                if entity_id in part:
+                    return part, lock
+        return None, None
+
+    def locked(self):
+        """Hold every partition lock (ascending), e.g. to copy a consistent view."""
+        stack = contextlib.ExitStack()
+        for lock in self._locks:
+            stack.enter_context(lock)
+        return stack
+
+    def get(self, entity_id, default=None):
+        for part, lock in zip(self._parts, self._locks):
+            with lock:
+                entity = part.get(entity_id)
+            if entity is not None:
+                return entity
+        return default
+
+    def __getitem__(self, entity_id):
+        entity = self.get(entity_id)
+        if entity is None:
+            raise KeyError(entity_id)
+        return entity
+
+    def __contains__(self, entity_id):
+        return self._locate(entity_id)[0] is not None
+
+    def __setitem__(self, entity_id, enrollment):
+        part, lock = self._for(enrollment.user_id)
+        with lock:
+            if entity_id in part:
+                part[entity_id] = enrollment
+                return
+        #a new row, or one whose user changed: drop any copy elsewhere first
+        current, current_lock = self._locate(entity_id, skip=part)
+        if current is not None:
+            with current_lock:
+                del current[entity_id]
+        with lock:
+            part[entity_id] = enrollment
+
+    def __delitem__(self, entity_id):
+        part, lock = self._locate(entity_id)
+        if part is None:
+            raise KeyError(entity_id)
+        with lock:
+            del part[entity_id]
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+    def _merge(self, listing, index_name=None, key=None):
+        #with an index, partitions that hold no rows for key are skipped
+        #without taking their lock
+        chunks = []
+        for part, lock in zip(self._parts, self._locks):
+            if index_name is not None and key not in getattr(part, index_name):
+                continue
+            with lock:
+                rows = None if index_name is None else getattr(part, index_name).get(key, ())
+                chunks.append(listing(part, rows))
+        return [value for _, value in heapq.merge(*chunks)]
+
+    def __iter__(self):
+        return iter(self._merge(lambda part, rows: part.sequenced(ids_only=True)))
+
+    def values(self):
+        return self._merge(lambda part, rows: part.sequenced())
+
+    def items(self):
+        return [(entity.id, entity) for entity in self.values()]
+
+    def find(self, user_id, course_id):
+        part, lock = self._for(user_id)
+        with lock:
+            return part.find(user_id, course_id)
+
+    def for_user(self, user_id):
+        part, lock = self._for(user_id)
+        with lock:
+            return part.for_user(user_id)
+
+    def for_course(self, course_id):
+        course = self._parts[0]._courses.index.get(course_id)
+        return self._merge(lambda part, rows: part.sequenced(rows), "_by_course", course)
+
+    def count_for_course(self, course_id):
+        #one length per partition
+        return sum(part.count_for_course(course_id) for part in self._parts)
+
+    def page(self, after, limit, course_id=None):
+        """(seq, enrollment) for the first limit rows with seq > after, merged
+        across partitions in insertion order; see EnrollmentColumns.rows_after."""
+        with self.locked():
+            chunks = [
+                [(seq, index, row) for seq, row in part.rows_after(after, limit, course_id)]
+                for index, part in enumerate(self._parts)
+            ]
+            #only the rows that make the page are materialized
+            return [
+                (seq, self._parts[index]._materialize(row))
+                for seq, index, row in itertools.islice(heapq.merge(*chunks), limit)
+            ]
+
+    def copy(self):
+        other = ShardedColumns.__new__(ShardedColumns)
+        other._count = self._count
+        with self.locked():
+            other._parts = [part.copy() for part in self._parts]
+        other._locks = [threading.RLock() for _ in range(self._count)]
+        return other
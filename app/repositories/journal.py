@@ -0,0 +1,291 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, NamedTuple
+from uuid import UUID
+from app.repositories.binary_snapshot import BinarySnapshot, write_binary_snapshot
+from app.schemas.user_schema import UserResponse, UserRole
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse, WaitlistEntry
+
+
+def _time_out(value):
+    return None if value is None else value.isoformat()
+
+
+def _time_in(value):
+    return None if value is None else datetime.fromisoformat(value)
+
+
+_UUID = (lambda value: value.hex, lambda value: UUID(hex=value))
+_TIME = (_time_out, _time_in)
+_TEXT = (str, str)
+_PLAIN = (lambda value: value, lambda value: value)
+_ROLE = (lambda value: UserRole(value).value, UserRole)
+
+#Row layout per store: the model and (field, (encode, decode)) in order. Fields
+#added later go last: rows written before them are shorter and decode to the default
+CODECS = {
+    "users": (UserResponse, (("id", _UUID), ("name", _TEXT), ("email", _TEXT), ("role", _ROLE),
+                             ("created_at", _TIME), ("updated_at", _TIME))),
+    "courses": (CourseResponse, (("id", _UUID), ("code", _TEXT), ("title", _TEXT),
+                                 ("created_at", _TIME), ("updated_at", _TIME), ("capacity", _PLAIN))),
+    "enrollments": (EnrollmentResponse, (("id", _UUID), ("user_id", _UUID), ("course_id", _UUID),
+                                         ("enrolled_on", _TIME))),
+    "waitlists": (WaitlistEntry, (("id", _UUID), ("course_id", _UUID), ("user_id", _UUID))),
+}
+
+
+def encode_row(store_name, entity):
+    _, fields = CODECS[store_name]
+    return [codec[0](getattr(entity, name)) for name, codec in fields]
+
+
+def decode_row(store_name, row):
+    model, fields = CODECS[store_name]
+    return model.model_construct(**{name: codec[1](value) for (name, codec), value in zip(fields, row)})
+
+
+class RecoveryStats(NamedTuple):
+    snapshot_seq: int
+    snapshot_rows: int
+    replayed: int
+    seconds: float
+
+
+class Journal:
+    """Append-only operation log plus periodic snapshots for the memory stores.
+
+    Every put/delete/clear on an attached store is appended to the current
+    log segment as one JSON line tagged with a sequence number. The file is
+    flushed and fsynced once `fsync_batch` records are pending, or by a
+    background thread after `fsync_interval` seconds, so a crash can lose at
+    most that window of writes.
+
+    Every `snapshot_every` records (checked by the stores through
+    `maybe_snapshot`) the log rotates to a new segment and the stores are
+    written to a compacted snapshot in the background; segments
+    the snapshot covers are then deleted. `recover` loads the newest
+    snapshot and replays the log records after it.
+
+    Snapshots are NDJSON by default. With snapshot_format="binary" they use
+    the memory-mapped format in binary_snapshot.py, which recovery attaches
+    to the stores as-is, so rows are only decoded when first read.
+    """
+
+    def __init__(self, directory, stores: Dict[str, object], fsync_batch=64,
+                 fsync_interval=0.05, snapshot_every=100_000, snapshot_format="json"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.stores = stores
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_format = snapshot_format
+        self.seq = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._pending = 0
+        self._since_snapshot = 0
+        self._snapshot_thread = None
+        self._closed = threading.Event()
+        self._flusher = None
+
+    #File naming: both carry the sequence number they start after / cover
+    def _segment_path(self, first_seq):
+        return self.directory / f"wal-{first_seq:020d}.log"
+
+    def _snapshot_path(self, seq):
+        suffix = "bin" if self.snapshot_format == "binary" else "ndjson"
+        return self.directory / f"snapshot-{seq:020d}.{suffix}"
+
+    def _segments(self):
+        return sorted(self.directory.glob("wal-*.log"))
+
+    def _snapshots(self):
+        paths = [*self.directory.glob("snapshot-*.ndjson"), *self.directory.glob("snapshot-*.bin")]
+        return sorted(paths, key=self._seq_of)
+
+    @staticmethod
+    def _seq_of(path):
+        return int(path.stem.split("-")[1])
+
+    def recover(self) -> RecoveryStats:
+        """Rebuild the stores from disk, then start logging. Call before attaching."""
+        started = time.perf_counter()
+        snapshot_seq = snapshot_rows = replayed = 0
+        snapshots = self._snapshots()
+        if snapshots:
+            snapshot_seq = self._seq_of(snapshots[-1])
+            snapshot_rows = self._load_snapshot(snapshots[-1])
+        self.seq = snapshot_seq
+        for segment in self._segments():
+            replayed += self._replay(segment, snapshot_seq)
+        self._open_segment()
+        self._flusher = threading.Thread(target=self._flush_loop, name="journal-flush", daemon=True)
+        self._flusher.start()
+        return RecoveryStats(snapshot_seq, snapshot_rows, replayed, time.perf_counter() - started)
+
+    def _load_snapshot(self, path):
+        if path.suffix == ".bin":
+            snapshot = BinarySnapshot(path)
+            for store_name, table in snapshot.tables.items():
+                self.stores[store_name].attach_base(table)
+            return sum(len(table) for table in snapshot.tables.values())
+        rows = 0
+        with open(path, "rb") as snapshot:
+            snapshot.readline()  #header
+            for line in snapshot:
+                store_name, row = json.loads(line)
+                entity = decode_row(store_name, row)
+                self.stores[store_name][entity.id] = entity
+                rows += 1
+        return rows
+
+    def _replay(self, path, after_seq):
+        replayed = 0
+        good_offset = 0
+        with open(path, "rb+") as segment:
+            for line in segment:
+                try:
+                    seq, store_name, op, payload = json.loads(line)
+                except ValueError:
+                    #torn write from a crash: drop the partial tail
+                    segment.truncate(good_offset)
+                    break
+                good_offset += len(line)
+                self.seq = max(self.seq, seq)
+                if seq <= after_seq:
+                    continue
+                self._apply(store_name, op, payload)
+                replayed += 1
+        return replayed
+
+    def _apply(self, store_name, op, payload):
+        store = self.stores[store_name]
+        if op == "put":
+            entity = decode_row(store_name, payload)
+            store[entity.id] = entity
+        elif op == "del":
+            store.pop(UUID(hex=payload), None)
+        elif op == "clear":
+            store.clear()
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+        self._file = open(self._segment_path(self.seq + 1), "ab")
+
+    def put(self, store_name, entity):
+        self._append(store_name, "put", encode_row(store_name, entity))
+
+    def delete(self, store_name, entity_id):
+        self._append(store_name, "del", entity_id.hex)
+
+    def clear(self, store_name):
+        self._append(store_name, "clear", None)
+
+    def _append(self, store_name, op, payload):
+        with self._lock:
+            self.seq += 1
+            self._file.write(json.dumps([self.seq, store_name, op, payload], separators=(",", ":")).encode() + b"\n")
+            self._pending += 1
+            if self._pending >= self.fsync_batch:
+                self._sync()
+            self._since_snapshot += 1
+
+    def _sync(self):
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if self._file is not None:
+                    self._sync()
+
+    def snapshot(self, wait=True):
+        """Compact everything logged so far into a snapshot."""
+        thread = self._start_snapshot(force=True)
+        if wait and thread is not None:
+            thread.join()
+
+    def maybe_snapshot(self):
+        """Start a background snapshot once `snapshot_every` records are logged.
+
+        Stores call this after a write, once they have released their own
+        locks: capturing locks every store and then the journal, the same
+        order writers take them in.
+        """
+        if self._since_snapshot >= self.snapshot_every:
+            self._start_snapshot(force=False)
+
+    def _start_snapshot(self, force):
+        with contextlib.ExitStack() as stack:
+            for store in self.stores.values():
+                stack.enter_context(store.locked())
+            with self._lock:
+                return self._capture(force)
+
+    def _capture(self, force):
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return None
+        if not force and self._since_snapshot < self.snapshot_every:
+            return None
+        seq = self.seq
+        self._open_segment()
+        self._since_snapshot = 0
+        #stores are locked, so this is a consistent cut at seq
+        captured = {name: store.frozen_values() for name, store in self.stores.items()}
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot, args=(seq, captured), name="journal-snapshot", daemon=True
+        )
+        self._snapshot_thread.start()
+        return self._snapshot_thread
+
+    def _write_snapshot(self, seq, captured):
+        path = self._snapshot_path(seq)
+        tmp_path = path.with_suffix(".tmp")
+        if self.snapshot_format == "binary":
+            write_binary_snapshot(tmp_path, seq, captured)
+        else:
+            self._write_json_snapshot(tmp_path, seq, captured)
+        os.replace(tmp_path, path)
+        for old in self._snapshots():
+            if self._seq_of(old) < seq:
+                old.unlink()
+        for segment in self._segments():
+            if self._seq_of(segment) <= seq:
+                segment.unlink()
+
+    @staticmethod
+    def _write_json_snapshot(path, seq, captured):
+        captured = {name: list(entities) for name, entities in captured.items()}
+        with open(path, "wb") as snapshot:
+            header = {"seq": seq, "counts": {name: len(rows) for name, rows in captured.items()}}
+            snapshot.write(json.dumps(header).encode() + b"\n")
+            for store_name, entities in captured.items():
+                for entity in entities:
+                    line = json.dumps([store_name, encode_row(store_name, entity)], separators=(",", ":"))
+                    snapshot.write(line.encode() + b"\n")
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
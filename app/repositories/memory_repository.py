@@ -0,0 +1,493 @@
+import contextlib
+import itertools
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from app.repositories.base_repository import (
+    CourseRepository,
+    EnrollmentRepository,
+    UserRepository,
+    normalize_key,
+)
+from app.repositories.columnar import ShardedColumns
+from app.repositories.sharding import ShardLocks
+
+
+class _InsertionOrder:
+    """Ids under increasing sequence numbers, for paging in insertion order.
+
+    Deleting an id leaves a hole, so the remaining ids keep their numbers;
+    holes are dropped once they outnumber the live ids.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self.clear()
+
+    def clear(self):
+        self._seqs = array("Q")
+        self._ids = []
+        self._seq_of = {}
+        self._holes = 0
+
+    def add(self, entity_id):
+        with self._lock:
+            if entity_id not in self._seq_of:
+                seq = self._seq_of[entity_id] = next(self._sequence)
+                self._seqs.append(seq)
+                self._ids.append(entity_id)
+
+    def discard(self, entity_id):
+        with self._lock:
+            seq = self._seq_of.pop(entity_id, None)
+            if seq is None:
+                return
+            self._ids[bisect_left(self._seqs, seq)] = None
+            self._holes += 1
+            if self._holes > 1024 and self._holes * 2 > len(self._ids):
+                live = [index for index, entity_id in enumerate(self._ids) if entity_id is not None]
+                self._seqs = array("Q", (self._seqs[index] for index in live))
+                self._ids = [self._ids[index] for index in live]
+                self._holes = 0
+
+    def after(self, seq, limit):
+        """Up to limit (seq, id) pairs with sequence numbers above seq."""
+        with self._lock:
+            found = []
+            for index in range(bisect_right(self._seqs, seq), len(self._ids)):
+                if self._ids[index] is not None:
+                    found.append((self._seqs[index], self._ids[index]))
+                    if len(found) == limit:
+                        break
+            return found
+
+
+class _MemoryStore:
+    """Entities keyed by id in a dict, optionally layered over a read-only
+    snapshot table (see binary_snapshot.py).
+
+    Snapshot rows are decoded the first time they are read and promoted into
+    the dict. `_shadowed` holds the ids of snapshot rows that were promoted,
+    replaced or deleted, so the snapshot copy is never consulted again.
+    Subclasses maintain their secondary indexes in `_index` / `_unindex`.
+
+    Safe for concurrent use: single dict operations are atomic, and every
+    write or promotion holds the lock shards of the keys it touches (the id
+    plus whatever `_lock_keys` adds), so writes to one entity, or to one
+    unique key, are serialized while unrelated writes run in parallel.
+    """
+
+    name = ""
+    journal = None
+
+    def __init__(self, lock_shards=64):
+        self._rows = {}
+        self._base = None
+        self._shadowed = set()
+        self._locks = ShardLocks(lock_shards)
+
+    @property
+    def blocking(self):
+        #only writing the journal (and fsyncing it) can wait on the disk
+        return self.journal is not None
+
+    def _lock_keys(self, entity_id, entity):
+        """Keys a write of entity (None for a delete) must lock besides its id."""
+        return ()
+
+    def _locked(self, entity_id, entity, action):
+        #the keys can move until the id's shard is held, so re-check them
+        while True:
+            keys = self._lock_keys(entity_id, entity)
+            with self._locks.hold(entity_id, *keys):
+                if self._lock_keys(entity_id, entity) == keys:
+                    return action()
+
+    def locked(self):
+        """Block every writer, e.g. while a snapshot is captured."""
+        return self._locks.hold_all()
+
+    def attach_base(self, table):
+        self._base = table
+        self._shadowed = set()
+
+    def _index(self, entity_id, entity):
+        pass
+
+    def _unindex(self, entity_id):
+        pass
+
+    def _check_unique(self, entity_id, entity):
+        pass
+
+    def _from_base(self, entity_id):
+        if self._base is None:
+            return None
+        if entity_id in self._shadowed:
+            #promoted by another thread since the caller looked
+            return self._rows.get(entity_id)
+        row = self._base.find(entity_id)
+        if row < 0:
+            return None
+        entity = self._base.decode(row)
+
+        def promote():
+            if entity_id in self._shadowed:
+                return self._rows.get(entity_id)
+            self._rows[entity_id] = entity
+            self._index(entity_id, entity)
+            self._shadowed.add(entity_id)
+            return entity
+        return self._locked(entity_id, entity, promote)
+
+    def _shadow(self, entity_id):
+        """Hide the snapshot row for entity_id; return whether there was one."""
+        if self._base is None or entity_id in self._shadowed or self._base.find(entity_id) < 0:
+            return False
+        self._shadowed.add(entity_id)
+        return True
+
+    def get(self, entity_id, default=None):
+        entity = self._rows.get(entity_id)
+        if entity is None and self._base is not None:
+            entity = self._from_base(entity_id)
+        return default if entity is None else entity
+
+    def __getitem__(self, entity_id):
+        entity = self.get(entity_id)
+        if entity is None:
+            raise KeyError(entity_id)
+        return entity
+
+    def __contains__(self, entity_id):
+        return self.get(entity_id) is not None
+
+    def __setitem__(self, entity_id, entity):
+        self._locked(entity_id, entity, lambda: self._put(entity_id, entity))
+        if self.journal is not None:
+            self.journal.maybe_snapshot()
+
+    def _put(self, entity_id, entity):
+        self._check_unique(entity_id, entity)
+        self._replace(entity_id)
+        self._rows[entity_id] = entity
+        self._index(entity_id, entity)
+        if self.journal is not None:
+            self.journal.put(self.name, entity)
+
+    def put_many(self, entities):
+        #all shards are taken once for the whole batch instead of per row;
+        #writers to this store wait for it, readers don't
+        written = []
+        with self._locks.hold_all():
+            try:
+                for entity in entities:
+                    previous = self.get(entity.id)
+                    self._put(entity.id, entity)
+                    written.append((entity.id, previous))
+            except ValueError:
+                for entity_id, previous in reversed(written):
+                    if previous is None:
+                        self._delete(entity_id)
+                    else:
+                        self._put(entity_id, previous)
+                raise
+        if self.journal is not None:
+            self.journal.maybe_snapshot()
+
+    def insert_many(self, entities):
+        written = []
+        with self._locks.hold_all():
+            try:
+                for entity in entities:
+                    self._put(entity.id, entity)
+                    written.append(entity.id)
+            except ValueError:
+                for entity_id in reversed(written):
+                    self._delete(entity_id)
+                raise
+        if self.journal is not None:
+            self.journal.maybe_snapshot()
+
+    def _replace(self, entity_id):
+        """Clear what an existing row or snapshot row for entity_id left behind."""
+        if entity_id in self._rows:
+            self._unindex(entity_id)
+        else:
+            self._shadow(entity_id)
+
+    def __delitem__(self, entity_id):
+        self._locked(entity_id, None, lambda: self._delete(entity_id))
+        if self.journal is not None:
+            self.journal.maybe_snapshot()
+
+    def _delete(self, entity_id):
+        try:
+            del self._rows[entity_id]
+        except KeyError:
+            if not self._shadow(entity_id):
+                raise
+        else:
+            self._unindex(entity_id)
+        if self.journal is not None:
+            self.journal.delete(self.name, entity_id)
+
+    def __len__(self):
+        if self._base is None:
+            return len(self._rows)
+        return len(self._rows) + len(self._base) - len(self._shadowed)
+
+    def __iter__(self):
+        #iterate over copies: other threads may be writing
+        rows = list(self._rows)
+        if self._base is None:
+            yield from rows
+            return
+        #snapshot rows first, in their original order, then newer ids
+        shadowed = set(self._shadowed)
+        for entity_id in self._base.ids():
+            if entity_id not in shadowed or entity_id in self._rows:
+                yield entity_id
+        for entity_id in rows:
+            if entity_id not in shadowed:
+                yield entity_id
+
+    def values(self):
+        if self._base is None:
+            return list(self._rows.values())
+        return [entity for entity in map(self.get, self) if entity is not None]
+
+    def items(self):
+        return [(entity.id, entity) for entity in self.values()]
+
+    def page(self, after, limit):
+        """Up to limit entities positioned after `after` (None for the
+        start), and the position to continue from (None at the end).
+
+        Snapshot rows are positioned by their row number, in-memory rows by
+        the snapshot size plus their sequence number; both are stable, and a
+        page costs O(limit) however far in it starts.
+        """
+        after = -1 if after is None else after
+        base_count = 0 if self._base is None else len(self._base)
+        found = []
+        for row in range(after + 1, base_count):
+            entity_id = self._base.id_at(row)
+            #decoded without promotion; replaced rows keep their position
+            entity = self._rows.get(entity_id) if entity_id in self._shadowed else self._base.decode(row)
+            if entity is not None:
+                found.append((row, entity))
+                if len(found) > limit:
+                    break
+        seq = max(after - base_count, -1)
+        while len(found) <= limit:
+            rows = self._rows_after(seq, limit + 1 - len(found))
+            if not rows:
+                break
+            seq = rows[-1][0]
+            found.extend((base_count + seq, entity) for seq, entity in rows if entity.id not in self._shadowed)
+        entities = [entity for _, entity in found[:limit]]
+        return entities, (found[limit - 1][0] if len(found) > limit else None)
+
+    def _rows_after(self, seq, limit):
+        """(seq, entity) for up to limit in-memory rows numbered above seq."""
+        raise NotImplementedError
+
+    def clear(self):
+        with self.locked():
+            self._rows.clear()
+            self._base = None
+            self._shadowed = set()
+            self._clear_indexes()
+            if self.journal is not None:
+                self.journal.clear(self.name)
+
+    def _clear_indexes(self):
+        pass
+
+    def frozen_values(self):
+        """Point-in-time view of every entity for snapshot writers.
+
+        Only copies the in-memory rows, so it is cheap to take while the
+        store is locked; entities are built when the result is consumed, and
+        snapshot rows are decoded without being promoted.
+        """
+        base, shadowed, rows = self._base, set(self._shadowed), self._rows.copy()
+
+        def generate():
+            if base is not None:
+                for row, entity_id in enumerate(base.ids()):
+                    if entity_id not in shadowed:
+                        yield base.decode(row)
+                    elif entity_id in rows:
+                        yield rows[entity_id]
+            for entity_id, entity in rows.items():
+                if entity_id not in shadowed:
+                    yield entity
+        return generate()
+
+
+class _UniqueKeyStore(_MemoryStore):
+    """Memory store with a unique index on a normalized secondary key.
+    Subclasses define how the key is derived from an entity."""
+
+    def __init__(self, lock_shards=64):
+        super().__init__(lock_shards)
+        self._keys = {}
+        self._by_key = {}
+        self._order = _InsertionOrder()
+
+    def _put(self, entity_id, entity):
+        super()._put(entity_id, entity)
+        #snapshot rows keep their snapshot position
+        if entity_id not in self._shadowed:
+            self._order.add(entity_id)
+
+    def _delete(self, entity_id):
+        super()._delete(entity_id)
+        self._order.discard(entity_id)
+
+    def _rows_after(self, seq, limit):
+        found = []
+        for seq, entity_id in self._order.after(seq, limit):
+            entity = self._rows.get(entity_id)
+            if entity is not None:
+                found.append((seq, entity))
+        return found
+
+    def _key_of(self, entity):
+        raise NotImplementedError
+
+    def _lock_keys(self, entity_id, entity):
+        #the key being released and, for puts, the key being claimed
+        old_key = self._keys.get(entity_id)
+        if entity is None:
+            return (old_key,)
+        return (old_key, normalize_key(self._key_of(entity)))
+
+    def _check_unique(self, entity_id, entity):
+        owner = self.owner_of(self._key_of(entity))
+        if owner is not None and owner != entity_id:
+            raise ValueError(self.conflict_message)
+
+    def _index(self, entity_id, entity):
+        key = normalize_key(self._key_of(entity))
+        self._keys[entity_id] = key
+        self._by_key[key] = entity_id
+
+    def _unindex(self, entity_id):
+        del self._by_key[self._keys.pop(entity_id)]
+
+    def _clear_indexes(self):
+        self._keys.clear()
+        self._by_key.clear()
+        self._order.clear()
+
+    def owner_of(self, key):
+        key = normalize_key(key)
+        owner = self._by_key.get(key)
+        if owner is None and self._base is not None:
+            owner = self._base.owner_of(key)
+            if owner in self._shadowed:
+                return None
+        return owner
+
+
+class MemoryUserStore(_UniqueKeyStore, UserRepository):
+    """Users keyed by id, with a case-insensitive unique email index."""
+
+    name = "users"
+
+    def _key_of(self, user):
+        return str(user.email)
+
+
+class MemoryCourseStore(_UniqueKeyStore, CourseRepository):
+    """Courses keyed by id, with a case-insensitive unique code index."""
+
+    name = "courses"
+
+    def _key_of(self, course):
+        return course.code
+
+
+class MemoryEnrollmentStore(_MemoryStore, EnrollmentRepository):
+    """Enrollments keyed by id in compact columns (see columnar.py), unique
+    on (user_id, course_id), with per-user / per-course listings."""
+
+    name = "enrollments"
+
+    def __init__(self, lock_shards=64, partitions=4):
+        super().__init__(lock_shards)
+        self._rows = ShardedColumns(partitions)
+        self._promoted_courses = set()
+
+    def attach_base(self, table):
+        super().attach_base(table)
+        self._promoted_courses = set()
+
+    def _lock_keys(self, enrollment_id, enrollment):
+        #(user_id, course_id) uniqueness is checked under the user's shard
+        return () if enrollment is None else (enrollment.user_id,)
+
+    def _replace(self, enrollment_id):
+        #no secondary indexes to clear; only a snapshot row may need hiding
+        if self._base is not None and enrollment_id not in self._rows:
+            self._shadow(enrollment_id)
+
+    def locked(self):
+        stack = contextlib.ExitStack()
+        stack.enter_context(super().locked())
+        stack.enter_context(self._rows.locked())
+        return stack
+
+    def _check_unique(self, enrollment_id, enrollment):
+        owner = self._owner_of_pair(enrollment.user_id, enrollment.course_id)
+        if owner is not None and owner != enrollment_id:
+            raise ValueError(self.conflict_message)
+
+    def _owner_of_pair(self, user_id, course_id):
+        owner = self._rows.find(user_id, course_id)
+        if owner is None and self._base is not None:
+            owner = self._base.find_pair(user_id, course_id)
+            if owner in self._shadowed:
+                return None
+        return owner
+
+    def _promote(self, base_ids):
+        for enrollment_id in base_ids:
+            if enrollment_id not in self._shadowed:
+                self._from_base(enrollment_id)
+
+    def find(self, user_id, course_id):
+        enrollment_id = self._owner_of_pair(user_id, course_id)
+        return None if enrollment_id is None else self[enrollment_id]
+
+    def for_user(self, user_id):
+        if self._base is not None:
+            self._promote(self._base.ids_for_user(user_id))
+        return self._rows.for_user(user_id)
+
+    def for_course(self, course_id):
+        if self._base is not None:
+            self._promote(self._base.ids_for_course(course_id))
+        return self._rows.for_course(course_id)
+
+    def _rows_after(self, seq, limit):
+        return self._rows.page(seq, limit)
+
+    def _promote_course(self, course_id):
+        if self._base is not None and course_id not in self._promoted_courses:
+            #once per course, so later pages and counts stay cheap
+            self._promote(self._base.ids_for_course(course_id))
+            self._promoted_courses.add(course_id)
+
+    def seats_taken(self, course_id):
+        self._promote_course(course_id)
+        return self._rows.count_for_course(course_id)
+
+    def page_for_course(self, course_id, after, limit):
+        self._promote_course(course_id)
+        rows = self._rows.page(-1 if after is None else after, limit + 1, course_id)
+        return [entity for _, entity in rows[:limit]], (rows[limit - 1][0] if len(rows) > limit else None)
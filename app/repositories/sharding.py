@@ -0,0 +1,55 @@
+import threading
+from contextlib import contextmanager
+
+
+class ShardLocks:
+    """A fixed set of re-entrant locks; every key hashes to one of them.
+
+    `hold(*keys)` acquires the locks for all the keys in ascending shard
+    order, so threads locking overlapping sets of entities can never
+    deadlock. A thread may re-enter shards it already holds and may add
+    shards above the highest one it holds; asking for a lower shard would
+    break the ordering, so it raises RuntimeError instead of risking a
+    deadlock.
+    """
+
+    def __init__(self, count: int = 64):
+        self._locks = [threading.RLock() for _ in range(count)]
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self._locks)
+
+    def shard_of(self, key) -> int:
+        return hash(key) % len(self._locks)
+
+    def _held(self):
+        held = getattr(self._local, "held", None)
+        if held is None:
+            held = self._local.held = []
+        return held
+
+    @contextmanager
+    def _hold_shards(self, shards):
+        held = self._held()
+        new = sorted(shards.difference(held))
+        if new and held and new[0] < max(held):
+            raise RuntimeError("Shard locks must be acquired in ascending order")
+        acquired = []
+        try:
+            for shard in new:
+                self._locks[shard].acquire()
+                acquired.append(shard)
+                held.append(shard)
+            yield
+        finally:
+            for shard in reversed(acquired):
+                held.remove(shard)
+                self._locks[shard].release()
+
+    def hold(self, *keys):
+        """Lock the shards of keys (None entries are ignored)."""
+        return self._hold_shards({self.shard_of(key) for key in keys if key is not None})
+
+    def hold_all(self):
+        return self._hold_shards(set(range(len(self._locks))))
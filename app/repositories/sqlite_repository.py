@@ -0,0 +1,678 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from uuid import UUID
+from app.repositories.base_repository import (
+    COURSE_FULL,
+    CourseRepository,
+    EnrollmentRepository,
+    UserRepository,
+    WaitlistRepository,
+    normalize_key,
+)
+from app.schemas.user_schema import UserResponse, UserRole
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id BLOB NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL UNIQUE,
+    role TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS courses (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id BLOB NOT NULL UNIQUE,
+    code TEXT NOT NULL,
+    code_key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    capacity INTEGER
+);
+CREATE TABLE IF NOT EXISTS enrollments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id BLOB NOT NULL UNIQUE,
+    user_id BLOB NOT NULL,
+    course_id BLOB NOT NULL,
+    enrolled_on TEXT NOT NULL,
+    UNIQUE (user_id, course_id)
+);
+CREATE INDEX IF NOT EXISTS enrollments_course_idx ON enrollments (course_id, seq);
+"""
+
+#Version 1: course capacities, and a seat count per course kept by triggers in
+#the same transaction as every enrollment write, so any process sees it exact.
+#An insert into a full course is refused by the database itself, which keeps
+#capacities safe across workers that don't share the services' locks.
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS course_seats (
+        course_id BLOB PRIMARY KEY,
+        taken INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    INSERT INTO course_seats (course_id, taken)
+        SELECT course_id, COUNT(*) FROM enrollments GROUP BY course_id;
+    CREATE TRIGGER IF NOT EXISTS enrollments_seat_check BEFORE INSERT ON enrollments
+    WHEN (SELECT taken FROM course_seats WHERE course_id = NEW.course_id)
+         >= (SELECT capacity FROM courses WHERE id = NEW.course_id)
+     AND NOT EXISTS (SELECT 1 FROM enrollments WHERE id = NEW.id)
+    BEGIN
+        SELECT RAISE(ABORT, 'Course is full');
+    END;
+    CREATE TRIGGER IF NOT EXISTS enrollments_seat_taken AFTER INSERT ON enrollments
+    BEGIN
+        INSERT INTO course_seats (course_id, taken) VALUES (NEW.course_id, 1)
+            ON CONFLICT (course_id) DO UPDATE SET taken = taken + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS enrollments_seat_freed AFTER DELETE ON enrollments
+    BEGIN
+        UPDATE course_seats SET taken = taken - 1 WHERE course_id = OLD.course_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS enrollments_seat_moved AFTER UPDATE OF course_id ON enrollments
+    WHEN NEW.course_id != OLD.course_id
+    BEGIN
+        UPDATE course_seats SET taken = taken - 1 WHERE course_id = OLD.course_id;
+        INSERT INTO course_seats (course_id, taken) VALUES (NEW.course_id, 1)
+            ON CONFLICT (course_id) DO UPDATE SET taken = taken + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS courses_seats_dropped AFTER DELETE ON courses
+    BEGIN
+        DELETE FROM course_seats WHERE course_id = OLD.id;
+    END;
+    """,
+    #Version 2: the versions behind the course ETags, bumped by triggers in the
+    #same transaction as every course write, so a write on one worker moves the
+    #ETags every other worker sends. The empty id holds the catalog's version,
+    #and a deleted course keeps its row so its ETag moves on too. The epoch is
+    #made once per database file.
+    """
+    CREATE TABLE IF NOT EXISTS course_versions (
+        course_id BLOB PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS meta (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    INSERT OR IGNORE INTO meta (name, value) VALUES ('epoch', lower(hex(randomblob(6))));
+    INSERT OR IGNORE INTO course_versions (course_id, version) VALUES (X'', 0);
+    CREATE TRIGGER IF NOT EXISTS courses_versioned_insert AFTER INSERT ON courses
+    BEGIN
+        UPDATE course_versions SET version = version + 1 WHERE course_id = X'';
+        INSERT INTO course_versions (course_id, version)
+            SELECT NEW.id, version FROM course_versions WHERE course_id = X''
+            ON CONFLICT (course_id) DO UPDATE SET version = excluded.version;
+    END;
+    CREATE TRIGGER IF NOT EXISTS courses_versioned_update AFTER UPDATE ON courses
+    BEGIN
+        UPDATE course_versions SET version = version + 1 WHERE course_id = X'';
+        INSERT INTO course_versions (course_id, version)
+            SELECT NEW.id, version FROM course_versions WHERE course_id = X''
+            ON CONFLICT (course_id) DO UPDATE SET version = excluded.version;
+    END;
+    CREATE TRIGGER IF NOT EXISTS courses_versioned_delete AFTER DELETE ON courses
+    BEGIN
+        UPDATE course_versions SET version = version + 1 WHERE course_id = X'';
+        INSERT INTO course_versions (course_id, version)
+            SELECT OLD.id, version FROM course_versions WHERE course_id = X''
+            ON CONFLICT (course_id) DO UPDATE SET version = excluded.version;
+    END;
+    """,
+    #Version 3: an enrollment whose user or course is gone is refused. A worker
+    #checks the pair, then inserts; if another worker deleted the user or
+    #course in between, the insert fails instead of leaving an orphan.
+    """
+    CREATE TRIGGER IF NOT EXISTS enrollments_parents_check BEFORE INSERT ON enrollments
+    WHEN NOT EXISTS (SELECT 1 FROM enrollments WHERE id = NEW.id)
+    BEGIN
+        SELECT RAISE(ABORT, 'User does not exist') WHERE NOT EXISTS (SELECT 1 FROM users WHERE id = NEW.user_id);
+        SELECT RAISE(ABORT, 'Course does not exist') WHERE NOT EXISTS (SELECT 1 FROM courses WHERE id = NEW.course_id);
+    END;
+    """,    #Version 4: the change feed's log, filled by triggers in the same transaction
+    #as every write, so a feed served by any worker covers every worker's writes
+    #and survives restarts. Only the newest change_log_size entries are kept.
+    """
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        id BLOB NOT NULL,
+        op TEXT NOT NULL
+    );
+    INSERT OR IGNORE INTO meta (name, value) VALUES ('change_log_size', '10000');
+    CREATE TRIGGER IF NOT EXISTS changes_trimmed AFTER INSERT ON changes
+    BEGIN
+        DELETE FROM changes
+        WHERE seq <= NEW.seq - (SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'change_log_size');
+    END;
+    CREATE TRIGGER IF NOT EXISTS users_logged_insert AFTER INSERT ON users
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('user', NEW.id, 'created');
+    END;
+    CREATE TRIGGER IF NOT EXISTS users_logged_update AFTER UPDATE ON users
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('user', NEW.id, 'updated');
+    END;
+    CREATE TRIGGER IF NOT EXISTS users_logged_delete AFTER DELETE ON users
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('user', OLD.id, 'deleted');
+    END;
+    CREATE TRIGGER IF NOT EXISTS courses_logged_insert AFTER INSERT ON courses
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('course', NEW.id, 'created');
+    END;
+    CREATE TRIGGER IF NOT EXISTS courses_logged_update AFTER UPDATE ON courses
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('course', NEW.id, 'updated');
+    END;
+    CREATE TRIGGER IF NOT EXISTS courses_logged_delete AFTER DELETE ON courses
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('course', OLD.id, 'deleted');
+    END;
+    CREATE TRIGGER IF NOT EXISTS enrollments_logged_insert AFTER INSERT ON enrollments
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('enrollment', NEW.id, 'created');
+    END;
+    CREATE TRIGGER IF NOT EXISTS enrollments_logged_update AFTER UPDATE ON enrollments
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('enrollment', NEW.id, 'updated');
+    END;
+    CREATE TRIGGER IF NOT EXISTS enrollments_logged_delete AFTER DELETE ON enrollments
+    BEGIN
+        INSERT INTO changes (entity, id, op) VALUES ('enrollment', OLD.id, 'deleted');
+    END;
+    """,    #Version 5: the waitlists, shared by every worker; tickets count up in joining order
+    """
+    CREATE TABLE IF NOT EXISTS waitlist (
+        ticket INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_id BLOB NOT NULL,
+        user_id BLOB NOT NULL,
+        UNIQUE (course_id, user_id)
+    );
+    CREATE INDEX IF NOT EXISTS waitlist_course_idx ON waitlist (course_id, ticket);
+    """,
+]
+
+
+class SqliteDatabase:
+    """Connections to one SQLite file in WAL mode, pooled one per thread.
+
+    Route handlers run in a reused worker threadpool, so each worker keeps
+    its connection (and that connection's prepared statement cache) for the
+    life of the process. The path must be a file: every connection to
+    ":memory:" would open a separate database.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.connection().executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        conn = self.connection()
+        #one process migrates; the others wait for it, then find nothing to do
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(courses)")}
+                if "capacity" not in columns:
+                    conn.execute("ALTER TABLE courses ADD COLUMN capacity INTEGER")
+            for script in MIGRATIONS[version:]:
+                for statement in _statements(script):
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @contextmanager
+    def transaction(self):
+        """Run the block's statements, on this thread's connection, as one write."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def _statements(script):
+    #executescript would commit the open transaction first
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+
+
+#messages the triggers abort with, passed on as they are
+RAISED = {COURSE_FULL, "User does not exist", "Course does not exist"}
+
+
+def _conflict(store, exc):
+    return ValueError(str(exc) if str(exc) in RAISED else store.conflict_message)
+
+
+def _key(entity_id) -> bytes:
+    try:
+        return entity_id.bytes if isinstance(entity_id, UUID) else UUID(str(entity_id)).bytes
+    except ValueError:
+        raise KeyError(entity_id) from None
+
+
+def _encode_time(value):
+    return None if value is None else value.isoformat()
+
+
+def _decode_time(value):
+    return None if value is None else datetime.fromisoformat(value)
+
+
+class _SqliteTable:
+    """Mapping methods shared by the SQLite stores. Subclasses supply the
+    table name, the selected columns and how a row maps to a model."""
+
+    table = ""
+    columns = ""
+    upsert_sql = ""
+
+    def __init__(self, database: SqliteDatabase):
+        self._db = database
+
+    def _execute(self, sql, params=()):
+        return self._db.connection().execute(sql, params)
+
+    @property
+    def database(self) -> SqliteDatabase:
+        return self._db
+
+    def _select(self, where="", params=()):
+        rows = self._execute(
+            f"SELECT {self.columns} FROM {self.table} {where} ORDER BY seq", params
+        ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _select_page(self, after, limit, where="", params=()):
+        #seq is the rowid, so this is a range scan starting at `after`
+        rows = self._execute(
+            f"SELECT seq, {self.columns} FROM {self.table} WHERE seq > ? {where} ORDER BY seq LIMIT ?",
+            (-1 if after is None else after, *params, limit + 1),
+        ).fetchall()
+        entities = [self._decode(row[1:]) for row in rows[:limit]]
+        return entities, (rows[limit - 1][0] if len(rows) > limit else None)
+
+    def page(self, after, limit):
+        return self._select_page(after, limit)
+
+    def put_many(self, entities):
+        #one transaction: a conflict rolls the whole batch back
+        conn = self._db.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(self.upsert_sql, (self._encode(entity) for entity in entities))
+        except sqlite3.IntegrityError as exc:
+            conn.execute("ROLLBACK")
+            raise _conflict(self, exc) from None
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get_many(self, ids):
+        keys = list({_key(entity_id) for entity_id in ids})
+        #stay under SQLite's limit on bound parameters
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update((entity.id, entity) for entity in self._select(f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def _owners_by_key(self, key_column, keys):
+        keys = list({normalize_key(key) for key in keys})
+        owners = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._execute(
+                f"SELECT {key_column}, id FROM {self.table} WHERE {key_column} IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            owners.update((key, UUID(bytes=owner)) for key, owner in rows)
+        return owners
+
+    def _decode(self, row):
+        raise NotImplementedError
+
+    def _encode(self, entity):
+        raise NotImplementedError
+
+    def __getitem__(self, entity_id):
+        row = self._execute(
+            f"SELECT {self.columns} FROM {self.table} WHERE id = ?", (_key(entity_id),)
+        ).fetchone()
+        if row is None:
+            raise KeyError(entity_id)
+        return self._decode(row)
+
+    def __setitem__(self, entity_id, entity):
+        try:
+            self._execute(self.upsert_sql, self._encode(entity))
+        except sqlite3.IntegrityError as exc:
+            raise _conflict(self, exc) from None
+
+    def __delitem__(self, entity_id):
+        cursor = self._execute(f"DELETE FROM {self.table} WHERE id = ?", (_key(entity_id),))
+        if cursor.rowcount == 0:
+            raise KeyError(entity_id)
+
+    def __contains__(self, entity_id):
+        try:
+            key = _key(entity_id)
+        except KeyError:
+            return False
+        return self._execute(f"SELECT 1 FROM {self.table} WHERE id = ?", (key,)).fetchone() is not None
+
+    def __iter__(self):
+        rows = self._execute(f"SELECT id FROM {self.table} ORDER BY seq").fetchall()
+        return (UUID(bytes=row[0]) for row in rows)
+
+    def __len__(self):
+        return self._execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def values(self):
+        return self._select()
+
+    def items(self):
+        return [(entity.id, entity) for entity in self._select()]
+
+    def clear(self):
+        self._execute(f"DELETE FROM {self.table}")
+
+
+class SqliteUserStore(_SqliteTable, UserRepository):
+    table = "users"
+    columns = "id, name, email, role, created_at, updated_at"
+    upsert_sql = (
+        "INSERT INTO users (id, name, email, email_key, role, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET name = excluded.name, email = excluded.email, "
+        "email_key = excluded.email_key, role = excluded.role, "
+        "created_at = excluded.created_at, updated_at = excluded.updated_at"
+    )
+
+    def _encode(self, user):
+        return (
+            user.id.bytes,
+            user.name,
+            user.email,
+            normalize_key(user.email),
+            UserRole(user.role).value,
+            _encode_time(user.created_at),
+            _encode_time(user.updated_at),
+        )
+
+    def _decode(self, row):
+        return UserResponse.model_construct(
+            id=UUID(bytes=row[0]),
+            name=row[1],
+            email=row[2],
+            role=UserRole(row[3]),
+            created_at=_decode_time(row[4]),
+            updated_at=_decode_time(row[5]),
+        )
+
+    def owner_of(self, email):
+        row = self._execute(
+            "SELECT id FROM users WHERE email_key = ?", (normalize_key(email),)
+        ).fetchone()
+        return None if row is None else UUID(bytes=row[0])
+
+    def owners_of(self, emails):
+        return self._owners_by_key("email_key", emails)
+
+    def delete_with_enrollments(self, user_id, enrollments):
+        #one transaction: no other worker's enrollment can land between the deletes
+        with self._db.transaction():
+            enrollments.delete_for_user(user_id)
+            del self[user_id]
+
+
+class SqliteCourseStore(_SqliteTable, CourseRepository):
+    table = "courses"
+    columns = "id, code, title, created_at, updated_at, capacity"
+    upsert_sql = (
+        "INSERT INTO courses (id, code, code_key, title, created_at, updated_at, capacity) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET code = excluded.code, code_key = excluded.code_key, "
+        "title = excluded.title, created_at = excluded.created_at, updated_at = excluded.updated_at, "
+        "capacity = excluded.capacity"
+    )
+
+    def _encode(self, course):
+        return (
+            course.id.bytes,
+            course.code,
+            normalize_key(course.code),
+            course.title,
+            _encode_time(course.created_at),
+            _encode_time(course.updated_at),
+            course.capacity,
+        )
+
+    def _decode(self, row):
+        return CourseResponse.model_construct(
+            id=UUID(bytes=row[0]),
+            code=row[1],
+            title=row[2],
+            created_at=_decode_time(row[3]),
+            updated_at=_decode_time(row[4]),
+            capacity=row[5],
+        )
+
+    def owner_of(self, code):
+        row = self._execute(
+            "SELECT id FROM courses WHERE code_key = ?", (normalize_key(code),)
+        ).fetchone()
+        return None if row is None else UUID(bytes=row[0])
+
+    def owners_of(self, codes):
+        return self._owners_by_key("code_key", codes)
+
+    def delete_with_enrollments(self, course_id, enrollments):
+        #one transaction: no other worker's enrollment can land between the deletes
+        with self._db.transaction():
+            enrollments.delete_for_course(course_id)
+            del self[course_id]
+
+    #kept by the courses_versioned_* triggers
+    def version_epoch(self):
+        return self._execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()[0]
+
+    def catalog_version(self):
+        return self._execute("SELECT version FROM course_versions WHERE course_id = X''").fetchone()[0]
+
+    def version_of(self, course_id):
+        try:
+            key = _key(course_id)
+        except KeyError:
+            return 0
+        row = self._execute("SELECT version FROM course_versions WHERE course_id = ?", (key,)).fetchone()
+        return 0 if row is None else row[0]
+
+
+class SqliteEnrollmentStore(_SqliteTable, EnrollmentRepository):
+    table = "enrollments"
+    columns = "id, user_id, course_id, enrolled_on"
+    upsert_sql = (
+        "INSERT INTO enrollments (id, user_id, course_id, enrolled_on) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id, "
+        "course_id = excluded.course_id, enrolled_on = excluded.enrolled_on"
+    )
+
+    def _encode(self, enrollment):
+        return (
+            enrollment.id.bytes,
+            enrollment.user_id.bytes,
+            enrollment.course_id.bytes,
+            _encode_time(enrollment.enrolled_on),
+        )
+
+    def _decode(self, row):
+        return EnrollmentResponse.model_construct(
+            id=UUID(bytes=row[0]),
+            user_id=UUID(bytes=row[1]),
+            course_id=UUID(bytes=row[2]),
+            enrolled_on=_decode_time(row[3]),
+        )
+
+    def find(self, user_id, course_id):
+        found = self._select("WHERE user_id = ? AND course_id = ?", (_key(user_id), _key(course_id)))
+        return found[0] if found else None
+
+    def for_user(self, user_id):
+        return self._select("WHERE user_id = ?", (_key(user_id),))
+
+    def for_course(self, course_id):
+        return self._select("WHERE course_id = ?", (_key(course_id),))
+
+    def seats_taken(self, course_id):
+        #kept by the enrollments_seat_* triggers
+        row = self._execute("SELECT taken FROM course_seats WHERE course_id = ?", (_key(course_id),)).fetchone()
+        return 0 if row is None else row[0]
+
+    def page_for_course(self, course_id, after, limit):
+        #served by enrollments_course_idx (course_id, seq)
+        return self._select_page(after, limit, "AND course_id = ?", (_key(course_id),))
+
+    def delete_for_user(self, user_id):
+        return self._execute("DELETE FROM enrollments WHERE user_id = ?", (_key(user_id),)).rowcount
+
+    def delete_for_course(self, course_id):
+        return self._execute("DELETE FROM enrollments WHERE course_id = ?", (_key(course_id),)).rowcount
+
+
+class SqliteChanges:
+    """The changes table the *_logged_* triggers fill: (seq, entity, id, op)
+    rows, oldest first, the newest `capacity` of them kept."""
+
+    def __init__(self, database: SqliteDatabase, capacity: int = 10_000):
+        self._db = database
+        self._execute(
+            "INSERT INTO meta (name, value) VALUES ('change_log_size', ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (str(capacity),),
+        )
+
+    def _execute(self, sql, params=()):
+        return self._db.connection().execute(sql, params)
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+
+    def epoch(self):
+        return self._execute("SELECT value FROM meta WHERE name = 'epoch'").fetchone()[0]
+
+    def latest(self):
+        #AUTOINCREMENT keeps the highest seq ever handed out, even once it's trimmed
+        row = self._execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return 0 if row is None else row[0]
+
+    def since(self, seq, limit):
+        """Up to limit rows after seq; None when rows after seq have been
+        trimmed (or seq is ahead of the log)."""
+        rows = self._execute(
+            "SELECT seq, entity, id, op FROM changes WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+        ).fetchall()
+        #trimming only ever drops the oldest rows: if nothing after seq is gone
+        #now, nothing was when the rows were read
+        first = self._execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        if seq > self.latest() or (first is not None and seq < first - 1):
+            return None
+        return [(row_seq, entity, UUID(bytes=key), op) for row_seq, entity, key, op in rows]
+
+
+class SqliteWaitlistStore(WaitlistRepository):
+    """Waitlists in the waitlist table, so every worker promotes from and
+    checks the same queues. A position counts the tickets up to the
+    student's, over the (course_id, ticket) index."""
+
+    def __init__(self, database: SqliteDatabase):
+        self._db = database
+
+    def _execute(self, sql, params=()):
+        return self._db.connection().execute(sql, params)
+
+    def join(self, course_id, user_id):
+        try:
+            self._execute("INSERT INTO waitlist (course_id, user_id) VALUES (?, ?)", (_key(course_id), _key(user_id)))
+        except sqlite3.IntegrityError:
+            raise ValueError("Student is already on the waitlist for this course") from None
+        return self.position(course_id, user_id)
+
+    def leave(self, course_id, user_id):
+        cursor = self._execute(
+            "DELETE FROM waitlist WHERE course_id = ? AND user_id = ?", (_key(course_id), _key(user_id))
+        )
+        return cursor.rowcount > 0
+
+    def position(self, course_id, user_id):
+        course = _key(course_id)
+        row = self._execute(
+            "SELECT COUNT(*) FROM waitlist WHERE course_id = ? AND ticket <= "
+            "(SELECT ticket FROM waitlist WHERE course_id = ? AND user_id = ?)",
+            (course, course, _key(user_id)),
+        ).fetchone()
+        return row[0] or None
+
+    def waiting(self, course_id):
+        return self._execute("SELECT COUNT(*) FROM waitlist WHERE course_id = ?", (_key(course_id),)).fetchone()[0]
+
+    def head(self, course_id):
+        row = self._execute(
+            "SELECT user_id FROM waitlist WHERE course_id = ? ORDER BY ticket LIMIT 1", (_key(course_id),)
+        ).fetchone()
+        return None if row is None else UUID(bytes=row[0])
+
+    def drop_course(self, course_id):
+        self._execute("DELETE FROM waitlist WHERE course_id = ?", (_key(course_id),))
+
+    def clear(self):
+        self._execute("DELETE FROM waitlist")
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, ValidationError
+
+class RowError(BaseModel):
+    #1-based position of the row (or item) in the request
+    row: int
+    detail: str
+
+def validation_detail(exc: ValidationError) -> str:
+    """One line for a row's first validation error."""
+    error = exc.errors()[0]
+    field = ".".join(str(part) for part in error["loc"])
+    return f"{field}: {error['msg']}" if field else error["msg"]
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from app.schemas.user_schema import UserResponse
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse
+from uuid import UUID
+from typing import List, Literal, Optional, Union
+
+class Change(BaseModel):
+    seq: int
+    entity: Literal["user", "course", "enrollment"]
+    id: UUID
+    op: Literal["created", "updated", "deleted"]
+    #the entity as it is now; null for a deletion (a tombstone)
+    data: Optional[Union[UserResponse, CourseResponse, EnrollmentResponse]] = None
+
+class ChangeFeed(BaseModel):
+    #"<epoch>:<seq>" position in the serving worker's log; pass back as ?since= next time
+    latest: str
+    #the log no longer reaches back to since: download the full lists again,
+    #then sync from latest
+    resync_required: bool = False
+    changes: List[Change] = []
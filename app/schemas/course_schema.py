@@ -1,12 +1,15 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
+from app.schemas.bulk_schema import RowError
 import re
 
 class CourseBase(BaseModel):
     code: str
     title: str
+    #most students who can enroll; None for no limit
+    capacity: Optional[int] = Field(None, ge=1)
 
     @field_validator("code") 
     def validate_course_code(cls, value):
@@ -32,7 +35,25 @@ class CourseResponse(CourseBase):
 class CourseUpdate(BaseModel):
     title: Optional[str] = None
     code: Optional[str] = None
+    capacity: Optional[int] = Field(None, ge=1)
 
     @field_validator("title") 
     def normalize_name(cls, value): 
-        return value.strip().lower()
\ No newline at end of file
+        return value.strip().lower()
+
+class CourseSeats(BaseModel):
+    capacity: Optional[int] = None
+    taken: int
+    #None when there is no limit
+    available: Optional[int] = None
+
+class CourseUpsertSummary(BaseModel):
+    received: int
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    #courses missing from the feed, with remove_missing
+    removed: int = 0
+    #nothing is applied when any row fails
+    committed: bool
+    errors: List[RowError] = []
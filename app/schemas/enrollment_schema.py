@@ -3,6 +3,7 @@ from app.schemas.user_schema import UserResponse
 from app.schemas.course_schema import CourseResponse
 from uuid import UUID
 from datetime import datetime
+from typing import Dict, List, Optional
 
 class EnrollmentBase(BaseModel):
     user_id: UUID
@@ -24,3 +25,56 @@ class EnrollmentDetails(BaseModel):
     course: CourseResponse
     enrolled_on: datetime
 
+class EnrollmentSideloaded(BaseModel):
+    """Enrollments by id only, with each referenced user and course once."""
+    enrollments: List[EnrollmentResponse]
+    users: Dict[UUID, UserResponse]
+    courses: Dict[UUID, CourseResponse]
+    next_cursor: Optional[str] = None
+
+class EnrolledCourse(BaseModel):
+    enrollment_id: UUID
+    enrolled_on: datetime
+    course: CourseResponse
+
+class StudentDashboard(BaseModel):
+    """A student's profile with every course they are enrolled in."""
+    student: UserResponse
+    courses: List[EnrolledCourse]
+
+class WaitlistEntry(BaseModel):
+    """A student queued for a course, as the stores keep it (in joining order)."""
+    id: UUID
+    course_id: UUID
+    user_id: UUID
+
+class WaitlistPosition(BaseModel):
+    """Where a student is in a course's waitlist; position 1 is promoted next."""
+    course_id: UUID
+    user_id: UUID
+    position: int
+    waiting: int
+
+class EnrollmentBatchRequest(BaseModel):
+    pairs: List[EnrollmentCreate]
+
+class CohortEnrollmentRequest(BaseModel):
+    user_ids: List[UUID]
+
+class EnrollmentBatchItem(BaseModel):
+    #1-based position in the request
+    row: int
+    user_id: UUID
+    course_id: UUID
+    #set when the pair was enrolled
+    enrollment_id: Optional[UUID] = None
+    error: Optional[str] = None
+
+class EnrollmentBatchResult(BaseModel):
+    requested: int
+    enrolled: int
+    failed: int
+    #atomic batches enroll nothing when any pair fails
+    committed: bool
+    results: List[EnrollmentBatchItem]
+
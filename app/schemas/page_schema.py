@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar
+from uuid import UUID
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    #pass back as ?cursor= for the next page; null on the last page
+    next_cursor: Optional[str] = None
+
+class ByIds(BaseModel, Generic[T]):
+    #found entities, in the order their ids were asked for
+    items: List[T]
+    #asked-for ids that don't exist
+    missing: List[UUID] = []
+
+class IdsRequest(BaseModel):
+    ids: List[UUID]
+
@@ -1,8 +1,12 @@
+import re
+from functools import lru_cache
 from pydantic import BaseModel, EmailStr, field_validator
-from typing import Literal, Optional
+from pydantic.networks import validate_email
+from typing import List, Literal, Optional
 from datetime import datetime
 from enum import Enum
 from uuid import UUID
+from app.schemas.bulk_schema import RowError
 
 
 class UserRole(str, Enum):
@@ -43,4 +47,40 @@ class UserUpdate(BaseModel):
     def normalize_email(cls, value): 
         return value.strip().lower()
 
+#dot-atom local part (letters, digits and the usual symbols) @ a host name
+_PLAIN_EMAIL = re.compile(r"[\w!#$%&'*+/=?^`{|}~-]+(?:\.[\w!#$%&'*+/=?^`{|}~-]+)*@[A-Za-z0-9.-]+", re.ASCII)
 
+@lru_cache(maxsize=4096)
+def _checked_domain(domain: str) -> str:
+    return validate_email(f"x@{domain}")[1].rpartition("@")[2]
+
+def normalize_bulk_email(value: str) -> str:
+    """What EmailStr accepts, normalized as UserCreate does. Checking the
+    domain is most of EmailStr's cost and an import repeats a few domains,
+    so plain addresses check their domain once (cached); anything
+    else goes through the full validation."""
+    value = value.strip()
+    local, _, domain = value.rpartition("@")
+    if len(local) <= 64 and len(value) <= 254 and _PLAIN_EMAIL.fullmatch(value):
+        return f"{local}@{_checked_domain(domain)}".lower()
+    return validate_email(value)[1].lower()
+
+class UserImportRow(UserBase):
+    """A UserCreate row of a bulk import."""
+    email: str
+
+    @field_validator("name")
+    def normalize_name(cls, value):
+        return value.strip().lower()
+
+    @field_validator("email")
+    def normalize_email(cls, value):
+        return normalize_bulk_email(value)
+
+class UserImportSummary(BaseModel):
+    received: int
+    created: int
+    failed: int
+    #atomic imports store nothing when any row fails
+    committed: bool
+    errors: List[RowError] = []
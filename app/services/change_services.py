@@ -0,0 +1,33 @@
+from uuid import UUID
+from typing import Dict, Optional
+from app.core.db import change_log, courses_db, enrollments_db, users_db
+from app.schemas.change_schema import Change, ChangeFeed
+
+
+class ChangeService:
+    @staticmethod
+    def changes_since(since: Optional[str], limit: int) -> ChangeFeed:
+        """Entities written after the `since` token (from the start of the log
+        without one), each once, with their current data (or a tombstone),
+        oldest change first."""
+        seq = change_log.position(since)
+        entries = change_log.since(seq, limit) if seq is not None else None
+        if entries is None:
+            return ChangeFeed(latest=change_log.token(change_log.latest()), resync_required=True)
+        #keep one change per entity, at its last position; created + updated is still created
+        collapsed: Dict[UUID, Change] = {}
+        for entry in entries:
+            earlier = collapsed.pop(entry.id, None)
+            op = "created" if earlier is not None and earlier.op == "created" and entry.op == "updated" else entry.op
+            collapsed[entry.id] = Change(seq=entry.seq, entity=entry.entity, id=entry.id, op=op)
+        stores = {"user": users_db, "course": courses_db, "enrollment": enrollments_db}
+        for change in collapsed.values():
+            if change.op != "deleted":
+                change.data = stores[change.entity].get(change.id)
+                #deleted after the entries were read; the tombstone is also in the log
+                if change.data is None:
+                    change.op = "deleted"
+        return ChangeFeed(
+            latest=change_log.token(entries[-1].seq if entries else seq),
+            changes=list(collapsed.values()),
+        )
@@ -1,29 +1,65 @@
 
 from uuid import uuid4, UUID 
 from datetime import datetime
-from app.schemas.course_schema import CourseCreate, CourseResponse, CourseUpdate
-from app.core.db import courses_db
+from pydantic import ValidationError
+from app.schemas.bulk_schema import RowError, validation_detail
+from app.schemas.course_schema import CourseCreate, CourseResponse, CourseSeats, CourseUpdate, CourseUpsertSummary
+from app.core.db import change_log, course_fragments, course_versions, courses_db, enrollments_db, entity_locks, waitlists
+from app.core.pagination import decode_cursor, encode_cursor
+from app.repositories.base_repository import normalize_key
+from app.schemas.page_schema import ByIds, Page
+from app.services.enrollment_services import EnrollmentService
+from typing import Dict, Iterable, List, Optional, Union
 
 
 class CourseService:
     @staticmethod
-    def create_course(course_create: CourseCreate):
+    def _check_course(course_create: CourseCreate):
         if not course_create.title or not course_create.title.strip():
             raise ValueError("Course title is required")
         if not course_create.code or not course_create.code.strip():
             raise ValueError("Course code is required")
+
+    @staticmethod
+    def create_course(course_create: CourseCreate):
+        CourseService._check_course(course_create)
         #unique code validation
-        for course in courses_db.values():
-            if course.code.lower() == course_create.code.lower():
-                raise ValueError("Course code already exists")
+        if courses_db.owner_of(course_create.code) is not None:
+            raise ValueError("Course code already exists")
         new_course = CourseResponse(
             id=uuid4(),
             code=course_create.code.upper(),
             title=course_create.title,
+            capacity=course_create.capacity,
             created_at=datetime.utcnow()
         )
         courses_db[new_course.id] = new_course
+        CourseService._written(new_course.id, "created")
         return new_course
+
+    @staticmethod
+    def _check_capacity(course_id: UUID, capacity: Optional[int]):
+        #call with the course locked, so no enrollment lands after the count
+        if capacity is None:
+            return
+        taken = enrollments_db.seats_taken(course_id)
+        if capacity < taken:
+            raise ValueError(f"Capacity {capacity} is below the {taken} students already enrolled")
+
+    @staticmethod
+    def _written(course_id: UUID, op: str):
+        #after every write: drop the cached JSON, move the ETags on and log it
+        course_fragments.invalidate(course_id)
+        course_versions.bump(course_id)
+        change_log.record("course", course_id, op)
+
+    @staticmethod
+    def courses_etag() -> str:
+        return course_versions.collection_etag()
+
+    @staticmethod
+    def course_etag(course_id: UUID) -> str:
+        return course_versions.entity_etag(course_id)
     
     @staticmethod
     def get_all_courses():
@@ -32,56 +68,218 @@ class CourseService:
             raise ValueError("No courses available")
         return courses
     
+    @staticmethod
+    def get_courses_page(limit: int, cursor: Optional[str] = None) -> Page[CourseResponse]:
+        courses, position = courses_db.page(decode_cursor(cursor), limit)
+        return Page[CourseResponse](items=courses, next_cursor=encode_cursor(position))
+
+    @staticmethod
+    def get_courses_by_ids(course_ids: List[UUID]) -> ByIds[CourseResponse]:
+        """The courses with the given ids in one lookup, plus the ids not found."""
+        course_ids = list(dict.fromkeys(course_ids))
+        found = courses_db.get_many(course_ids)
+        return ByIds[CourseResponse](
+            items=[found[course_id] for course_id in course_ids if course_id in found],
+            missing=[course_id for course_id in course_ids if course_id not in found],
+        )
+
+    #JSON variants of the reads above, assembled from cached per-course fragments
+    @staticmethod
+    def get_all_courses_json() -> bytes:
+        since = course_fragments.clock()
+        return course_fragments.dump_list(CourseService.get_all_courses(), since)
+
+    @staticmethod
+    def get_courses_page_json(limit: int, cursor: Optional[str] = None) -> bytes:
+        since = course_fragments.clock()
+        courses, position = courses_db.page(decode_cursor(cursor), limit)
+        return course_fragments.dump_page(courses, encode_cursor(position), since)
+
+    @staticmethod
+    def get_course_json(course_id: UUID) -> bytes:
+        since = course_fragments.clock()
+        return course_fragments.dump(CourseService.get_course(course_id), since)
+
     @staticmethod
     def get_course(course_id: UUID):
         course = courses_db.get(course_id)
         if not course:
             raise ValueError("Course not found")
         return course
+
+    @staticmethod
+    def get_seats(course_id: UUID) -> CourseSeats:
+        course = CourseService.get_course(course_id)
+        taken = enrollments_db.seats_taken(course_id)
+        if course.capacity is None:
+            return CourseSeats(taken=taken)
+        return CourseSeats(capacity=course.capacity, taken=taken, available=max(course.capacity - taken, 0))
+
+    @staticmethod
+    def get_course_by_code(code: str):
+        course = courses_db.get_by_code(code)
+        if not course:
+            raise ValueError("Course not found")
+        return course
     
     @staticmethod
     def replace_course(course_id: UUID, course_update: CourseCreate):
-        course = courses_db.get(course_id)
-        if course is None:
-            raise ValueError("Course not found")
-        if not course_update.title or not course_update.title.strip():
-            raise ValueError("Course title is required")
-        if not course_update.code or not course_update.code.strip():
-            raise ValueError("Course code is required")
-        #check unique course code
-        if course_update.code is not None:
-            for c in courses_db.values():
-                if c.id != course_id and c.code.lower() == course_update.code.lower():
-                    raise ValueError(f"Course code '{course_update.code}' is already assigned to another course.")
-        course.updated_at = datetime.utcnow()
-        course.code = course_update.code.upper()
-        course.title = course_update.title
-        courses_db[course_id] = course
+        CourseService._check_course(course_update)
+        with entity_locks.hold(course_id):
+            course = courses_db.get(course_id)
+            if course is None:
+                raise ValueError("Course not found")
+            #check unique course code
+            owner = courses_db.owner_of(course_update.code)
+            if owner is not None and owner != course_id:
+                raise ValueError(f"Course code '{course_update.code}' is already assigned to another course.")
+            CourseService._check_capacity(course_id, course_update.capacity)
+            course = course.model_copy(update={
+                "code": course_update.code.upper(),
+                "title": course_update.title,
+                "capacity": course_update.capacity,
+                "updated_at": datetime.utcnow(),
+            })
+            courses_db[course_id] = course
+            CourseService._written(course_id, "updated")
+        #a raised (or removed) capacity lets waiting students in
+        EnrollmentService.promote_after_write(course_id)
         return course
-        
+
     @staticmethod
     def partial_update_course(course_id: UUID, course_update: CourseUpdate):
-        course = courses_db.get(course_id)
-        if course is None:
-            raise ValueError("Course not found")
-        if course_update.title:
-            course.title = course_update.title.strip()
-        if course_update.code:
-            course.code = course_update.code.strip()
-        course.updated_at = datetime.utcnow()
-        courses_db[course_id] = course
+        with entity_locks.hold(course_id):
+            course = courses_db.get(course_id)
+            if course is None:
+                raise ValueError("Course not found")
+            if course_update.code:
+                owner = courses_db.owner_of(course_update.code)
+                if owner is not None and owner != course_id:
+                    raise ValueError(f"Course code '{course_update.code}' is already assigned to another course.")
+            changes = {"updated_at": datetime.utcnow()}
+            if course_update.capacity is not None:
+                CourseService._check_capacity(course_id, course_update.capacity)
+                changes["capacity"] = course_update.capacity
+            if course_update.title:
+                changes["title"] = course_update.title.strip()
+            if course_update.code:
+                changes["code"] = course_update.code.strip()
+            course = course.model_copy(update=changes)
+            courses_db[course_id] = course
+            CourseService._written(course_id, "updated")
+        #a raised (or removed) capacity lets waiting students in
+        EnrollmentService.promote_after_write(course_id)
         return course
 
     @staticmethod
     def delete_course(course_id: UUID):
-        course = courses_db.get(course_id)
-        if not course:
-            raise ValueError("Course not found.")
-        del courses_db[course_id]
-
-    
-
-
+        #holding the course's lock keeps new enrollments out while they cascade
+        with entity_locks.hold(course_id):
+            course = courses_db.get(course_id)
+            if not course:
+                raise ValueError("Course not found.")
+            enrolled = [enrollment.id for enrollment in enrollments_db.for_course(course_id)]
+            courses_db.delete_with_enrollments(course_id, enrollments_db)
+            waitlists.drop_course(course_id)
+            for enrollment_id in enrolled:
+                change_log.record("enrollment", enrollment_id, "deleted")
+            CourseService._written(course_id, "deleted")
 
+    @staticmethod
+    def upsert_courses(rows: Iterable[Union[dict, ValueError]], remove_missing: bool = False) -> CourseUpsertSummary:
+        """Apply a catalog feed keyed by course code: new codes are created,
+        known ones updated when their title, code spelling or capacity
+        differs, and, with remove_missing, courses whose code isn't in the
+        feed are deleted (with their enrollments). Rows without a capacity
+        leave it as it is; an empty one removes the limit. Nothing is applied
+        if any row is invalid. A row that couldn't be parsed is passed as the
+        ValueError saying why."""
+        errors: List[RowError] = []
+        feed: Dict[str, CourseCreate] = {}
+        row_of: Dict[str, int] = {}
+        received = 0
+        for received, row in enumerate(rows, 1):
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                if isinstance(row, dict) and row.get("capacity") == "":
+                    #an empty CSV cell
+                    row = {**row, "capacity": None}
+                course_create = CourseCreate.model_validate(row)
+                CourseService._check_course(course_create)
+            except ValidationError as exc:
+                errors.append(RowError(row=received, detail=validation_detail(exc)))
+                continue
+            except ValueError as exc:
+                errors.append(RowError(row=received, detail=str(exc)))
+                continue
+            key = normalize_key(course_create.code)
+            if key in feed:
+                errors.append(RowError(row=received, detail=f"Course code '{course_create.code}' appears more than once"))
+                continue
+            feed[key] = course_create
+            row_of[key] = received
+        if errors:
+            return CourseUpsertSummary(received=received, committed=False, errors=errors)
 
+        summary = CourseUpsertSummary(received=received, committed=True)
+        owners = courses_db.owners_of(feed)
+        missing = []
+        if remove_missing:
+            missing = [course.id for course in courses_db.values() if normalize_key(course.code) not in feed]
+        now = datetime.utcnow()
+        #the courses being changed are locked like single writes lock theirs
+        with entity_locks.hold(*owners.values(), *missing):
+            changed, created = [], []
+            for key, course_create in feed.items():
+                title = course_create.title.strip().lower()
+                course = courses_db.get(owners[key]) if key in owners else None
+                if course is None:
+                    course = CourseResponse(
+                        id=uuid4(), code=course_create.code, title=title, capacity=course_create.capacity, created_at=now
+                    )
+                    created.append(course)
+                    continue
+                capacity = course_create.capacity if "capacity" in course_create.model_fields_set else course.capacity
+                if course.code != course_create.code or course.title != title or course.capacity != capacity:
+                    if capacity != course.capacity:
+                        try:
+                            CourseService._check_capacity(course.id, capacity)
+                        except ValueError as exc:
+                            return CourseUpsertSummary(
+                                received=received, committed=False, errors=[RowError(row=row_of[key], detail=str(exc))]
+                            )
+                    changed.append(course.model_copy(update={
+                        "code": course_create.code, "title": title, "capacity": capacity, "updated_at": now,
+                    }))
+                else:
+                    summary.unchanged += 1
+            try:
+                courses_db.put_many(changed + created)
+            except ValueError:
+                #a code was taken by a concurrent create since the lookup: report those rows
+                taken = courses_db.owners_of(feed)
+                errors = [
+                    RowError(row=row_of[normalize_key(course.code)], detail=courses_db.conflict_message)
+                    for course in changed + created
+                    if taken.get(normalize_key(course.code), course.id) != course.id
+                ]
+                if not errors:
+                    raise
+                errors.sort(key=lambda error: error.row)
+                return CourseUpsertSummary(received=received, committed=False, errors=errors)
+            for course in changed:
+                CourseService._written(course.id, "updated")
+            for course in created:
+                CourseService._written(course.id, "created")
+            summary.updated, summary.created = len(changed), len(created)
+            for course_id in missing:
+                try:
+                    CourseService.delete_course(course_id)
+                except ValueError:
+                    continue
+                summary.removed += 1
+        for course in changed:
+            EnrollmentService.promote_after_write(course.id)
+        return summary
 
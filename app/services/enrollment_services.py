@@ -1,37 +1,204 @@
-from fastapi import Depends, HTTPException
+import logging
 from uuid import uuid4, UUID
-from typing import List, Dict
-from app.core.db import users_db, courses_db, enrollments_db
-from app.schemas.enrollment_schema import EnrollmentCreate, EnrollmentDetails, EnrollmentResponse, EnrollmentRequest
-from app.api.deps import is_student_user
+from typing import Dict, Iterable, Iterator, List, Optional
+from app.core.db import change_log, entity_locks, users_db, courses_db, enrollments_db, waitlists
+from app.core.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+from app.repositories.base_repository import COURSE_FULL
+from app.schemas.page_schema import Page
+from app.schemas.enrollment_schema import (
+    EnrollmentBatchItem, EnrollmentBatchResult, EnrollmentCreate, EnrollmentDetails, EnrollmentResponse, EnrollmentRequest,
+    EnrollmentSideloaded, EnrolledCourse, StudentDashboard, WaitlistPosition,
+)
 from app.schemas.course_schema import CourseResponse
 from app.schemas.user_schema import UserRole, UserResponse
-from app.services.user_services import UserService
 from datetime import datetime, timezone
 
+
+logger = logging.getLogger(__name__)
+
+
 class EnrollmentService:
     @staticmethod
     def enroll_student(user_id: UUID, course_id: UUID):
-        user = users_db.get(user_id)
-        if not user:
-            raise ValueError("User does not exist")
-        course = courses_db.get(course_id)
-        if not course:
-            raise ValueError("Course does not exist")
-        #prevent duplicate enrollment
-        for e in enrollments_db.values():
-            if e.user_id == user.id and e.course_id == course.id:
+        #user and course are locked together (in shard order) so neither can
+        #be deleted, nor the pair enrolled twice, between the checks and the insert
+        with entity_locks.hold(user_id, course_id):
+            user = users_db.get(user_id)
+            if not user:
+                raise ValueError("User does not exist")
+            course = courses_db.get(course_id)
+            if not course:
+                raise ValueError("Course does not exist")
+            #prevent duplicate enrollment
+            if enrollments_db.find(user.id, course.id) is not None:
                 raise ValueError("Student is already enrolled in this course")
-        new_id = uuid4()
+            #every enrollment into the course is made under its lock, so the
+            #count can't move between this check and the insert
+            if course.capacity is not None and enrollments_db.seats_taken(course.id) >= course.capacity:
+                raise ValueError(COURSE_FULL)
+            #a seat freed while students wait is theirs, whoever asks first
+            if waitlists.waiting(course.id):
+                raise ValueError(COURSE_FULL)
+            return EnrollmentService._insert(user.id, course.id)
+
+    @staticmethod
+    def _insert(user_id: UUID, course_id: UUID) -> EnrollmentResponse:
+        #call with the pair locked and checked
         enrollment_in_db = EnrollmentResponse(
-            id=new_id,
-            user_id=user.id,
-            course_id=course.id,
+            id=uuid4(),
+            user_id=user_id,
+            course_id=course_id,
             enrolled_on=datetime.now(timezone.utc)
         )
         enrollments_db[enrollment_in_db.id] = enrollment_in_db
+        change_log.record("enrollment", enrollment_in_db.id, "created")
         return enrollment_in_db
 
+    @staticmethod
+    def join_waitlist(user_id: UUID, course_id: UUID) -> WaitlistPosition:
+        """Queue a student for a full course; they're enrolled automatically,
+        in joining order, as seats free up."""
+        with entity_locks.hold(user_id, course_id):
+            user = users_db.get(user_id)
+            if not user:
+                raise ValueError("User does not exist")
+            if user.role != UserRole.STUDENT:
+                raise ValueError("Only students can enroll in courses")
+            course = courses_db.get(course_id)
+            if not course:
+                raise ValueError("Course does not exist")
+            if enrollments_db.find(user_id, course_id) is not None:
+                raise ValueError("Student is already enrolled in this course")
+            full = course.capacity is not None and enrollments_db.seats_taken(course_id) >= course.capacity
+            if not (full or waitlists.waiting(course_id)):
+                raise ValueError("Course has free seats; enroll instead")
+            position = waitlists.join(course_id, user_id)
+            return WaitlistPosition(course_id=course_id, user_id=user_id, position=position, waiting=waitlists.waiting(course_id))
+
+    @staticmethod
+    def leave_waitlist(user_id: UUID, course_id: UUID):
+        if not waitlists.leave(course_id, user_id):
+            raise ValueError("Not on the waitlist for this course")
+        return {"message": "Successfully left the waitlist."}
+
+    @staticmethod
+    def waitlist_position(user_id: UUID, course_id: UUID) -> WaitlistPosition:
+        position = waitlists.position(course_id, user_id)
+        if position is None:
+            raise ValueError("Not on the waitlist for this course")
+        return WaitlistPosition(course_id=course_id, user_id=user_id, position=position, waiting=waitlists.waiting(course_id))
+
+    @staticmethod
+    def promote_waitlisted(course_id: UUID) -> List[EnrollmentResponse]:
+        """Enroll students from the head of the course's waitlist while it
+        has free seats. Call with no entity locks held: each head is locked
+        with the course in shard order before it's taken off the queue."""
+        promoted = []
+        failed = None
+        while True:
+            user_id = waitlists.head(course_id)
+            if user_id is None:
+                return promoted
+            with entity_locks.hold(user_id, course_id):
+                if waitlists.head(course_id) != user_id:
+                    #they left, or another promotion took them, before the lock
+                    continue
+                course = courses_db.get(course_id)
+                if course is None:
+                    waitlists.drop_course(course_id)
+                    return promoted
+                if course.capacity is not None and enrollments_db.seats_taken(course_id) >= course.capacity:
+                    return promoted
+                #deleted since joining, or enrolled by an admin meanwhile
+                if user_id not in users_db or enrollments_db.find(user_id, course_id) is not None:
+                    waitlists.leave(course_id, user_id)
+                    continue
+                #taken off the queue only once they're in, so a failed insert keeps their place
+                try:
+                    promoted.append(EnrollmentService._insert(user_id, course_id))
+                except ValueError:
+                    #another worker got in first (took the seat, deleted the user or
+                    #course): the checks above see it on the next pass
+                    if failed == user_id:
+                        return promoted
+                    failed = user_id
+                    continue
+                waitlists.leave(course_id, user_id)
+
+    @staticmethod
+    def promote_after_write(course_id: UUID):
+        """promote_waitlisted once a write that freed seats has committed: a
+        failed promotion is logged rather than raised, so it can't turn that
+        write's response into an error. The students keep their places."""
+        try:
+            EnrollmentService.promote_waitlisted(course_id)
+        except Exception:
+            logger.exception("Promoting the waitlist of course %s failed", course_id)
+
+    @staticmethod
+    def enroll_batch(pairs: List[EnrollmentCreate], atomic: bool = True) -> EnrollmentBatchResult:
+        """Enroll each (user_id, course_id) pair, looking every distinct user
+        and course up once. Atomic batches enroll all pairs or none;
+        otherwise the valid pairs are enrolled and the rest report why not."""
+        results = [
+            EnrollmentBatchItem(row=row, user_id=pair.user_id, course_id=pair.course_id)
+            for row, pair in enumerate(pairs, 1)
+        ]
+        user_ids = {item.user_id for item in results}
+        course_ids = {item.course_id for item in results}
+        #every user and course in the batch is locked, as enroll_student locks its pair
+        with entity_locks.hold(*user_ids, *course_ids):
+            users = {user_id: users_db.get(user_id) for user_id in user_ids}
+            courses = {course_id: courses_db.get(course_id) for course_id in course_ids}
+            #seats left in each limited course, taken as pairs are accepted; none
+            #while students wait, as enroll_student refuses (freed seats are theirs)
+            seats = {}
+            for course_id, course in courses.items():
+                if course is None:
+                    continue
+                if waitlists.waiting(course_id):
+                    seats[course_id] = 0
+                elif course.capacity is not None:
+                    seats[course_id] = course.capacity - enrollments_db.seats_taken(course_id)
+            seen = set()
+            now = datetime.now(timezone.utc)
+            new = []
+            for item in results:
+                user = users[item.user_id]
+                if user is None:
+                    item.error = "User does not exist"
+                elif user.role != UserRole.STUDENT:
+                    item.error = "Only students can enroll in courses"
+                elif courses[item.course_id] is None:
+                    item.error = "Course does not exist"
+                elif (item.user_id, item.course_id) in seen:
+                    item.error = "Pair appears more than once in the batch"
+                elif enrollments_db.find(item.user_id, item.course_id) is not None:
+                    item.error = "Student is already enrolled in this course"
+                elif seats.get(item.course_id, 1) <= 0:
+                    item.error = COURSE_FULL
+                else:
+                    if item.course_id in seats:
+                        seats[item.course_id] -= 1
+                    seen.add((item.user_id, item.course_id))
+                    new.append((item, EnrollmentResponse.model_construct(
+                        id=uuid4(), user_id=item.user_id, course_id=item.course_id, enrolled_on=now
+                    )))
+            failed = len(results) - len(new)
+            if not (atomic and failed):
+                enrollments_db.insert_many(enrollment for _, enrollment in new)
+                for item, enrollment in new:
+                    item.enrollment_id = enrollment.id
+                    change_log.record("enrollment", enrollment.id, "created")
+        enrolled = 0 if atomic and failed else len(new)
+        return EnrollmentBatchResult(
+            requested=len(results),
+            enrolled=enrolled,
+            failed=len(results) - enrolled,
+            committed=not (atomic and failed),
+            results=results,
+        )
+
     @staticmethod
     def retrieve_student_enrollments(user_id: UUID) -> List[CourseResponse]:
         user = users_db.get(user_id) 
@@ -39,16 +206,31 @@ class EnrollmentService:
             raise ValueError("User does not exist") 
         if user.role != UserRole.STUDENT: 
             raise ValueError("Only students can enroll in courses") 
-        results: List[EnrollmentResponse] = [] 
-        # Loop through all enrollments 
-        for enrollment in enrollments_db.values():
-            if str(enrollment.user_id) != str(user_id): 
-                continue 
-            results.append(enrollment)
+        results: List[EnrollmentResponse] = enrollments_db.for_user(user_id)
         if not results:
             raise ValueError("No enrollments found.")
         return results # type: ignore
 
+    @staticmethod
+    def student_dashboard(user_id: UUID) -> StudentDashboard:
+        """The student and their courses in full: the per-user enrollment
+        index gives the rows, and one get_many fetches all their courses."""
+        user = users_db.get(user_id)
+        if not user:
+            raise ValueError("User does not exist")
+        if user.role != UserRole.STUDENT:
+            raise ValueError("Only students can enroll in courses")
+        enrollments = enrollments_db.for_user(user_id)
+        courses = courses_db.get_many(enrollment.course_id for enrollment in enrollments)
+        return StudentDashboard(
+            student=user,
+            courses=[
+                EnrolledCourse(enrollment_id=enrollment.id, enrolled_on=enrollment.enrolled_on, course=courses[enrollment.course_id])
+                #the course was deleted (with this enrollment) between the two reads
+                for enrollment in enrollments if enrollment.course_id in courses
+            ],
+        )
+
     @staticmethod
     def student_deregister(user_id: UUID, course_id: UUID):
         user = users_db.get(user_id)
@@ -58,61 +240,115 @@ class EnrollmentService:
         course = courses_db.get(course_id)
         if not course:
             raise ValueError("Course does not exist")
-        enrollment_to_delete = None
-
-        for enrollment_id, enrollment in enrollments_db.items(): 
-            if enrollment.user_id == user_id and enrollment.course_id == course_id: 
-                enrollment_to_delete = enrollment_id 
-                break
-        if not enrollment_to_delete: 
-            raise ValueError("Enrollment not found")
-        del enrollments_db[enrollment_to_delete]
+        with entity_locks.hold(user_id, course_id):
+            enrollment_to_delete = enrollments_db.find(user_id, course_id)
+            if not enrollment_to_delete:
+                raise ValueError("Enrollment not found")
+            del enrollments_db[enrollment_to_delete.id]
+            change_log.record("enrollment", enrollment_to_delete.id, "deleted")
+        EnrollmentService.promote_after_write(course_id)
         return {
             "message": "Successfully deregister from the course."
         }
         
     @staticmethod
-    def admin_retrieve_enrollments() -> List[EnrollmentDetails]:
-        results: List[EnrollmentDetails] = []
-        for enrollment in enrollments_db.values():
+    def _details(enrollments: Iterable[EnrollmentResponse], course: Optional[CourseResponse] = None) -> Iterator[EnrollmentDetails]:
+        """The enrollments with their student and course, skipping any whose
+        user or course was deleted (with its enrollments) after they were read."""
+        for enrollment in enrollments:
             student = users_db.get(enrollment.user_id)
-            course = courses_db.get(enrollment.course_id)
-            if not student or not course: 
-                continue 
-            results.append(EnrollmentDetails(
-                id=enrollment.id, 
-                student=student, 
-                course=course, 
+            enrolled_in = course or courses_db.get(enrollment.course_id)
+            if student is None or enrolled_in is None:
+                continue
+            yield EnrollmentDetails(
+                id=enrollment.id,
+                student=student,
+                course=enrolled_in,
                 enrolled_on=enrollment.enrolled_on
-            ))
+            )
+
+    @staticmethod
+    def admin_retrieve_enrollments() -> List[EnrollmentDetails]:
+        results = list(EnrollmentService._details(enrollments_db.values()))
         if not results:
             raise ValueError("No enrollments found.")
         return results
     
+    @staticmethod
+    def admin_enrollments_page(limit: int, cursor: Optional[str] = None) -> Page[EnrollmentDetails]:
+        enrollments, position = enrollments_db.page(decode_cursor(cursor), limit)
+        items = list(EnrollmentService._details(enrollments))
+        return Page[EnrollmentDetails](items=items, next_cursor=encode_cursor(position))
+
+    @staticmethod
+    def stream_enrollment_details(batch_size: int = 1000) -> Iterator[EnrollmentDetails]:
+        """Yield every enrollment with its student and course, reading the
+        store one page at a time so memory stays flat however many there are."""
+        position = None
+        while True:
+            enrollments, position = enrollments_db.page(position, batch_size)
+            yield from EnrollmentService._details(enrollments)
+            if position is None:
+                return
+
     @staticmethod
     def admin_retrieve_course_enrollments(course_id: UUID):
-        results = []
         course = courses_db.get(course_id)
         if not course:
             raise ValueError("Course does not exist")
-        for enrollment in enrollments_db.values():
-            if enrollment.course_id != course_id:
-                continue
-            student = users_db.get(enrollment.user_id)
-            if not student:
-                continue
-            results.append(
-                EnrollmentDetails(
-                    id=enrollment.id,
-                    student=student,
-                    course=course,
-                    enrolled_on=enrollment.enrolled_on
-                )
-            )
+        results = list(EnrollmentService._details(enrollments_db.for_course(course_id), course))
         if not results:
             raise ValueError(f"No enrollments found for this course {course.title}.")
         return results
 
+    @staticmethod
+    def admin_course_enrollments_page(course_id: UUID, limit: int, cursor: Optional[str] = None) -> Page[EnrollmentDetails]:
+        course = courses_db.get(course_id)
+        if not course:
+            raise ValueError("Course does not exist")
+        enrollments, position = enrollments_db.page_for_course(course_id, decode_cursor(cursor), limit)
+        items = list(EnrollmentService._details(enrollments, course))
+        return Page[EnrollmentDetails](items=items, next_cursor=encode_cursor(position))
+
+    @staticmethod
+    def sideload(enrollments: List[EnrollmentResponse], next_cursor: Optional[str] = None) -> EnrollmentSideloaded:
+        """Compact form of a listing: rows keep only ids, and each user and
+        course they reference is included once."""
+        users: Dict[UUID, UserResponse] = {}
+        courses: Dict[UUID, CourseResponse] = {}
+        rows = []
+        for enrollment in enrollments:
+            if enrollment.user_id not in users:
+                student = users_db.get(enrollment.user_id)
+                if student is None:
+                    continue
+                users[enrollment.user_id] = student
+            if enrollment.course_id not in courses:
+                course = courses_db.get(enrollment.course_id)
+                if course is None:
+                    continue
+                courses[enrollment.course_id] = course
+            rows.append(enrollment)
+        return EnrollmentSideloaded(enrollments=rows, users=users, courses=courses, next_cursor=next_cursor)
+
+    @staticmethod
+    def admin_enrollments_compact(limit: Optional[int] = None, cursor: Optional[str] = None) -> EnrollmentSideloaded:
+        if limit is None and cursor is None:
+            return EnrollmentService.sideload(list(enrollments_db.values()))
+        enrollments, position = enrollments_db.page(decode_cursor(cursor), limit or DEFAULT_PAGE_SIZE)
+        return EnrollmentService.sideload(enrollments, encode_cursor(position))
+
+    @staticmethod
+    def admin_course_enrollments_compact(
+        course_id: UUID, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> EnrollmentSideloaded:
+        if courses_db.get(course_id) is None:
+            raise ValueError("Course does not exist")
+        if limit is None and cursor is None:
+            return EnrollmentService.sideload(enrollments_db.for_course(course_id))
+        enrollments, position = enrollments_db.page_for_course(course_id, decode_cursor(cursor), limit or DEFAULT_PAGE_SIZE)
+        return EnrollmentService.sideload(enrollments, encode_cursor(position))
+
     @staticmethod
     def admin_force_deregister(user_id: UUID, course_id: UUID):
         student = users_db.get(user_id)
@@ -121,13 +357,35 @@ class EnrollmentService:
         course = courses_db.get(course_id)
         if not course:
             raise ValueError("Course does not exist")
-        
-        for enrollment in list(enrollments_db.values()):
-            if enrollment.user_id == user_id and enrollment.course_id == course_id:
-                del enrollments_db[enrollment.id]
-            return {"message": "Student successfully deregistered by admin."}
-
-        raise ValueError("Enrollment not found")
+        with entity_locks.hold(user_id, course_id):
+            enrollment = enrollments_db.find(user_id, course_id)
+            if enrollment is None:
+                raise ValueError("Enrollment not found")
+            del enrollments_db[enrollment.id]
+            change_log.record("enrollment", enrollment.id, "deleted")
+        EnrollmentService.promote_after_write(course_id)
+        return {"message": "Student successfully deregistered by admin."}
 
 
             
+
+    @staticmethod
+    def purge_orphaned_enrollments() -> int:
+        """Delete enrollments whose user or course no longer exists.
+
+        Deletes cascade now, so this only cleans up stores written before
+        they did; run it once with `python -m app.maintenance purge-orphans`.
+        """
+        removed = 0
+        freed = set()
+        for enrollment in enrollments_db.values():
+            if enrollment.user_id in users_db and enrollment.course_id in courses_db:
+                continue
+            with entity_locks.hold(enrollment.user_id, enrollment.course_id):
+                if enrollments_db.pop(enrollment.id, None) is not None:
+                    change_log.record("enrollment", enrollment.id, "deleted")
+                    removed += 1
+                    freed.add(enrollment.course_id)
+        for course_id in freed:
+            EnrollmentService.promote_after_write(course_id)
+        return removed
@@ -1,12 +1,19 @@
 from uuid import UUID, uuid4 
 from datetime import datetime 
-from app.schemas.user_schema import UserResponse, UserUpdate, UserCreate
-from app.core.db import users_db
+from itertools import islice
+from typing import Iterable, List, Optional, Union
+from pydantic import ValidationError
+from app.schemas.bulk_schema import RowError, validation_detail
+from app.schemas.user_schema import UserImportRow, UserImportSummary, UserResponse, UserUpdate, UserCreate
+from app.core.db import change_log, entity_locks, enrollments_db, user_fragments, users_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.services.enrollment_services import EnrollmentService
+from app.schemas.page_schema import ByIds, Page
 
 
 class UserService:
     @staticmethod
-    def create_user(user_create: UserCreate):
+    def _check_new_user(user_create: UserCreate):
         if not user_create.name or not user_create.name.strip():  # type: ignore
             raise ValueError("Name is required") 
         if not user_create.email:  # type: ignore
@@ -15,9 +22,12 @@ class UserService:
             raise ValueError("role cannot be empty")
         if user_create.role not in ("student", "admin"):  # type: ignore
             raise ValueError("Invalid role")
-        for u in users_db.values():
-            if u.email.lower() == user_create.email.lower():
-                raise ValueError("A user with this email already exist")
+
+    @staticmethod
+    def create_user(user_create: UserCreate):
+        UserService._check_new_user(user_create)
+        if users_db.owner_of(user_create.email) is not None:
+            raise ValueError("A user with this email already exist")
         user = UserResponse(
             id=uuid4(), # type: ignore
             name=user_create.name, # type: ignore
@@ -27,14 +37,37 @@ class UserService:
             updated_at=None
         )
         users_db[user.id] = user
+        UserService._written(user.id, "created")
         return user
 
+    @staticmethod
+    def import_users(rows: Iterable[dict], atomic: bool = True, batch_size: int = 1000) -> UserImportSummary:
+        """Create a user per row (UserCreate fields), batch_size rows at a time."""
+        importer = UserImporter(atomic)
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            importer.add(batch)
+        return importer.finish()
+
+    @staticmethod
+    def _written(user_id: UUID, op: str):
+        #after every write: drop the cached JSON and log it
+        user_fragments.invalidate(user_id)
+        change_log.record("user", user_id, op)
+
     @staticmethod
     def get_user_by_id(user_id: UUID):
         user = users_db.get(user_id)
         if not user:
             raise ValueError("User not found")
         return user
+
+    @staticmethod
+    def get_user_by_email(email: str):
+        user = users_db.get_by_email(email)
+        if not user:
+            raise ValueError("User not found")
+        return user
     
     @staticmethod
     def get_all_users():
@@ -43,27 +76,157 @@ class UserService:
             raise ValueError("No users found")
         return users
 
+    @staticmethod
+    def get_users_page(limit: int, cursor: Optional[str] = None) -> Page[UserResponse]:
+        users, position = users_db.page(decode_cursor(cursor), limit)
+        return Page[UserResponse](items=users, next_cursor=encode_cursor(position))
+
+    @staticmethod
+    def get_users_by_ids(user_ids: List[UUID]) -> ByIds[UserResponse]:
+        """The users with the given ids in one lookup, plus the ids not found."""
+        user_ids = list(dict.fromkeys(user_ids))
+        found = users_db.get_many(user_ids)
+        return ByIds[UserResponse](
+            items=[found[user_id] for user_id in user_ids if user_id in found],
+            missing=[user_id for user_id in user_ids if user_id not in found],
+        )
+
+    #JSON variants of the reads above, assembled from cached per-user fragments
+    @staticmethod
+    def get_all_users_json() -> bytes:
+        since = user_fragments.clock()
+        return user_fragments.dump_list(UserService.get_all_users(), since)
+
+    @staticmethod
+    def get_users_page_json(limit: int, cursor: Optional[str] = None) -> bytes:
+        since = user_fragments.clock()
+        users, position = users_db.page(decode_cursor(cursor), limit)
+        return user_fragments.dump_page(users, encode_cursor(position), since)
+
+    @staticmethod
+    def get_user_json(user_id: UUID) -> bytes:
+        since = user_fragments.clock()
+        return user_fragments.dump(UserService.get_user_by_id(user_id), since)
+
     @staticmethod
     def update_user(user_id: UUID, data: UserUpdate):
-        user = users_db.get(user_id)
-        if not user:
-            raise ValueError("User not found")
-        if data.name is not None:
-            user.name = data.name
-        if data.email is not None:
-            user.email = data.email
-        if data.role is not None:
-            user.role = data.role
-        user.updated_at = datetime.utcnow()
-        users_db[user_id] = user
-        return user
+        #read-modify-write under the user's lock; the stored model is replaced,
+        #never mutated, so readers and a failed write see the old version
+        with entity_locks.hold(user_id):
+            user = users_db.get(user_id)
+            if not user:
+                raise ValueError("User not found")
+            if data.email is not None:
+                owner = users_db.owner_of(data.email)
+                if owner is not None and owner != user_id:
+                    raise ValueError("A user with this email already exist")
+            changes = {key: value for key, value in data.model_dump().items() if value is not None}
+            user = user.model_copy(update={**changes, "updated_at": datetime.utcnow()})
+            users_db[user_id] = user
+            UserService._written(user_id, "updated")
+            return user
 
     @staticmethod
     def delete_user(user_id: UUID):
-        user = users_db.get(user_id)
-        if not user:
-            raise ValueError("User not found.")
-        del users_db[user_id]
+        #holding the user's lock keeps new enrollments out while they cascade
+        with entity_locks.hold(user_id):
+            user = users_db.get(user_id)
+            if not user:
+                raise ValueError("User not found.")
+            enrolled = enrollments_db.for_user(user_id)
+            users_db.delete_with_enrollments(user_id, enrollments_db)
+            for enrollment in enrolled:
+                change_log.record("enrollment", enrollment.id, "deleted")
+            UserService._written(user_id, "deleted")
+        #the seats they held go to the courses' waitlists
+        for enrollment in enrolled:
+            EnrollmentService.promote_after_write(enrollment.course_id)
+
 
+class UserImporter:
+    """One bulk import, fed a batch of rows at a time and then finished.
 
+    Each batch is validated as UserCreate (see UserImportRow) and checked for emails taken
+    earlier in the import or already in the store (one owners_of lookup per
+    batch). Atomic imports keep every valid row until finish() and then
+    store all or none of them; otherwise each batch's valid rows are stored
+    as soon as it is checked and bad rows are only reported.
+    """
 
+    def __init__(self, atomic: bool = True):
+        self.atomic = atomic
+        self.received = 0
+        self.errors: List[RowError] = []
+        self._emails = set()
+        self._pending = []
+        self._created = 0
+
+    def add(self, rows: List[Union[dict, ValueError]]):
+        """Check a batch of rows; a row that couldn't be parsed is passed as
+        the ValueError saying why."""
+        checked = []
+        for row in rows:
+            self.received += 1
+            if isinstance(row, ValueError):
+                self.errors.append(RowError(row=self.received, detail=str(row)))
+                continue
+            try:
+                user_create = UserImportRow.model_validate(row)
+                UserService._check_new_user(user_create)
+            except ValidationError as exc:
+                self.errors.append(RowError(row=self.received, detail=validation_detail(exc)))
+                continue
+            except ValueError as exc:
+                self.errors.append(RowError(row=self.received, detail=str(exc)))
+                continue
+            checked.append((self.received, user_create))
+        taken = users_db.owners_of(user_create.email for _, user_create in checked)
+        now = datetime.utcnow()
+        valid = []
+        for row_number, user_create in checked:
+            #the validator has already normalized the email
+            if user_create.email in taken or user_create.email in self._emails:
+                self.errors.append(RowError(row=row_number, detail="A user with this email already exist"))
+                continue
+            self._emails.add(user_create.email)
+            #fields were validated just above
+            valid.append((row_number, UserResponse.model_construct(
+                id=uuid4(), name=user_create.name, email=user_create.email,
+                role=user_create.role, created_at=now, updated_at=None,
+            )))
+        if self.atomic:
+            self._pending.extend(valid)
+        else:
+            self._store(valid)
+
+    def _store(self, valid):
+        try:
+            users_db.insert_many(user for _, user in valid)
+        except ValueError:
+            #another request took one of the emails since the check: report those rows
+            taken = users_db.owners_of(user.email for _, user in valid)
+            if not taken:
+                raise
+            for row_number, user in valid:
+                if user.email in taken:
+                    self.errors.append(RowError(row=row_number, detail="A user with this email already exist"))
+            if not self.atomic:
+                self._store([(row_number, user) for row_number, user in valid if user.email not in taken])
+            return
+        self._created += len(valid)
+        for _, user in valid:
+            UserService._written(user.id, "created")
+
+    def finish(self) -> UserImportSummary:
+        if self.atomic:
+            if not self.errors:
+                self._store(self._pending)
+            self._pending = []
+        self.errors.sort(key=lambda error: error.row)
+        return UserImportSummary(
+            received=self.received,
+            created=self._created,
+            failed=self.received - self._created,
+            committed=not self.atomic or not self.errors,
+            errors=self.errors,
+        )
@@ -0,0 +1,79 @@
+"""Requests per second and latency with --clients concurrent clients, with
+service calls run on the event loop (inline_services, the default) versus
+all sent to the threadpool (inline_services=false, as the sync routes did).
+
+    python -m benchmarks.bench_async_routes --clients 1000 --requests 10
+
+Each client sends --requests requests, a mix of user and course reads and
+student enrollments. Clients are asyncio tasks talking to the app in the
+same event loop (httpx's ASGI transport), so the numbers leave out the
+network and HTTP parsing but not the event loop or the threadpool.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+import httpx
+from app.core.config import settings
+from app.core.db import courses_db, enrollments_db, users_db
+from app.main import app
+from app.schemas.course_schema import CourseResponse
+from app.schemas.user_schema import UserResponse
+from benchmarks.bench_enrollment_stream import course_code
+
+
+def seed(n_users, n_courses):
+    now = datetime.now(timezone.utc)
+    users = [UserResponse(id=uuid4(), name=f"user{i}", email=f"user{i}@gmail.com", role="student", created_at=now) for i in range(n_users)]
+    courses = [CourseResponse(id=uuid4(), code=course_code(i), title=f"Course {i}", created_at=now) for i in range(n_courses)]
+    users_db.put_many(users)
+    courses_db.put_many(courses)
+    return [str(user.id) for user in users], [str(course.id) for course in courses]
+
+
+async def client_session(client, index, requests, users, courses, latencies):
+    user_id = users[index % len(users)]
+    for n in range(requests):
+        course_id = courses[(index + n) % len(courses)]
+        started = time.perf_counter()
+        #as reading the request off a socket would, let the other clients run
+        await asyncio.sleep(0)
+        if n % 5 == 4:
+            response = await client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": user_id})
+        elif n % 2:
+            response = await client.get(f"/api/v1/courses/{course_id}")
+        else:
+            response = await client.get(f"/api/v1/users/{user_id}")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code < 500
+
+
+async def load(clients, requests, users, courses):
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[client_session(client, i, requests, users, courses, latencies) for i in range(clients)])
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    ms = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+    return len(latencies) / elapsed, ms(50), ms(99), latencies[-1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+    for inline in (False, True):
+        for store in (users_db, courses_db, enrollments_db):
+            store.clear()
+        users, courses = seed(args.clients, 200)
+        settings.inline_services = inline
+        rps, p50, p99, worst = asyncio.run(load(args.clients, args.requests, users, courses))
+        label = "event loop" if inline else "threadpool"
+        print(f"{label:>10}: {rps:7.0f} req/s, p50 {p50:7.1f}ms, p99 {p99:7.1f}ms, max {worst:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Enrolling a cohort into a course through one batch request versus one
+POST /api/v1/enrollments per student, with the enrollments table already
+holding --enrollments rows.
+
+    python -m benchmarks.bench_batch_enroll --cohort 5000 --enrollments 0 200000
+
+Requests go through the ASGI app in process (TestClient), against the
+configured store.
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+from fastapi.testclient import TestClient
+from app.core.db import courses_db, enrollments_db, users_db
+from app.main import app
+from app.schemas.course_schema import CourseResponse
+from app.schemas.user_schema import UserResponse
+from benchmarks.bench_enrollment_stream import seed
+
+
+def cohort(size, code):
+    now = datetime.now(timezone.utc)
+    course = CourseResponse(id=uuid4(), code=code, title="Cohort", created_at=now)
+    courses_db[course.id] = course
+    students = [
+        UserResponse(id=uuid4(), name=f"new{i}", email=f"{code}new{i}@gmail.com", role="student", created_at=now)
+        for i in range(size)
+    ]
+    for student in students:
+        users_db[student.id] = student
+    return str(course.id), [str(student.id) for student in students]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cohort", type=int, default=5000)
+    parser.add_argument("--enrollments", type=int, nargs="+", default=[0, 200_000])
+    args = parser.parse_args()
+    #one event loop (and worker threadpool) for all the requests, as under uvicorn
+    with TestClient(app) as client:
+        for size in args.enrollments:
+            for store in (users_db, courses_db, enrollments_db):
+                store.clear()
+            if size:
+                seed(size, 10_000, 500)
+            admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+
+            course_id, students = cohort(args.cohort, "ZZA001")
+            started = time.perf_counter()
+            for student_id in students:
+                client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": student_id})
+            single = time.perf_counter() - started
+
+            course_id, students = cohort(args.cohort, "ZZB001")
+            started = time.perf_counter()
+            result = client.post(
+                f"/api/v1/enrollments/admin/{course_id}/enrollments/batch", json={"user_ids": students}, headers={"X-User-Id": admin_id}
+            ).json()
+            batch = time.perf_counter() - started
+            assert result["enrolled"] == args.cohort
+            print(f"table {size:>8,}: one by one {single:6.2f}s, batch {batch:6.2f}s ({single / batch:4.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Enrollment write throughput against the memory store from a thread pool,
+with sharded locks versus a single shard (one global lock).
+
+    python -m benchmarks.bench_concurrent_writes --ops 200000 --threads 1 4 16
+
+Each worker inserts enrollments for its own users and deletes every other
+one, so writers only contend on shared shards.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.repositories.memory_repository import MemoryEnrollmentStore
+from app.schemas.enrollment_schema import EnrollmentResponse
+
+
+def run(store, threads, ops):
+    now = datetime.now(timezone.utc)
+    course_ids = [uuid4() for _ in range(100)]
+    per_thread = ops // threads
+
+    def work(_):
+        user_id = uuid4()
+        for i in range(per_thread):
+            if i % len(course_ids) == 0:
+                user_id = uuid4()
+            enrollment = EnrollmentResponse.model_construct(
+                id=uuid4(), user_id=user_id, course_id=course_ids[i % len(course_ids)], enrolled_on=now
+            )
+            store[enrollment.id] = enrollment
+            if i % 2:
+                del store[enrollment.id]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(work, range(threads)))
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    for label, shards, partitions in (("sharded", 64, 4), ("global", 1, 1)):
+        for threads in args.threads:
+            rate = run(MemoryEnrollmentStore(lock_shards=shards, partitions=partitions), threads, args.ops)
+            print(f"{label:>8} threads={threads:<3} {rate:10,.0f} writes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Pushing a course catalog through POST /api/v1/courses/bulk versus one
+POST /api/v1/courses per course, then pushing it again with a tenth of the
+titles changed.
+
+    python -m benchmarks.bench_course_upsert --courses 5000
+
+Requests go through the ASGI app in process (TestClient), against the
+configured store.
+"""
+import argparse
+import time
+from fastapi.testclient import TestClient
+from app.core.db import courses_db, users_db
+from app.main import app
+from benchmarks.bench_enrollment_stream import course_code
+
+
+def catalog(courses, offset=0, edition=0):
+    rows = [f"{course_code(offset + i)},Course {i}{' v2' if edition and i % 10 == 0 else ''}" for i in range(courses)]
+    return ("code,title\n" + "\n".join(rows) + "\n").encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=5000)
+    args = parser.parse_args()
+    users_db.clear()
+    courses_db.clear()
+    client = TestClient(app)
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    headers = {"X-User-Id": admin_id}
+
+    started = time.perf_counter()
+    for i in range(args.courses):
+        client.post("/api/v1/courses", json={"code": course_code(args.courses + i), "title": f"Course {i}"}, headers=headers)
+    print(f"{'one by one':>14}: {time.perf_counter() - started:6.2f}s")
+
+    courses_db.clear()
+    headers["Content-Type"] = "text/csv"
+    for label, body in (("bulk create", catalog(args.courses)), ("bulk re-push", catalog(args.courses, edition=1))):
+        started = time.perf_counter()
+        summary = client.post("/api/v1/courses/bulk", content=body, headers=headers).json()
+        elapsed = time.perf_counter() - started
+        counts = f"created {summary['created']}, updated {summary['updated']}, unchanged {summary['unchanged']}"
+        print(f"{label:>14}: {elapsed:6.2f}s ({counts})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Loading a student's dashboard (profile plus every enrolled course) as
+GET /student/{id}/courses followed by one GET /courses/{id} per enrollment,
+versus the single GET /student/{id}/dashboard. Every student has --courses
+enrollments, in a table of --students times that many.
+
+    python -m benchmarks.bench_dashboard --courses 50 --students 2000 --loads 500
+
+Requests go through the ASGI app in process (TestClient), against the
+configured store; latencies are per dashboard load.
+"""
+import argparse
+import time
+from fastapi.testclient import TestClient
+from app.core.db import courses_db, enrollments_db, users_db
+from app.main import app
+from benchmarks.bench_enrollment_stream import seed
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {p: samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000 for p in (50, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--loads", type=int, default=500)
+    args = parser.parse_args()
+    for store in (users_db, courses_db, enrollments_db):
+        store.clear()
+    seed(args.courses * args.students, args.students, max(args.courses, 500))
+    students = [str(users_db.get_by_email(f"user{i}@gmail.com").id) for i in range(args.students)]
+
+    def one_by_one(client, student_id):
+        headers = {"X-User-Id": student_id}
+        client.get(f"/api/v1/users/{student_id}")
+        for enrollment in client.get(f"/api/v1/enrollments/student/{student_id}/courses", headers=headers).json():
+            client.get(f"/api/v1/courses/{enrollment['course_id']}")
+
+    def composite(client, student_id):
+        data = client.get(f"/api/v1/enrollments/student/{student_id}/dashboard", headers={"X-User-Id": student_id}).json()
+        assert len(data["courses"]) == args.courses
+
+    with TestClient(app) as client:
+        for label, load in (("1 + N requests", one_by_one), ("dashboard", composite)):
+            load(client, students[0])
+            samples = []
+            for i in range(args.loads):
+                started = time.perf_counter()
+                load(client, students[i % len(students)])
+                samples.append(time.perf_counter() - started)
+            p = percentiles(samples)
+            print(f"{label:>14}: p50 {p[50]:7.2f}ms, p99 {p[99]:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
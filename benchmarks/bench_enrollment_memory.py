@@ -0,0 +1,62 @@
+"""Compare per-row memory of enrollments held as pydantic models in a dict
+with the columnar MemoryEnrollmentStore.
+
+    python -m benchmarks.bench_enrollment_memory --enrollments 1000000 [--only columnar]
+
+Memory is measured with tracemalloc, so it counts Python allocations only.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.repositories.memory_repository import MemoryEnrollmentStore
+from app.schemas.enrollment_schema import EnrollmentResponse
+
+
+def rows(n_enrollments, n_users, n_courses):
+    now = datetime.now(timezone.utc)
+    user_ids = [uuid4() for _ in range(n_users)]
+    course_ids = [uuid4() for _ in range(n_courses)]
+    for i in range(n_enrollments):
+        yield EnrollmentResponse.model_construct(
+            id=uuid4(), user_id=user_ids[i % n_users],
+            course_id=course_ids[(i // n_users) % n_courses], enrolled_on=now,
+        )
+
+
+def measure(label, store, args):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    for enrollment in rows(args.enrollments, args.users, args.courses):
+        store[enrollment.id] = enrollment
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>9}: {current / 2**20:8.1f} MiB, {current / args.enrollments:6.1f} B/row, "
+          f"{args.enrollments / elapsed:,.0f} inserts/s")
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--courses", type=int, default=2_000)
+    parser.add_argument("--only", choices=("dict", "columnar"))
+    args = parser.parse_args()
+
+    results = {}
+    if args.only != "columnar":
+        results["dict"] = measure("dict", {}, args)
+    if args.only != "dict":
+        results["columnar"] = measure("columnar", MemoryEnrollmentStore(), args)
+    if len(results) == 2:
+        print(f"reduction: {results['dict'] / results['columnar']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
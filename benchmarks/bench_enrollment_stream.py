@@ -0,0 +1,70 @@
+"""Peak memory of the admin enrollment listing built as one list and
+serialized in one go, versus streamed as NDJSON.
+
+    python -m benchmarks.bench_enrollment_stream --enrollments 100000
+
+Uses the services and the configured stores directly (no HTTP); memory is
+measured with tracemalloc, counting Python allocations only.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import List
+from uuid import uuid4
+from pydantic import TypeAdapter
+from app.api.v1.enrollments import ndjson_lines
+from app.core.db import courses_db, enrollments_db, users_db
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentDetails, EnrollmentResponse
+from app.schemas.user_schema import UserResponse
+from app.services.enrollment_services import EnrollmentService
+
+
+def course_code(index):
+    #codes are three letters and three digits
+    letters = "".join(chr(65 + (index // 1000 // 26 ** k) % 26) for k in range(3))
+    return f"{letters}{index % 1000:03d}"
+
+
+def seed(n_enrollments, n_users, n_courses):
+    now = datetime.now(timezone.utc)
+    users = [UserResponse(id=uuid4(), name=f"user{i}", email=f"user{i}@gmail.com", role="student", created_at=now)
+             for i in range(n_users)]
+    courses = [CourseResponse(id=uuid4(), code=course_code(i), title=f"Course {i}", created_at=now) for i in range(n_courses)]
+    for user in users:
+        users_db[user.id] = user
+    for course in courses:
+        courses_db[course.id] = course
+    for i in range(n_enrollments):
+        enrollment = EnrollmentResponse.model_construct(
+            id=uuid4(), user_id=users[i % n_users].id, course_id=courses[(i // n_users) % n_courses].id, enrolled_on=now
+        )
+        enrollments_db[enrollment.id] = enrollment
+
+
+def measure(label, produce):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = produce()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>6}: peak {peak / 2**20:8.1f} MiB, {size / 2**20:7.1f} MiB out, {elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--enrollments", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--courses", type=int, default=500)
+    args = parser.parse_args()
+    seed(args.enrollments, args.users, args.courses)
+
+    adapter = TypeAdapter(List[EnrollmentDetails])
+    measure("list", lambda: len(adapter.dump_json(EnrollmentService.admin_retrieve_enrollments())))
+    measure("stream", lambda: sum(map(len, ndjson_lines(EnrollmentService.stream_enrollment_details()))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Mobile clients retrying POST /api/v1/enrollments/: --students students
+each enroll once and then retry --retries times, with an Idempotency-Key
+(retries replay the stored 201) versus without one (every retry runs the
+route and the service and fails as a duplicate).
+
+    python -m benchmarks.bench_idempotency --students 2000 --retries 5
+
+Requests go through the ASGI app in process (TestClient), against the
+configured store; latencies are per retry.
+"""
+import argparse
+import time
+from fastapi.testclient import TestClient
+from app.core.db import courses_db, enrollments_db, idempotency_keys, users_db
+from app.main import app
+from benchmarks.bench_dashboard import percentiles
+from benchmarks.bench_enrollment_stream import seed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args()
+    with TestClient(app) as client:
+        for label, keyed in (("no key", False), ("idempotency key", True)):
+            for store in (users_db, courses_db, enrollments_db, idempotency_keys):
+                store.clear()
+            seed(0, args.students, 1)
+            course_id = str(next(iter(courses_db.values())).id)
+            students = [str(users_db.get_by_email(f"user{i}@gmail.com").id) for i in range(args.students)]
+            samples, statuses = [], set()
+            for index, student_id in enumerate(students):
+                headers = {"X-User-Id": student_id}
+                if keyed:
+                    headers["Idempotency-Key"] = f"enroll-{index}"
+                client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers=headers)
+                for _ in range(args.retries):
+                    started = time.perf_counter()
+                    response = client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers=headers)
+                    samples.append(time.perf_counter() - started)
+                    statuses.add(response.status_code)
+            assert len(enrollments_db) == args.students
+            p = percentiles(samples)
+            print(
+                f"{label:>15}: {len(samples) / sum(samples):7,.0f} retries/s, p50 {p[50]:6.2f}ms, "
+                f"p99 {p[99]:6.2f}ms, status {sorted(statuses)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Time journal recovery for a memory store holding N enrollments.
+
+    python -m benchmarks.bench_journal_recovery --enrollments 1000000 [--format binary]
+
+Builds users, courses and enrollments, compacts them into a snapshot,
+appends a log tail of further enrollments, then recovers into fresh stores.
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.repositories.journal import Journal
+from app.repositories.memory_repository import MemoryCourseStore, MemoryEnrollmentStore, MemoryUserStore
+from app.schemas.user_schema import UserResponse, UserRole
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse
+
+
+def new_stores():
+    stores = (MemoryUserStore(), MemoryCourseStore(), MemoryEnrollmentStore())
+    return stores, {store.name: store for store in stores}
+
+
+def populate(users, courses, enrollments, n_users, n_courses, n_enrollments, start=0):
+    now = datetime.now(timezone.utc)
+    user_ids = list(users) or []
+    course_ids = list(courses) or []
+    for i in range(len(user_ids), n_users):
+        user = UserResponse.model_construct(id=uuid4(), name=f"student {i}", email=f"s{i}@uni.edu",
+                                            role=UserRole.STUDENT, created_at=now, updated_at=None)
+        users[user.id] = user
+        user_ids.append(user.id)
+    for i in range(len(course_ids), n_courses):
+        course = CourseResponse.model_construct(id=uuid4(), code=f"C{i:05d}", title=f"course {i}",
+                                                created_at=now, updated_at=None)
+        courses[course.id] = course
+        course_ids.append(course.id)
+    for i in range(start, start + n_enrollments):
+        enrollment = EnrollmentResponse.model_construct(
+            id=uuid4(), user_id=user_ids[i % n_users],
+            course_id=course_ids[(i // n_users) % n_courses], enrolled_on=now,
+        )
+        enrollments[enrollment.id] = enrollment
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--courses", type=int, default=2_000)
+    parser.add_argument("--tail", type=int, default=50_000)
+    parser.add_argument("--format", choices=("json", "binary"), default="json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        (users, courses, enrollments), by_name = new_stores()
+        journal = Journal(directory, by_name, snapshot_every=10**12, snapshot_format=args.format)
+        journal.recover()
+        populate(users, courses, enrollments, args.users, args.courses, args.enrollments)
+        started = time.perf_counter()
+        journal.snapshot()
+        print(f"snapshot written in {time.perf_counter() - started:.2f}s")
+        for store in (users, courses, enrollments):
+            store.journal = journal
+        populate(users, courses, enrollments, args.users, args.courses, args.tail, start=args.enrollments)
+        journal.close()
+        probe = next(iter(enrollments.values()))
+        del users, courses, enrollments, by_name
+
+        (users, courses, enrollments), by_name = new_stores()
+        stats = Journal(directory, by_name, snapshot_format=args.format).recover()
+        print(f"recovered {stats.snapshot_rows} snapshot rows + {stats.replayed} log records "
+              f"({len(enrollments)} enrollments) in {stats.seconds * 1000:.1f}ms")
+        started = time.perf_counter()
+        users[probe.user_id]
+        enrollments.for_user(probe.user_id)
+        enrollments.find(probe.user_id, probe.course_id)
+        print(f"first user lookup + enrollment queries in {(time.perf_counter() - started) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
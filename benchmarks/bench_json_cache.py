@@ -0,0 +1,70 @@
+"""GET /api/v1/courses and /api/v1/users through the app, with responses
+serialized per request versus assembled from cached JSON fragments, and
+conditional GETs of the courses answered 304 from their ETag.
+
+    python -m benchmarks.bench_json_cache --courses 500 --users 5000
+
+Requests go through the ASGI app in process (TestClient), so the times
+include routing and the test transport, not just serialization.
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.db import course_fragments, courses_db, user_fragments, users_db
+from app.main import app
+from app.schemas.course_schema import CourseResponse
+from app.schemas.user_schema import UserResponse
+from benchmarks.bench_enrollment_stream import course_code
+
+
+def seed(n_courses, n_users):
+    now = datetime.now(timezone.utc)
+    for i in range(n_courses):
+        course = CourseResponse(id=uuid4(), code=course_code(i), title=f"Course {i}", created_at=now)
+        courses_db[course.id] = course
+    for i in range(n_users):
+        user = UserResponse(id=uuid4(), name=f"user{i}", email=f"user{i}@gmail.com", role="student", created_at=now)
+        users_db[user.id] = user
+
+
+def measure(client, url, requests, status=200, headers=None):
+    client.get(url, headers=headers)
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url, headers=headers)
+    elapsed = time.perf_counter() - started
+    assert response.status_code == status
+    return elapsed / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    seed(args.courses, args.users)
+    client = TestClient(app)
+
+    for url in ("/api/v1/courses", "/api/v1/users?limit=100", "/api/v1/users"):
+        settings.json_cache = False
+        plain = measure(client, url, args.requests)
+        settings.json_cache = True
+        course_fragments.clear()
+        user_fragments.clear()
+        cached = measure(client, url, args.requests)
+        print(f"{url:>24}: {plain:7.2f} ms -> {cached:7.2f} ms per request ({plain / cached:4.1f}x)")
+
+    settings.json_cache = False
+    for label, url in (("/api/v1/courses", "/api/v1/courses"), ("/api/v1/courses/{id}", f"/api/v1/courses/{next(iter(courses_db))}")):
+        etag = client.get(url).headers["etag"]
+        plain = measure(client, url, args.requests)
+        conditional = measure(client, url, args.requests, 304, {"If-None-Match": etag})
+        print(f"{'304 ' + label:>24}: {plain:7.2f} ms -> {conditional:7.2f} ms per request ({plain / conditional:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Fetching --ids users one GET /api/v1/users/{id} at a time versus one
+GET /api/v1/users?ids=... for all of them, with --users in the store.
+
+    python -m benchmarks.bench_multi_get --ids 10 100 1000 --users 100000
+
+Requests go through the ASGI app in process (TestClient), against the
+configured store.
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+from fastapi.testclient import TestClient
+from app.core.db import users_db
+from app.main import app
+from app.schemas.user_schema import UserResponse
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ids", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+    users_db.clear()
+    now = datetime.now(timezone.utc)
+    users = [
+        UserResponse(id=uuid4(), name=f"user{i}", email=f"user{i}@gmail.com", role="student", created_at=now)
+        for i in range(args.users)
+    ]
+    users_db.put_many(users)
+    with TestClient(app) as client:
+        #first requests pay for route and schema setup
+        client.get("/api/v1/users", params={"ids": str(users[0].id)})
+        client.get(f"/api/v1/users/{users[0].id}")
+        for count in args.ids:
+            ids = [str(user.id) for user in users[::len(users) // count][:count]]
+            started = time.perf_counter()
+            for user_id in ids:
+                client.get(f"/api/v1/users/{user_id}")
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            found = client.get("/api/v1/users", params={"ids": ",".join(ids)}).json()
+            multi = time.perf_counter() - started
+            assert len(found["items"]) == count
+            print(f"{count:>5} ids: one by one {single * 1000:8.1f}ms, multi-get {multi * 1000:6.1f}ms ({single / multi:4.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
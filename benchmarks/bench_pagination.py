@@ -0,0 +1,58 @@
+"""Cost of one page at increasing cursor depths, and of walking everything.
+
+    python -m benchmarks.bench_pagination --enrollments 500000 --limit 100
+
+Pages are taken straight from the memory enrollment store, without HTTP.
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.repositories.memory_repository import MemoryEnrollmentStore
+from app.schemas.enrollment_schema import EnrollmentResponse
+
+
+def timed(action, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = action()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--enrollments", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    store = MemoryEnrollmentStore()
+    now = datetime.now(timezone.utc)
+    user_ids = [uuid4() for _ in range(args.enrollments // 10)]
+    course_ids = [uuid4() for _ in range(100)]
+    for i in range(args.enrollments):
+        enrollment = EnrollmentResponse.model_construct(
+            id=uuid4(), user_id=user_ids[i % len(user_ids)], course_id=course_ids[i // len(user_ids)], enrolled_on=now
+        )
+        store[enrollment.id] = enrollment
+
+    #collect cursors at a few depths by walking once
+    marks = {0: None}
+    walked, position, started = 0, None, time.perf_counter()
+    while True:
+        page, position = store.page(position, 1000)
+        walked += len(page)
+        for depth in (args.enrollments // 2, args.enrollments - 1000):
+            if depth not in marks and walked >= depth:
+                marks[depth] = position
+        if position is None:
+            break
+    print(f"walked {walked:,} rows in pages of 1000: {time.perf_counter() - started:.2f}s")
+    for depth, cursor in sorted(marks.items()):
+        seconds, _ = timed(lambda: store.page(cursor, args.limit))
+        print(f"page of {args.limit} at depth {depth:>9,}: {seconds * 1000:.2f} ms")
+    seconds, _ = timed(lambda: store.values(), repeat=1)
+    print(f"full listing (values): {seconds * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""One script hammering the API while --clients ordinary clients use it,
+without rate limits and with the default ones (RATE_LIMIT=true): the
+script keeps --flood requests for the full user list in flight, and each
+client sends --requests reads of single users, pausing between them.
+
+    INLINE_SERVICES=false python -m benchmarks.bench_rate_limit --clients 50 --requests 40 --flood 50
+
+With INLINE_SERVICES=false (as with blocking stores) the script's requests
+queue for the threadpool ahead of everyone else's.
+
+Reports the clients' latency and how many of the script's requests were
+served or turned away (429). Also times TokenBuckets.take with --callers
+identities in the table.
+"""
+import argparse
+import asyncio
+import random
+import time
+import httpx
+from app.api import deps
+from app.core.config import settings
+from app.core.db import courses_db, enrollments_db, users_db
+from app.core.rate_limit import Limit, TokenBuckets
+from app.main import app
+from benchmarks.bench_async_routes import seed
+
+
+def default_limits():
+    return TokenBuckets(
+        {
+            "reads": Limit(settings.rate_limit_reads, settings.rate_limit_reads_burst),
+            "writes": Limit(settings.rate_limit_writes, settings.rate_limit_writes_burst),
+            "admin": Limit(settings.rate_limit_admin, settings.rate_limit_admin_burst),
+        },
+        idle=settings.rate_limit_idle,
+        capacity=settings.rate_limit_buckets,
+    )
+
+
+async def flood(client, script_id, stop, outcomes):
+    while not stop.is_set():
+        await asyncio.sleep(0)
+        response = await client.get("/api/v1/users/", headers={"X-User-Id": script_id})
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+
+
+async def session(client, user_id, requests, latencies):
+    for _ in range(requests):
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        response = await client.get(f"/api/v1/users/{user_id}", headers={"X-User-Id": user_id})
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+
+
+async def load(args, users):
+    latencies, outcomes = [], {}
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        script = [asyncio.create_task(flood(client, users[-1], stop, outcomes)) for _ in range(args.flood)]
+        await asyncio.gather(*[session(client, users[i], args.requests, latencies) for i in range(args.clients)])
+        stop.set()
+        await asyncio.gather(*script)
+    latencies.sort()
+    ms = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+    return ms(50), ms(99), outcomes
+
+
+def time_table(callers, takes):
+    buckets = default_limits()
+    identities = [f"user{i}" for i in range(callers)]
+    rng = random.Random(callers)
+    picks = [rng.choice(identities) for _ in range(takes)]
+    started = time.perf_counter()
+    for identity in picks:
+        buckets.take(identity, "reads")
+    return takes / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--flood", type=int, default=50)
+    parser.add_argument("--callers", type=int, nargs="+", default=[1000, 100000])
+    args = parser.parse_args()
+    for store in (users_db, courses_db, enrollments_db):
+        store.clear()
+    users, _ = seed(2000, 1)
+    for label, limits in (("no limits", None), ("rate limited", default_limits())):
+        deps.rate_limits = limits
+        p50, p99, outcomes = asyncio.run(load(args, users))
+        print(
+            f"{label:>12}: clients p50 {p50:7.1f}ms, p99 {p99:7.1f}ms; script served {outcomes.get(200, 0):,}, "
+            f"turned away {outcomes.get(429, 0):,}"
+        )
+    for callers in args.callers:
+        print(f"TokenBuckets.take, {callers:,} callers: {time_table(callers, 200_000):,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
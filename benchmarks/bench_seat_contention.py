@@ -0,0 +1,77 @@
+"""Registration opening: --students students race for --courses popular
+courses of --capacity seats each, from a thread pool calling
+EnrollmentService.enroll_student, with the O(1) seat count versus counting
+the course's enrollments on every attempt.
+
+    python -m benchmarks.bench_seat_contention --students 4000 --courses 5 --capacity 400 --threads 1 16
+
+Every student tries one course, so most attempts are turned away once the
+courses fill up; the run checks no course ends up over capacity.
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.core.db import courses_db, enrollments_db, users_db
+from app.schemas.course_schema import CourseResponse
+from app.schemas.user_schema import UserResponse
+from app.services.enrollment_services import EnrollmentService
+from benchmarks.bench_enrollment_stream import course_code
+
+
+def seed(n_students, n_courses, capacity):
+    for store in (users_db, courses_db, enrollments_db):
+        store.clear()
+    now = datetime.now(timezone.utc)
+    students = [
+        UserResponse(id=uuid4(), name=f"user{i}", email=f"user{i}@gmail.com", role="student", created_at=now)
+        for i in range(n_students)
+    ]
+    courses = [
+        CourseResponse(id=uuid4(), code=course_code(i), title=f"Course {i}", capacity=capacity, created_at=now)
+        for i in range(n_courses)
+    ]
+    users_db.put_many(students)
+    courses_db.put_many(courses)
+    return [student.id for student in students], [course.id for course in courses]
+
+
+def attempt(pair):
+    try:
+        EnrollmentService.enroll_student(*pair)
+        return True
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=4000)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--capacity", type=int, default=400)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+    counter = enrollments_db.seats_taken
+    scan = lambda course_id: len(enrollments_db.for_course(course_id))
+    for label, seats_taken in (("counter", counter), ("scan", scan)):
+        enrollments_db.seats_taken = seats_taken
+        for threads in args.threads:
+            students, courses = seed(args.students, args.courses, args.capacity)
+            rng = random.Random(threads)
+            pairs = [(student_id, rng.choice(courses)) for student_id in students]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                enrolled = sum(pool.map(attempt, pairs, chunksize=64))
+            elapsed = time.perf_counter() - started
+            assert all(counter(course_id) <= args.capacity for course_id in courses)
+            assert enrolled == sum(counter(course_id) for course_id in courses)
+            print(
+                f"{label:>8} threads={threads:<3} {len(pairs) / elapsed:9,.0f} attempts/s, "
+                f"{enrolled:,} enrolled, {len(pairs) - enrolled:,} turned away"
+            )
+
+
+if __name__ == "__main__":
+    main()
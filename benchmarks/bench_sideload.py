@@ -0,0 +1,59 @@
+"""Payload size and serialization time of the admin listings in the full
+(EnrollmentDetails per row) and compact (side-loaded) formats.
+
+    python -m benchmarks.bench_sideload --roster 500 --enrollments 100000
+
+Uses the services and the configured stores directly (no HTTP); time covers
+building the response and dumping it to JSON.
+"""
+import argparse
+import time
+from typing import List
+from pydantic import TypeAdapter
+from app.core.db import courses_db
+from app.schemas.enrollment_schema import EnrollmentDetails
+from app.services.enrollment_services import EnrollmentService
+from benchmarks.bench_enrollment_stream import seed
+
+
+def measure(label, produce, repeat):
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(produce())
+        best = min(best, time.perf_counter() - started)
+    return label, size, best
+
+
+def report(rows):
+    full = rows[0]
+    for label, size, elapsed in rows:
+        print(f"{label:>16}: {size / 1024:10.1f} KiB ({size / full[1]:5.1%}), {elapsed * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roster", type=int, default=500)
+    parser.add_argument("--enrollments", type=int, default=100_000)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    #every user takes every course in turn, so the first course has --roster students
+    seed(args.enrollments, args.roster, args.courses)
+    course_id = next(iter(courses_db))
+
+    details = TypeAdapter(List[EnrollmentDetails])
+    print(f"roster of {args.roster}")
+    report([
+        measure("full", lambda: details.dump_json(EnrollmentService.admin_retrieve_course_enrollments(course_id)), args.repeat),
+        measure("compact", lambda: EnrollmentService.admin_course_enrollments_compact(course_id).model_dump_json(), args.repeat),
+    ])
+    print(f"admin dump of {args.enrollments}")
+    report([
+        measure("full", lambda: details.dump_json(EnrollmentService.admin_retrieve_enrollments()), args.repeat),
+        measure("compact", lambda: EnrollmentService.admin_enrollments_compact().model_dump_json(), args.repeat),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Importing users through POST /api/v1/users/import (CSV and NDJSON)
+versus one POST /api/v1/users per user.
+
+    python -m benchmarks.bench_user_import --users 100000
+
+Requests go through the ASGI app in process (TestClient), against the
+configured store; the one-by-one rate is measured on --single users.
+"""
+import argparse
+import json
+import time
+from fastapi.testclient import TestClient
+from app.core.db import users_db
+from app.main import app
+
+
+def ndjson_body(users, prefix):
+    for start in range(0, users, 1000):
+        yield "".join(
+            json.dumps({"name": f"User {i}", "email": f"{prefix}{i}@gmail.com", "role": "student"}) + "\n"
+            for i in range(start, min(start + 1000, users))
+        ).encode()
+
+
+def csv_body(users, prefix):
+    yield b"name,email,role\n"
+    for start in range(0, users, 1000):
+        yield "".join(f"User {i},{prefix}{i}@gmail.com,student\n" for i in range(start, min(start + 1000, users))).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=2000)
+    args = parser.parse_args()
+    users_db.clear()
+    client = TestClient(app)
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+
+    started = time.perf_counter()
+    for i in range(args.single):
+        client.post("/api/v1/users", json={"name": f"User {i}", "email": f"single{i}@gmail.com", "role": "student"})
+    rate = args.single / (time.perf_counter() - started)
+    print(f"{'one by one':>12}: {rate:9,.0f} users/s ({args.users / rate:6.1f}s for {args.users:,})")
+
+    for label, body, content_type in (("ndjson", ndjson_body, "application/x-ndjson"), ("csv", csv_body, "text/csv")):
+        started = time.perf_counter()
+        response = client.post(
+            "/api/v1/users/import", content=body(args.users, label),
+            headers={"X-User-Id": admin_id, "Content-Type": content_type},
+        )
+        elapsed = time.perf_counter() - started
+        assert response.json()["created"] == args.users, response.json()
+        print(f"{label:>12}: {args.users / elapsed:9,.0f} users/s ({elapsed:6.1f}s for {args.users:,})")
+
+
+if __name__ == "__main__":
+    main()
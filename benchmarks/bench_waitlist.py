@@ -0,0 +1,94 @@
+"""Waitlist operations on one course with --sizes students queued: the
+deque + Fenwick tree in app/core/waitlists.py versus a plain list, where a
+position is list.index, leaving is list.remove and promotion is pop(0).
+
+    python -m benchmarks.bench_waitlist --sizes 1000 10000 100000
+
+Each row times joining everyone, --polls random position lookups,
+a tenth of the queue leaving from random places, then promoting the rest
+one at a time; positions are checked against each other.
+"""
+import argparse
+import random
+import time
+from uuid import uuid4
+from app.core.waitlists import Waitlists
+
+
+class ListWaitlist:
+    def __init__(self):
+        self.queue = []
+
+    def join(self, course_id, user_id):
+        self.queue.append(user_id)
+        return len(self.queue)
+
+    def leave(self, course_id, user_id):
+        self.queue.remove(user_id)
+        return True
+
+    def position(self, course_id, user_id):
+        return self.queue.index(user_id) + 1
+
+    def head(self, course_id):
+        return self.queue[0] if self.queue else None
+
+    def promote(self, course_id):
+        return self.queue.pop(0)
+
+
+def promote(waitlists, course_id):
+    #as EnrollmentService.promote_waitlisted takes each head
+    user_id = waitlists.head(course_id)
+    waitlists.leave(course_id, user_id)
+    return user_id
+
+
+def rate(count, seconds):
+    return f"{count / seconds:12,.0f}/s"
+
+
+def run(label, waitlists, users, polls, leavers, take):
+    course_id = uuid4()
+    started = time.perf_counter()
+    for user_id in users:
+        waitlists.join(course_id, user_id)
+    joined = time.perf_counter() - started
+
+    started = time.perf_counter()
+    positions = [waitlists.position(course_id, user_id) for user_id in polls]
+    polled = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for user_id in leavers:
+        waitlists.leave(course_id, user_id)
+    left = time.perf_counter() - started
+
+    remaining = len(users) - len(leavers)
+    started = time.perf_counter()
+    order = [take(waitlists, course_id) for _ in range(remaining)]
+    promoted = time.perf_counter() - started
+    print(
+        f"{label:>8} n={len(users):<7} join {rate(len(users), joined)}  position {rate(len(polls), polled)}  "
+        f"leave {rate(len(leavers), left)}  promote {rate(remaining, promoted)}"
+    )
+    return positions, order
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--polls", type=int, default=2000)
+    args = parser.parse_args()
+    for size in args.sizes:
+        rng = random.Random(size)
+        users = [uuid4() for _ in range(size)]
+        polls = [rng.choice(users) for _ in range(args.polls)]
+        leavers = rng.sample(users, size // 10)
+        fenwick = run("fenwick", Waitlists(), users, polls, leavers, promote)
+        plain = run("list", ListWaitlist(), users, polls, leavers, lambda waitlist, course_id: waitlist.promote(course_id))
+        assert fenwick == plain
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.db import change_log, courses_db, enrollments_db, users_db
+import pytest
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def clear_dbs():
+    users_db.clear()
+    courses_db.clear()
+    enrollments_db.clear()
+
+def test_changes_since_returns_current_data_and_tombstones():
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    headers = {"X-User-Id": admin_id}
+    seq = change_log.latest()
+    since = change_log.token(seq)
+
+    course_id = client.post("/api/v1/courses", json={"code": "CSC101", "title": "Intro"}, headers=headers).json()["id"]
+    student_id = client.post("/api/v1/users", json={"name": "Student", "email": "student@gmail.com", "role": "student"}).json()["id"]
+    enrollment_id = client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": student_id}).json()["id"]
+    client.patch(f"/api/v1/courses/{course_id}", json={"title": "Renamed"}, headers=headers)
+
+    feed = client.get("/api/v1/changes", params={"since": since}, headers=headers).json()
+    assert feed["resync_required"] is False
+    assert feed["latest"] == change_log.token(seq + 4)
+    assert [(c["entity"], c["op"]) for c in feed["changes"]] == [("user", "created"), ("enrollment", "created"), ("course", "created")]
+    assert feed["changes"][2]["data"]["title"] == "renamed"
+
+    #deleting the student cascades to the enrollment; both come back as tombstones
+    client.delete(f"/api/v1/users/{student_id}")
+    feed = client.get("/api/v1/changes", params={"since": feed["latest"]}, headers=headers).json()
+    assert [(c["id"], c["op"], c["data"]) for c in feed["changes"]] == [(enrollment_id, "deleted", None), (student_id, "deleted", None)]
+
+    latest = feed["latest"]
+    assert client.get("/api/v1/changes", params={"since": latest}, headers=headers).json()["changes"] == []
+    #the same position in another worker's log (or an earlier process's)
+    elsewhere = "restarted:" + latest.partition(":")[2]
+    stale = client.get("/api/v1/changes", params={"since": elsewhere}, headers=headers).json()
+    assert stale["resync_required"] is True
+    assert stale["latest"] == latest
+    assert client.get("/api/v1/changes", params={"since": "42"}, headers=headers).status_code == 400
+    assert client.get("/api/v1/changes", params={"since": latest}, headers={"X-User-Id": student_id}).status_code == 404
@@ -249,3 +249,165 @@ def test_admin_delete_course_success():
     assert delete_response.status_code == 204
     assert delete_response.content == b""
 
+
+def test_get_course_by_code():
+    admin_response = client.post(
+        "/api/v1/users",
+        json={
+            "name": "Admin User",
+            "email": "admin@gmail.com",
+            "role": "admin"
+        }
+    )
+    admin_id = admin_response.json()["id"]
+    create_response = client.post(
+        "/api/v1/courses/",
+        json={"code": "CSC101", "title": "Intro to CS"},
+        headers={"X-User-Id": admin_id}
+    )
+    course_id = create_response.json()["id"]
+
+    response = client.get("/api/v1/courses/by-code/csc101")
+    assert response.status_code == 200
+    assert response.json()["id"] == course_id
+
+    missing = client.get("/api/v1/courses/by-code/CSC999")
+    assert missing.status_code == 404
+
+def test_get_courses_by_ids():
+    admin_id = client.post(
+        "/api/v1/users", json={"name": "Admin User", "email": "admin@gmail.com", "role": "admin"}
+    ).json()["id"]
+    ids = [
+        client.post("/api/v1/courses/", json={"code": f"CSC10{i}", "title": f"Course {i}"}, headers={"X-User-Id": admin_id}).json()["id"]
+        for i in range(3)
+    ]
+    unknown = str(uuid4())
+
+    response = client.get("/api/v1/courses", params={"ids": f"{ids[1]},{unknown},{ids[0]}"})
+    assert response.status_code == 200
+    assert [course["id"] for course in response.json()["items"]] == [ids[1], ids[0]]
+    assert response.json()["missing"] == [unknown]
+
+    posted = client.post("/api/v1/courses/lookup", json={"ids": ids})
+    assert [course["id"] for course in posted.json()["items"]] == ids
+    assert posted.json()["missing"] == []
+    assert client.get("/api/v1/courses", params={"ids": "CSC101"}).status_code == 400
+
+def test_course_capacity_and_seats():
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    response = client.post("/api/v1/courses/", json={"code": "CSC101", "title": "Intro", "capacity": 1}, headers={"X-User-Id": admin_id})
+    assert response.json()["capacity"] == 1
+    course_id = response.json()["id"]
+    students = [
+        client.post("/api/v1/users", json={"name": f"S{i}", "email": f"s{i}@gmail.com", "role": "student"}).json()["id"]
+        for i in range(2)
+    ]
+
+    assert client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": students[0]}).status_code == 201
+    full = client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": students[1]})
+    assert (full.status_code, full.json()["detail"]) == (400, "Course is full")
+    assert client.get(f"/api/v1/courses/{course_id}/seats").json() == {"capacity": 1, "taken": 1, "available": 0}
+    assert client.post("/api/v1/courses/", json={"code": "CSC102", "title": "Intro", "capacity": 0}, headers={"X-User-Id": admin_id}).status_code == 422
+
+def test_json_cache_serves_same_bytes_and_sees_updates(monkeypatch):
+    from app.core.config import settings
+    from app.core.db import course_fragments
+    course_fragments.clear()
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    ids = [
+        client.post("/api/v1/courses", json={"code": f"CSC10{i}", "title": f"Course {i}"}, headers={"X-User-Id": admin_id}).json()["id"]
+        for i in range(3)
+    ]
+    urls = ["/api/v1/courses", "/api/v1/courses?limit=2", f"/api/v1/courses/{ids[0]}"]
+    plain = [client.get(url).content for url in urls]
+
+    monkeypatch.setattr(settings, "json_cache", True)
+    for _ in range(2):
+        assert [client.get(url).content for url in urls] == plain
+    assert len(course_fragments) == 3
+
+    client.patch(f"/api/v1/courses/{ids[0]}", json={"title": "Renamed"}, headers={"X-User-Id": admin_id})
+    assert client.get(f"/api/v1/courses/{ids[0]}").json()["title"] == "renamed"
+    assert client.get("/api/v1/courses").json()[0]["title"] == "renamed"
+    client.delete(f"/api/v1/courses/{ids[1]}", headers={"X-User-Id": admin_id})
+    assert client.get(f"/api/v1/courses/{ids[1]}").status_code == 404
+    assert [course["id"] for course in client.get("/api/v1/courses").json()] == [ids[0], ids[2]]
+
+def test_course_etags_answer_304_until_a_write(monkeypatch):
+    from app.services.course_services import CourseService
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    course_id = client.post("/api/v1/courses", json={"code": "CSC101", "title": "Intro"}, headers={"X-User-Id": admin_id}).json()["id"]
+    other_id = client.post("/api/v1/courses", json={"code": "CSC102", "title": "Data"}, headers={"X-User-Id": admin_id}).json()["id"]
+
+    listing = client.get("/api/v1/courses")
+    single = client.get(f"/api/v1/courses/{course_id}")
+    list_etag, course_etag = listing.headers["etag"], single.headers["etag"]
+
+    def fail(*args):
+        raise AssertionError("a 304 must not read or serialize the course")
+    monkeypatch.setattr(CourseService, "get_all_courses", fail)
+    monkeypatch.setattr(CourseService, "get_course", fail)
+    not_modified = client.get("/api/v1/courses", headers={"If-None-Match": f'"stale", W/{list_etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == list_etag
+    assert not_modified.content == b""
+    assert client.get(f"/api/v1/courses/{course_id}", headers={"If-None-Match": course_etag}).status_code == 304
+    monkeypatch.undo()
+
+    #a write to another course moves the collection's ETag but not this course's
+    client.patch(f"/api/v1/courses/{other_id}", json={"title": "Renamed"}, headers={"X-User-Id": admin_id})
+    assert client.get("/api/v1/courses", headers={"If-None-Match": list_etag}).status_code == 200
+    assert client.get(f"/api/v1/courses/{course_id}", headers={"If-None-Match": course_etag}).status_code == 304
+
+    client.delete(f"/api/v1/courses/{course_id}", headers={"X-User-Id": admin_id})
+    assert client.get(f"/api/v1/courses/{course_id}", headers={"If-None-Match": course_etag}).status_code == 404
+
+def test_bulk_upsert_courses_csv():
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    headers = {"X-User-Id": admin_id, "Content-Type": "text/csv"}
+    body = "code,title\nCSC101,Intro\nCSC102,Data\n"
+    response = client.post("/api/v1/courses/bulk", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "received": 2, "created": 2, "updated": 0, "unchanged": 0, "removed": 0, "committed": True, "errors": []
+    }
+    response = client.post("/api/v1/courses/bulk", params={"remove_missing": True}, content="code,title\nCSC101,Intro 2\n", headers=headers)
+    assert (response.json()["updated"], response.json()["removed"]) == (1, 1)
+    assert [course["code"] for course in client.get("/api/v1/courses").json()] == ["CSC101"]
+
+def test_rate_limits_per_caller_and_route_class(monkeypatch):
+    from app.api import deps
+    from app.core.rate_limit import Limit, TokenBuckets
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    student_id = client.post("/api/v1/users", json={"name": "John", "email": "john@gmail.com", "role": "student"}).json()["id"]
+    monkeypatch.setattr(deps, "rate_limits", TokenBuckets({
+        "reads": Limit(rate=0.5, burst=2), "writes": Limit(rate=0.5, burst=1), "admin": Limit(rate=0.5, burst=1),
+    }))
+
+    reads = [client.get(f"/api/v1/users/{student_id}", headers={"X-User-Id": student_id}) for _ in range(3)]
+    assert [response.status_code for response in reads] == [200, 200, 429]
+    assert reads[2].headers["Retry-After"] == "2"
+    assert client.get(f"/api/v1/users/{student_id}", headers={"X-User-Id": admin_id}).status_code == 200
+    #lookups are reads too
+    assert client.post("/api/v1/courses/lookup", json={"ids": []}, headers={"X-User-Id": admin_id}).status_code == 200
+
+    create = {"code": "CSC101", "title": "Intro"}
+    assert client.post("/api/v1/courses/", json=create, headers={"X-User-Id": admin_id}).status_code == 201
+    assert client.post("/api/v1/courses/", json={**create, "code": "CSC102"}, headers={"X-User-Id": admin_id}).status_code == 429
+    #the admin budget is spent, not the caller's writes
+    assert client.post("/api/v1/users", json={"name": "Jane", "email": "jane@gmail.com", "role": "student"}, headers={"X-User-Id": admin_id}).status_code == 201
+
+def test_rate_limits_ignore_made_up_user_ids(monkeypatch):
+    from app.api import deps
+    from app.core.rate_limit import Limit, TokenBuckets
+    monkeypatch.setattr(deps, "rate_limits", TokenBuckets({
+        "reads": Limit(rate=0.5, burst=2), "writes": Limit(rate=0.5, burst=2), "admin": Limit(rate=0.5, burst=2),
+    }))
+    statuses = [
+        client.post("/api/v1/users", json={"name": "John", "email": f"john{i}@gmail.com", "role": "student"}, headers={"X-User-Id": header}).status_code
+        for i, header in enumerate(["junk0", "junk1", str(uuid4()), str(uuid4())])
+    ]
+    #every unknown id shares the client address's bucket
+    assert statuses == [201, 201, 429, 429]
+    assert len(deps.rate_limits) == 1
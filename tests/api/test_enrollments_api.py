@@ -1,9 +1,10 @@
+import json
 from fastapi.testclient import TestClient 
 from uuid import uuid4, UUID
 from datetime import datetime, timezone 
 from app.main import app 
 from app.schemas.course_schema import CourseResponse 
-from app.core.db import courses_db, users_db, enrollments_db
+from app.core.db import courses_db, users_db, enrollments_db, waitlists
 from app.api.deps import is_admin_user
 import pytest
 
@@ -15,6 +16,7 @@ def clear_users_db():
     users_db.clear()
     courses_db.clear()
     enrollments_db.clear()
+    waitlists.clear()
 
 def test_student_enroll_success():
     student_response = client.post(
@@ -315,3 +317,168 @@ def test_admin_deregister_student():
     assert enroll_response.status_code == 201
     assert student_attempt.status_code == 403
     assert admin_attempt.status_code == 200
+
+def create_roster(students=3):
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    course_id = client.post(
+        "/api/v1/courses/", json={"code": "CSC500", "title": "Software Engineering"}, headers={"X-User-Id": admin_id}
+    ).json()["id"]
+    student_ids = []
+    for index in range(students):
+        student_id = client.post(
+            "/api/v1/users", json={"name": f"Student {index}", "email": f"student{index}@gmail.com", "role": "student"}
+        ).json()["id"]
+        client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": student_id})
+        student_ids.append(student_id)
+    return admin_id, course_id, student_ids
+
+def walk(url, admin_id, limit):
+    seen, params = [], {"limit": limit}
+    while True:
+        response = client.get(url, params=params, headers={"X-User-Id": admin_id})
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= limit
+        seen.extend(item["student"]["id"] for item in page["items"])
+        if page["next_cursor"] is None:
+            return seen
+        params = {"limit": limit, "cursor": page["next_cursor"]}
+
+def test_admin_enrollment_listings_paginate():
+    admin_id, course_id, student_ids = create_roster(5)
+
+    assert walk("/api/v1/enrollments/admin/enrollments", admin_id, 2) == student_ids
+    assert walk(f"/api/v1/enrollments/admin/{course_id}/enrollments", admin_id, 2) == student_ids
+    response = client.get(
+        "/api/v1/enrollments/admin/enrollments", params={"cursor": "garbage"}, headers={"X-User-Id": admin_id}
+    )
+    assert response.status_code == 400
+
+def test_admin_enrollments_stream_as_ndjson():
+    admin_id, course_id, student_ids = create_roster(3)
+
+    for options in ({"params": {"stream": "true"}}, {"headers": {"Accept": "application/x-ndjson"}}):
+        headers = {"X-User-Id": admin_id, **options.get("headers", {})}
+        response = client.get("/api/v1/enrollments/admin/enrollments", params=options.get("params"), headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["student"]["id"] for line in lines] == student_ids
+        assert {line["course"]["id"] for line in lines} == {course_id}
+
+def test_admin_enrollments_compact_format():
+    admin_id, course_id, student_ids = create_roster(3)
+
+    for url in ("/api/v1/enrollments/admin/enrollments", f"/api/v1/enrollments/admin/{course_id}/enrollments"):
+        response = client.get(url, params={"format": "compact"}, headers={"X-User-Id": admin_id})
+        assert response.status_code == 200
+        data = response.json()
+        assert [row["user_id"] for row in data["enrollments"]] == student_ids
+        assert {row["course_id"] for row in data["enrollments"]} == {course_id}
+        assert sorted(data["users"]) == sorted(student_ids)
+        assert list(data["courses"]) == [course_id]
+        assert data["courses"][course_id]["code"] == "CSC500"
+
+    paged = client.get(
+        f"/api/v1/enrollments/admin/{course_id}/enrollments", params={"format": "compact", "limit": 2}, headers={"X-User-Id": admin_id}
+    ).json()
+    assert [row["user_id"] for row in paged["enrollments"]] == student_ids[:2]
+    assert sorted(paged["users"]) == sorted(student_ids[:2])
+    assert paged["next_cursor"] is not None
+
+def test_admin_batch_enrollment_endpoints():
+    admin_id, course_id, enrolled = create_roster(1)
+    students = [
+        client.post("/api/v1/users", json={"name": f"New {i}", "email": f"new{i}@gmail.com", "role": "student"}).json()["id"]
+        for i in range(3)
+    ]
+    other_course = client.post("/api/v1/courses/", json={"code": "CSC501", "title": "Compilers"}, headers={"X-User-Id": admin_id}).json()["id"]
+
+    response = client.post(
+        f"/api/v1/enrollments/admin/{course_id}/enrollments/batch", json={"user_ids": students}, headers={"X-User-Id": admin_id}
+    )
+    assert response.status_code == 200
+    assert (response.json()["enrolled"], response.json()["committed"]) == (3, True)
+
+    pairs = [{"user_id": students[0], "course_id": other_course}, {"user_id": enrolled[0], "course_id": course_id}]
+    response = client.post("/api/v1/enrollments/admin/enrollments/batch", json={"pairs": pairs}, headers={"X-User-Id": admin_id})
+    assert (response.json()["enrolled"], response.json()["committed"]) == (0, False)
+    response = client.post(
+        "/api/v1/enrollments/admin/enrollments/batch", params={"mode": "per_row"}, json={"pairs": pairs}, headers={"X-User-Id": admin_id}
+    )
+    assert [item["error"] for item in response.json()["results"]] == [None, "Student is already enrolled in this course"]
+    assert len(enrollments_db) == 5
+    assert client.post(
+        "/api/v1/enrollments/admin/enrollments/batch", json={"pairs": pairs}, headers={"X-User-Id": students[0]}
+    ).status_code == 403
+
+def test_student_dashboard_has_profile_and_courses():
+    admin_id, course_id, student_ids = create_roster(2)
+    other_course = client.post("/api/v1/courses/", json={"code": "CSC501", "title": "Compilers"}, headers={"X-User-Id": admin_id}).json()["id"]
+    client.post("/api/v1/enrollments/", json={"course_id": other_course}, headers={"X-User-Id": student_ids[0]})
+
+    response = client.get(f"/api/v1/enrollments/student/{student_ids[0]}/dashboard", headers={"X-User-Id": student_ids[0]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["student"]["email"] == "student0@gmail.com"
+    assert [item["course"]["id"] for item in data["courses"]] == [course_id, other_course]
+    assert data["courses"][1]["course"]["code"] == "CSC501"
+    assert all(item["enrollment_id"] and item["enrolled_on"] for item in data["courses"])
+
+    assert client.get(
+        f"/api/v1/enrollments/student/{student_ids[0]}/dashboard", headers={"X-User-Id": student_ids[1]}
+    ).status_code == 403
+    assert client.get(
+        f"/api/v1/enrollments/student/{student_ids[0]}/dashboard", headers={"X-User-Id": admin_id}
+    ).status_code == 403
+
+def test_waitlist_endpoints():
+    admin_id, course_id, student_ids = create_roster(1)
+    client.patch(f"/api/v1/courses/{course_id}", json={"capacity": 1}, headers={"X-User-Id": admin_id})
+    waiting = [
+        client.post("/api/v1/users", json={"name": f"Waiting {index}", "email": f"waiting{index}@gmail.com", "role": "student"}).json()["id"]
+        for index in range(2)
+    ]
+    url = f"/api/v1/enrollments/waitlist/{course_id}"
+
+    assert client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": waiting[0]}).status_code == 400
+    joined = [client.post(url, headers={"X-User-Id": student_id}) for student_id in waiting]
+    assert [response.status_code for response in joined] == [201, 201]
+    assert joined[1].json() == {"course_id": course_id, "user_id": waiting[1], "position": 2, "waiting": 2}
+    assert client.post(url, headers={"X-User-Id": waiting[0]}).status_code == 400
+    assert client.post(url, headers={"X-User-Id": admin_id}).status_code == 403
+
+    assert client.delete(url, headers={"X-User-Id": waiting[0]}).status_code == 200
+    assert client.delete(url, headers={"X-User-Id": waiting[0]}).status_code == 404
+    assert client.get(url, headers={"X-User-Id": waiting[0]}).status_code == 404
+    assert client.get(url, headers={"X-User-Id": waiting[1]}).json()["position"] == 1
+
+    response = client.delete(
+        "/api/v1/enrollments/admin/force-deregister",
+        params={"user_id": student_ids[0], "course_id": course_id}, headers={"X-User-Id": admin_id},
+    )
+    assert response.status_code == 200
+    assert client.get(url, headers={"X-User-Id": waiting[1]}).status_code == 404
+    courses = client.get(f"/api/v1/enrollments/student/{waiting[1]}/courses", headers={"X-User-Id": waiting[1]}).json()
+    assert [enrollment["course_id"] for enrollment in courses] == [course_id]
+
+def test_retried_enrollment_with_idempotency_key_is_replayed():
+    admin_id, course_id, student_ids = create_roster(0)
+    student_id = client.post("/api/v1/users", json={"name": "John", "email": "john@gmail.com", "role": "student"}).json()["id"]
+    headers = {"X-User-Id": student_id, "Idempotency-Key": "enroll-1"}
+
+    first = client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers=headers)
+    retry = client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(enrollments_db) == 1
+
+    #without a key the retry reaches the service and is a duplicate
+    assert client.post("/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": student_id}).status_code == 400
+    other = client.post("/api/v1/courses/", json={"code": "CSC501", "title": "Compilers"}, headers={"X-User-Id": admin_id}).json()["id"]
+    assert client.post("/api/v1/enrollments/", json={"course_id": other}, headers=headers).status_code == 422
+    #keys are per caller
+    assert client.post(
+        "/api/v1/enrollments/", json={"course_id": course_id}, headers={"X-User-Id": admin_id, "Idempotency-Key": "enroll-1"}
+    ).status_code == 403
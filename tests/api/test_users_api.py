@@ -1,7 +1,8 @@
 from fastapi.testclient import TestClient
 from app.main import app
 from app.schemas.user_schema import UserCreate, UserResponse, UserUpdate
-from app.core.db import users_db
+from app.core.db import idempotency_keys, users_db
+from app.api.bulk import MAX_IDS
 from datetime import datetime, timezone
 from uuid import uuid4
 import pytest
@@ -12,6 +13,7 @@ client = TestClient(app)
 @pytest.fixture(autouse=True)
 def clear_users_db():
     users_db.clear()
+    idempotency_keys.clear()
 
 def test_create_user_endpoint():
     response = client.post(
@@ -28,6 +30,27 @@ def test_create_user_endpoint():
     assert data["email"] == "john@gmail.com"
     assert data["role"] == "student"
 
+def test_retried_signup_with_idempotency_key_returns_the_same_user():
+    body = {"name": "John Doe", "email": "john@gmail.com", "role": "student"}
+    first = client.post("/api/v1/users", json=body, headers={"Idempotency-Key": "signup-1"})
+    retry = client.post("/api/v1/users/", json=body, headers={"Idempotency-Key": "signup-1"})
+    assert first.status_code == retry.status_code == 201
+    assert retry.json()["id"] == first.json()["id"]
+    assert len(users_db) == 1
+    assert client.post("/api/v1/users", json=body).status_code == 400
+    assert client.post("/api/v1/users", json=body, headers={"Idempotency-Key": "x" * 256}).status_code == 400
+
+def test_anonymous_idempotency_keys_are_scoped_to_the_client():
+    headers = {"Idempotency-Key": "signup-1"}
+    first = client.post("/api/v1/users", json={"name": "John Doe", "email": "john@gmail.com", "role": "student"}, headers=headers)
+    #another client picking the same key gets its own sign-up, not John's response
+    other = TestClient(app, client=("203.0.113.7", 50000))
+    second = other.post("/api/v1/users", json={"name": "Jane Doe", "email": "jane@gmail.com", "role": "student"}, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert "idempotent-replayed" not in second.headers
+    assert second.json()["id"] != first.json()["id"]
+    assert len(users_db) == 2
+
 def test_get_user_by_id():
     response = client.post(
         "/api/v1/users",
@@ -97,4 +120,75 @@ def test_delete_user_not_found():
     non_existent_id = uuid4()
     response = client.delete(f"/users/{non_existent_id}") 
     assert response.status_code == 404 
-    assert response.json()["detail"] == "Not Found"
\ No newline at end of file
+    assert response.json()["detail"] == "Not Found"
+
+def test_get_user_by_email():
+    created = client.post(
+        "/api/v1/users",
+        json={
+            "name": "John Doe",
+            "email": "john@gmail.com",
+            "role": "student"
+        }
+    ).json()
+    response = client.get("/api/v1/users/by-email/John@Gmail.com")
+    assert response.status_code == 200
+    assert response.json()["id"] == created["id"]
+
+    missing = client.get("/api/v1/users/by-email/nobody@gmail.com")
+    assert missing.status_code == 404
+    assert missing.json()["detail"] == "User not found"
+
+def test_get_users_paginated():
+    ids = [
+        client.post("/api/v1/users", json={"name": f"User {i}", "email": f"user{i}@gmail.com", "role": "student"}).json()["id"]
+        for i in range(3)
+    ]
+    first = client.get("/api/v1/users", params={"limit": 2}).json()
+    second = client.get("/api/v1/users", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+
+    assert [user["id"] for user in first["items"]] == ids[:2]
+    assert [user["id"] for user in second["items"]] == ids[2:]
+    assert second["next_cursor"] is None
+    assert client.get("/api/v1/users", params={"limit": 0}).status_code == 422
+
+def test_get_users_by_ids():
+    ids = [
+        client.post("/api/v1/users", json={"name": f"User {i}", "email": f"user{i}@gmail.com", "role": "student"}).json()["id"]
+        for i in range(3)
+    ]
+    unknown = str(uuid4())
+
+    #order of the request, repeats dropped, unknown ids reported
+    data = client.get("/api/v1/users", params={"ids": [f"{ids[2]},{ids[0]}", unknown, ids[2]]}).json()
+    assert [user["id"] for user in data["items"]] == [ids[2], ids[0]]
+    assert data["missing"] == [unknown]
+
+    posted = client.post("/api/v1/users/lookup", json={"ids": [ids[1], unknown]}).json()
+    assert [user["id"] for user in posted["items"]] == [ids[1]]
+    assert posted["missing"] == [unknown]
+    assert client.get("/api/v1/users", params={"ids": "not-a-uuid"}).status_code == 400
+    assert client.get("/api/v1/users", params={"ids": ",".join(str(uuid4()) for _ in range(MAX_IDS + 1))}).status_code == 400
+
+def test_bulk_import_users_csv_and_ndjson():
+    admin_id = client.post("/api/v1/users", json={"name": "Admin", "email": "admin@gmail.com", "role": "admin"}).json()["id"]
+    csv_body = "name,email,role\r\nAda Lovelace,ada@gmail.com,student\n\"Hopper, Grace\",grace@gmail.com,student\n"
+    response = client.post(
+        "/api/v1/users/import", content=csv_body, headers={"X-User-Id": admin_id, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"received": 2, "created": 2, "failed": 0, "committed": True, "errors": []}
+    assert users_db.get_by_email("grace@gmail.com").name == "hopper, grace"
+
+    ndjson_body = '{"name": "Alan", "email": "alan@gmail.com", "role": "student"}\n{not json}\n\n{"name": "Ada", "email": "ada@gmail.com", "role": "student"}'
+    response = client.post(
+        "/api/v1/users/import", params={"mode": "per_row"}, content=ndjson_body,
+        headers={"X-User-Id": admin_id, "Content-Type": "application/x-ndjson"},
+    )
+    summary = response.json()
+    assert (summary["created"], summary["failed"]) == (1, 2)
+    assert [error["row"] for error in summary["errors"]] == [2, 3]
+    assert len(users_db) == 4
+
+    student_id = str(users_db.owner_of("alan@gmail.com"))
+    assert client.post("/api/v1/users/import", content=ndjson_body, headers={"X-User-Id": student_id}).status_code == 403
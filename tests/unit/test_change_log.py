@@ -0,0 +1,40 @@
+from app.core.changes import ChangeLog
+from uuid import uuid4
+import pytest
+
+
+def test_since_returns_entries_after_seq():
+    log = ChangeLog(capacity=10)
+    ids = [uuid4() for _ in range(3)]
+    for entity_id in ids:
+        log.record("user", entity_id, "created")
+
+    assert log.latest() == 3
+    assert [entry.id for entry in log.since(0, 100)] == ids
+    assert [entry.seq for entry in log.since(1, 1)] == [2]
+    assert log.since(3, 100) == []
+
+def test_since_requires_resync_outside_the_window():
+    log = ChangeLog(capacity=3)
+    assert log.since(0, 10) == []
+    for _ in range(5):
+        log.record("course", uuid4(), "updated")
+
+    assert len(log) == 3
+    #entries 1 and 2 were dropped: a client at 0 or 1 missed them
+    assert log.since(0, 10) is None
+    assert log.since(1, 10) is None
+    assert [entry.seq for entry in log.since(2, 10)] == [3, 4, 5]
+    #ahead of the log: from before a restart
+    assert log.since(6, 10) is None
+
+def test_tokens_only_resolve_in_their_own_log():
+    log, other = ChangeLog(), ChangeLog()
+    log.record("user", uuid4(), "created")
+
+    assert log.position(None) == 0
+    assert log.position(log.token(1)) == 1
+    assert other.position(log.token(1)) is None
+    for bad in ("1", ":1", f"{log.epoch}:", f"{log.epoch}:-1"):
+        with pytest.raises(ValueError):
+            log.position(bad)
@@ -0,0 +1,93 @@
+from app.repositories.columnar import EnrollmentColumns, ShardedColumns
+from app.schemas.enrollment_schema import EnrollmentResponse
+from datetime import datetime, timezone
+from uuid import uuid4
+import pytest
+
+
+def make_enrollment(user_id=None, course_id=None, enrolled_on=None):
+    return EnrollmentResponse(
+        id=uuid4(),
+        user_id=user_id or uuid4(),
+        course_id=course_id or uuid4(),
+        enrolled_on=enrolled_on or datetime.now(timezone.utc),
+    )
+
+def test_round_trip():
+    table = EnrollmentColumns()
+    aware = make_enrollment()
+    naive = make_enrollment(enrolled_on=datetime(2024, 9, 1, 8, 30, 15, 123456))
+    table[aware.id] = aware
+    table[naive.id] = naive
+
+    assert table[aware.id] == aware
+    assert table.get(naive.id) == naive
+    assert table.get(uuid4()) is None
+    assert list(table) == [aware.id, naive.id]
+    assert len(table) == 2
+
+def test_find_and_listings():
+    table = EnrollmentColumns()
+    user_id, course_id = uuid4(), uuid4()
+    first = make_enrollment(user_id, course_id)
+    second = make_enrollment(user_id)
+    third = make_enrollment(course_id=course_id)
+    for enrollment in (first, second, third):
+        table[enrollment.id] = enrollment
+
+    assert table.find(user_id, course_id) == first.id
+    assert table.find(user_id, uuid4()) is None
+    assert table.for_user(user_id) == [first, second]
+    assert table.for_course(course_id) == [first, third]
+
+def test_replace_moves_row_between_listings():
+    table = EnrollmentColumns()
+    enrollment = make_enrollment()
+    table[enrollment.id] = enrollment
+    moved = enrollment.model_copy(update={"course_id": uuid4()})
+    table[enrollment.id] = moved
+
+    assert table.for_course(enrollment.course_id) == []
+    assert table.for_course(moved.course_id) == [moved]
+    assert len(table) == 1
+
+def test_deletes_compact_and_keep_order():
+    table = EnrollmentColumns()
+    user_id = uuid4()
+    enrollments = [make_enrollment(user_id) for _ in range(3000)]
+    for enrollment in enrollments:
+        table[enrollment.id] = enrollment
+    for enrollment in enrollments[:2500]:
+        del table[enrollment.id]
+
+    with pytest.raises(KeyError):
+        del table[enrollments[0].id]
+    assert len(table) == 500
+    assert list(table) == [e.id for e in enrollments[2500:]]
+    assert table.for_user(user_id) == enrollments[2500:]
+    assert all(table[e.id] == e for e in enrollments[2500:])
+    assert enrollments[0].id not in table
+
+def test_clear():
+    table = EnrollmentColumns()
+    enrollment = make_enrollment()
+    table[enrollment.id] = enrollment
+    table.clear()
+    assert len(table) == 0
+    assert table.find(enrollment.user_id, enrollment.course_id) is None
+
+def test_sharded_columns_keep_insertion_order():
+    table = ShardedColumns(partitions=4)
+    user_id, course_id = uuid4(), uuid4()
+    enrollments = [make_enrollment(user_id) for _ in range(20)] + [make_enrollment(course_id=course_id)]
+    for enrollment in enrollments:
+        table[enrollment.id] = enrollment
+    del table[enrollments[3].id]
+    expected = enrollments[:3] + enrollments[4:]
+
+    assert list(table) == [e.id for e in expected]
+    assert table.values() == expected
+    assert table.for_user(user_id) == expected[:-1]
+    assert table.for_course(course_id) == [enrollments[-1]]
+    assert table.find(user_id, enrollments[5].course_id) == enrollments[5].id
+    assert len(table.copy()) == len(table) == 20
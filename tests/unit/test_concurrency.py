@@ -0,0 +1,183 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from uuid import uuid4
+from app.core.db import courses_db, enrollments_db, users_db, waitlists
+from app.repositories.memory_repository import MemoryEnrollmentStore
+from app.repositories.sharding import ShardLocks
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse
+from app.schemas.user_schema import UserCreate, UserResponse
+from app.services.enrollment_services import EnrollmentService
+from app.services.user_services import UserService
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_dbs():
+    users_db.clear()
+    courses_db.clear()
+    enrollments_db.clear()
+    waitlists.clear()
+
+def attempt(action, *args):
+    try:
+        return action(*args)
+    except ValueError:
+        return None
+
+def test_shard_locks_reject_out_of_order_acquisition():
+    locks = ShardLocks(8)
+    keys = sorted(range(8), key=locks.shard_of)
+    with locks.hold(keys[0], keys[5]):
+        with locks.hold(keys[5], keys[7]):
+            pass
+        with pytest.raises(RuntimeError):
+            with locks.hold(keys[2]):
+                pass
+    with locks.hold(keys[2]):
+        pass
+
+def test_concurrent_enrollment_of_same_pair_succeeds_once():
+    user_id, course_id = uuid4(), uuid4()
+    now = datetime.now(timezone.utc)
+    users_db[user_id] = UserResponse(id=user_id, name="John", email="john@gmail.com", role="student", created_at=now)  # type: ignore
+    courses_db[course_id] = CourseResponse(id=course_id, code="CSC500", title="Software Engineering", created_at=now)  # type: ignore
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: attempt(EnrollmentService.enroll_student, user_id, course_id), range(64)))
+
+    assert sum(result is not None for result in results) == 1
+    assert len(enrollments_db.for_user(user_id)) == 1
+
+def test_concurrent_enrollments_never_overbook_a_course():
+    now = datetime.now(timezone.utc)
+    course_id = uuid4()
+    courses_db[course_id] = CourseResponse(id=course_id, code="CSC500", title="Software Engineering", capacity=10, created_at=now)  # type: ignore
+    user_ids = [uuid4() for _ in range(100)]
+    for index, user_id in enumerate(user_ids):
+        users_db[user_id] = UserResponse(id=user_id, name="John", email=f"john{index}@gmail.com", role="student", created_at=now)  # type: ignore
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda user_id: attempt(EnrollmentService.enroll_student, user_id, course_id), user_ids))
+
+    assert sum(result is not None for result in results) == 10
+    assert enrollments_db.seats_taken(course_id) == len(enrollments_db.for_course(course_id)) == 10
+
+def test_concurrent_deregistrations_promote_the_waitlist_in_order():
+    now = datetime.now(timezone.utc)
+    course_id = uuid4()
+    courses_db[course_id] = CourseResponse(id=course_id, code="CSC500", title="Software Engineering", capacity=8, created_at=now)  # type: ignore
+    user_ids = [uuid4() for _ in range(40)]
+    for index, user_id in enumerate(user_ids):
+        users_db[user_id] = UserResponse(id=user_id, name="John", email=f"john{index}@gmail.com", role="student", created_at=now)  # type: ignore
+    enrolled, queued = user_ids[:8], user_ids[8:]
+    for user_id in enrolled:
+        EnrollmentService.enroll_student(user_id, course_id)
+    for user_id in queued:
+        EnrollmentService.join_waitlist(user_id, course_id)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda user_id: EnrollmentService.student_deregister(user_id, course_id), enrolled))
+
+    assert {enrollment.user_id for enrollment in enrollments_db.for_course(course_id)} == set(queued[:8])
+    assert enrollments_db.seats_taken(course_id) == 8
+    assert waitlists.position(course_id, queued[8]) == 1
+
+def test_concurrent_signups_with_same_email_succeed_once():
+    def sign_up(index):
+        return attempt(UserService.create_user, UserCreate(name=f"user{index}", email="same@gmail.com", role="student"))
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(sign_up, range(64)))
+
+    assert sum(result is not None for result in results) == 1
+    assert len(users_db) == 1
+
+def test_store_stays_consistent_under_concurrent_writes():
+    store = MemoryEnrollmentStore(lock_shards=8, partitions=4)
+    user_ids = [uuid4() for _ in range(8)]
+    course_ids = [uuid4() for _ in range(50)]
+    now = datetime.now(timezone.utc)
+
+    def work(user_id):
+        ids = []
+        for course_id in course_ids:
+            enrollment = EnrollmentResponse(id=uuid4(), user_id=user_id, course_id=course_id, enrolled_on=now)
+            store[enrollment.id] = enrollment
+            ids.append(enrollment.id)
+        for enrollment_id in ids[::2]:
+            del store[enrollment_id]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, user_ids))
+
+    assert len(store) == len(user_ids) * len(course_ids) // 2
+    for user_id in user_ids:
+        assert [e.course_id for e in store.for_user(user_id)] == course_ids[1::2]
+
+def test_service_calls_run_inline_only_while_no_store_blocks(monkeypatch):
+    from app.core import offload
+    from app.core.config import settings
+
+    async def thread_of_call():
+        return await offload.run(threading.get_ident) == threading.get_ident()
+
+    monkeypatch.setattr(offload, "stores_block", lambda: False)
+    assert asyncio.run(thread_of_call())
+    monkeypatch.setattr(settings, "inline_services", False)
+    assert not asyncio.run(thread_of_call())
+    monkeypatch.setattr(settings, "inline_services", True)
+    monkeypatch.setattr(offload, "stores_block", lambda: True)
+    assert not asyncio.run(thread_of_call())
+
+    store = MemoryEnrollmentStore()
+    assert not store.blocking
+    store.journal = object()
+    assert store.blocking
+
+def test_inline_enroll_waits_off_the_loop_while_a_batch_runs():
+    from app.core.db import entity_locks
+    from app.core.offload import run, run_threaded
+    user_id, course_id = uuid4(), uuid4()
+    users_db[user_id] = UserResponse(id=user_id, name="john", email="john@gmail.com", role="student", created_at=datetime.now(timezone.utc)) # type: ignore
+    courses_db[course_id] = CourseResponse(id=course_id, code="CSC101", title="Intro", created_at=datetime.now(timezone.utc)) # type: ignore
+    holding, release = threading.Event(), threading.Event()
+
+    def batch():
+        #holds its pairs' entity locks for the whole batch, as enroll_batch does
+        with entity_locks.hold(user_id, course_id):
+            holding.set()
+            release.wait(5)
+
+    async def overlap():
+        running = asyncio.ensure_future(run_threaded(batch))
+        await asyncio.to_thread(holding.wait)
+        enroll = asyncio.ensure_future(run(EnrollmentService.enroll_student, user_id, course_id))
+        #inline, the enroll would block the loop on the batch's locks until it gave up
+        await asyncio.sleep(0.05)
+        assert not enroll.done()
+        release.set()
+        await running
+        return await enroll
+
+    assert asyncio.run(overlap()).user_id == user_id
+
+def test_concurrent_async_enrollments_of_same_pair_succeed_once():
+    import httpx
+    from app.main import app
+    user_id, course_id = uuid4(), uuid4()
+    users_db[user_id] = UserResponse(id=user_id, name="john", email="john@gmail.com", role="student", created_at=datetime.now(timezone.utc)) # type: ignore
+    courses_db[course_id] = CourseResponse(id=course_id, code="CSC101", title="Intro", created_at=datetime.now(timezone.utc)) # type: ignore
+
+    async def enroll_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/api/v1/enrollments/", json={"course_id": str(course_id)}, headers={"X-User-Id": str(user_id)})
+                for _ in range(50)
+            ])
+
+    statuses = [response.status_code for response in asyncio.run(enroll_all())]
+    assert sorted(statuses) == [201] + [400] * 49
+    assert len(enrollments_db.for_user(user_id)) == 1
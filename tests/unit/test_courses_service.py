@@ -153,4 +153,74 @@ def test_delete_course_not_found():
         error_message = str(exc)
     assert raised_error 
     assert error_message == "Course not found."
- 
\ No newline at end of file
+ 
+def test_create_course_duplicate_code():
+    CourseService.create_course(CourseCreate(title="Mathematics", code="MTH101"))
+    with pytest.raises(ValueError) as exc:
+        CourseService.create_course(CourseCreate(title="Maths Again", code="mth101"))
+    assert str(exc.value) == "Course code already exists"
+
+def test_partial_update_course_code_taken():
+    CourseService.create_course(CourseCreate(title="Mathematics", code="MTH101"))
+    other = CourseService.create_course(CourseCreate(title="Physics", code="PHY101"))
+    with pytest.raises(ValueError):
+        CourseService.partial_update_course(other.id, CourseUpdate(code="MTH101"))
+    assert courses_db[other.id].code == "PHY101"
+
+def test_code_index_follows_replace_and_delete():
+    course = CourseService.create_course(CourseCreate(title="Mathematics", code="MTH101"))
+    CourseService.replace_course(course.id, CourseCreate(title="Mathematics", code="MTH201"))
+    assert CourseService.get_course_by_code("mth201").id == course.id
+    with pytest.raises(ValueError):
+        CourseService.get_course_by_code("MTH101")
+
+    CourseService.delete_course(course.id)
+    with pytest.raises(ValueError):
+        CourseService.get_course_by_code("MTH201")
+    recreated = CourseService.create_course(CourseCreate(title="Mathematics", code="MTH201"))
+    assert recreated.id != course.id
+
+def test_upsert_courses_counts_and_removes_missing():
+    keep = CourseService.create_course(CourseCreate(code="CSC101", title="Intro"))
+    rename = CourseService.create_course(CourseCreate(code="CSC102", title="Data"))
+    drop = CourseService.create_course(CourseCreate(code="CSC103", title="Old"))
+    feed = [
+        {"code": "csc101", "title": " Intro "},
+        {"code": "CSC102", "title": "Data Structures"},
+        {"code": "CSC104", "title": "New"},
+    ]
+    summary = CourseService.upsert_courses(feed)
+    assert (summary.created, summary.updated, summary.unchanged, summary.removed) == (1, 1, 1, 0)
+    assert courses_db[keep.id] == keep
+    assert courses_db[rename.id].title == "data structures"
+    assert courses_db.get_by_code("CSC104").title == "new"
+
+    summary = CourseService.upsert_courses(feed, remove_missing=True)
+    assert (summary.created, summary.updated, summary.unchanged, summary.removed) == (0, 0, 3, 1)
+    assert drop.id not in courses_db
+
+def test_upsert_courses_applies_nothing_on_a_bad_row():
+    summary = CourseService.upsert_courses([
+        {"code": "CSC101", "title": "Intro"},
+        {"code": "csc101", "title": "Again"},
+        {"code": "BAD", "title": "Nope"},
+        {"code": "CSC102", "title": ""},
+    ])
+    assert summary.committed is False
+    assert [error.row for error in summary.errors] == [2, 3, 4]
+    assert len(courses_db) == 0
+
+def test_upsert_courses_reports_the_row_whose_code_was_taken(monkeypatch):
+    lookup = courses_db.owners_of
+    #another request creates CSC102 between the upsert's lookup and its write
+    def before_the_create(codes):
+        owners = lookup(codes)
+        monkeypatch.setattr(courses_db, "owners_of", lookup)
+        CourseService.create_course(CourseCreate(code="CSC102", title="Sneaked in"))
+        return owners
+
+    monkeypatch.setattr(courses_db, "owners_of", before_the_create)
+    summary = CourseService.upsert_courses([{"code": "CSC101", "title": "Intro"}, {"code": "CSC102", "title": "Data"}])
+    assert summary.committed is False
+    assert [(error.row, error.detail) for error in summary.errors] == [(2, "Course code already exists")]
+    assert [course.code for course in courses_db.values()] == ["CSC102"]
@@ -5,7 +5,9 @@ from app.main import app
 from app.schemas.course_schema import CourseResponse
 from app.schemas.user_schema import UserResponse
 from app.services.enrollment_services import EnrollmentService
-from app.core.db import courses_db, users_db, enrollments_db
+from app.services.course_services import CourseService
+from app.services.user_services import UserService
+from app.core.db import courses_db, users_db, enrollments_db, waitlists
 from app.api.deps import is_admin_user
 import pytest
 
@@ -17,6 +19,7 @@ def clear_users_db():
     users_db.clear()
     courses_db.clear()
     enrollments_db.clear()
+    waitlists.clear()
 
 def test_enroll_student():
     user_id = uuid4() 
@@ -124,3 +127,268 @@ def test_admin_force_deregister_success():
     assert enrollment.id in enrollments_db
     result = EnrollmentService.admin_force_deregister(user_id, course_id)
     assert result["message"] == "Student successfully deregistered by admin."
+
+def test_enroll_student_twice_rejected():
+    user_id = uuid4() 
+    course_id = uuid4() 
+    
+    new_student = UserResponse(id=user_id, name="John", email="john@gmail.com", role="student", created_at=datetime.now(timezone.utc)) # type: ignore
+    new_course = CourseResponse(id=course_id, code="CSC500", title="Software Engineering", created_at=datetime.now(timezone.utc)) # type: ignore
+
+    users_db[user_id] = new_student
+    courses_db[course_id] = new_course
+
+    EnrollmentService.enroll_student(user_id, course_id)
+    with pytest.raises(ValueError) as exc:
+        EnrollmentService.enroll_student(user_id, course_id)
+    assert str(exc.value) == "Student is already enrolled in this course"
+    assert len(enrollments_db) == 1
+
+def test_enrollment_indexes_follow_deletes():
+    user_id = uuid4() 
+    course_ids = [uuid4(), uuid4()]
+    
+    new_student = UserResponse(id=user_id, name="John", email="john@gmail.com", role="student", created_at=datetime.now(timezone.utc)) # type: ignore
+    users_db[user_id] = new_student
+    for index, course_id in enumerate(course_ids):
+        courses_db[course_id] = CourseResponse(id=course_id, code=f"CSC50{index}", title="Software Engineering", created_at=datetime.now(timezone.utc)) # type: ignore
+        EnrollmentService.enroll_student(user_id, course_id)
+
+    assert len(enrollments_db.for_user(user_id)) == 2
+    EnrollmentService.student_deregister(user_id, course_ids[0])
+    assert [e.course_id for e in enrollments_db.for_user(user_id)] == [course_ids[1]]
+    assert enrollments_db.for_course(course_ids[0]) == []
+    assert enrollments_db.find(user_id, course_ids[0]) is None
+
+def test_admin_force_deregister_missing_enrollment():
+    user_id = uuid4() 
+    course_id = uuid4() 
+    
+    new_student = UserResponse(id=user_id, name="John", email="john@gmail.com", role="student", created_at=datetime.now(timezone.utc)) # type: ignore
+    new_course = CourseResponse(id=course_id, code="CSC500", title="Software Engineering", created_at=datetime.now(timezone.utc)) # type: ignore
+
+    users_db[user_id] = new_student
+    courses_db[course_id] = new_course
+    with pytest.raises(ValueError) as exc:
+        EnrollmentService.admin_force_deregister(user_id, course_id)
+    assert str(exc.value) == "Enrollment not found"
+
+def seed_enrollments():
+    now = datetime.now(timezone.utc)
+    users = [UserResponse(id=uuid4(), name=f"user{i}", email=f"user{i}@gmail.com", role="student", created_at=now) for i in range(2)] # type: ignore
+    courses = [CourseResponse(id=uuid4(), code=f"CSC50{i}", title="Software Engineering", created_at=now) for i in range(2)] # type: ignore
+    for user in users:
+        users_db[user.id] = user
+    for course in courses:
+        courses_db[course.id] = course
+    for user in users:
+        for course in courses:
+            EnrollmentService.enroll_student(user.id, course.id)
+    return users, courses
+
+def test_delete_user_cascades_to_enrollments():
+    users, courses = seed_enrollments()
+    UserService.delete_user(users[0].id)
+
+    assert enrollments_db.for_user(users[0].id) == []
+    assert [e.user_id for e in enrollments_db.for_course(courses[0].id)] == [users[1].id]
+    assert len(enrollments_db) == 2
+
+def test_delete_course_cascades_to_enrollments():
+    users, courses = seed_enrollments()
+    CourseService.delete_course(courses[1].id)
+
+    assert enrollments_db.for_course(courses[1].id) == []
+    assert [e.course_id for e in enrollments_db.for_user(users[0].id)] == [courses[0].id]
+    assert len(EnrollmentService.admin_retrieve_enrollments()) == 2
+
+def test_purge_orphaned_enrollments():
+    users, courses = seed_enrollments()
+    #delete behind the services' back, as older versions did
+    del users_db[users[0].id]
+    del courses_db[courses[1].id]
+
+    assert EnrollmentService.purge_orphaned_enrollments() == 3
+    assert [(e.user_id, e.course_id) for e in enrollments_db.values()] == [(users[1].id, courses[0].id)]
+    assert EnrollmentService.purge_orphaned_enrollments() == 0
+
+def test_student_dashboard_skips_courses_deleted_behind_its_back():
+    users, courses = seed_enrollments()
+    dashboard = EnrollmentService.student_dashboard(users[0].id)
+    assert dashboard.student == users[0]
+    assert [item.course for item in dashboard.courses] == courses
+
+    del courses_db[courses[0].id]
+    assert [item.course for item in EnrollmentService.student_dashboard(users[0].id).courses] == courses[1:]
+    with pytest.raises(ValueError):
+        EnrollmentService.student_dashboard(uuid4())
+
+def test_admin_listings_skip_rows_deleted_while_they_run():
+    users, courses = seed_enrollments()
+    #the user goes between reading the enrollments and looking them up
+    del users_db[users[0].id]
+
+    assert {row.student.id for row in EnrollmentService.admin_retrieve_enrollments()} == {users[1].id}
+    assert {row.student.id for row in EnrollmentService.admin_enrollments_page(10).items} == {users[1].id}
+    assert [row.student.id for row in EnrollmentService.admin_retrieve_course_enrollments(courses[0].id)] == [users[1].id]
+    assert [row.student.id for row in EnrollmentService.admin_course_enrollments_page(courses[0].id, 10).items] == [users[1].id]
+
+def test_enroll_batch_atomic_and_per_row():
+    from app.schemas.enrollment_schema import EnrollmentCreate
+    now = datetime.now(timezone.utc)
+    students = [UserResponse(id=uuid4(), name=f"s{i}", email=f"s{i}@gmail.com", role="student", created_at=now) for i in range(3)]
+    admin = UserResponse(id=uuid4(), name="a", email="a@gmail.com", role="admin", created_at=now)
+    course = CourseResponse(id=uuid4(), code="CSC500", title="Software Engineering", created_at=now)
+    for user in students + [admin]:
+        users_db[user.id] = user
+    courses_db[course.id] = course
+    EnrollmentService.enroll_student(students[0].id, course.id)
+    pairs = [EnrollmentCreate(user_id=user.id, course_id=course.id) for user in students + [admin]]
+    pairs += [EnrollmentCreate(user_id=students[1].id, course_id=course.id), EnrollmentCreate(user_id=students[1].id, course_id=uuid4())]
+
+    result = EnrollmentService.enroll_batch(pairs)
+    assert (result.enrolled, result.failed, result.committed) == (0, 6, False)
+    assert [item.error for item in result.results] == [
+        "Student is already enrolled in this course", None, None, "Only students can enroll in courses",
+        "Pair appears more than once in the batch", "Course does not exist",
+    ]
+    assert len(enrollments_db) == 1
+
+    result = EnrollmentService.enroll_batch(pairs, atomic=False)
+    assert (result.enrolled, result.failed, result.committed) == (2, 4, True)
+    assert [item.enrollment_id is not None for item in result.results] == [False, True, True, False, False, False]
+    assert enrollments_db.find(students[2].id, course.id).id == result.results[2].enrollment_id
+    assert len(enrollments_db) == 3
+
+def test_course_capacity_limits_enrollments():
+    from app.schemas.course_schema import CourseUpdate
+    from app.schemas.enrollment_schema import EnrollmentCreate
+    users, courses = seed_enrollments()
+    CourseService.partial_update_course(courses[0].id, CourseUpdate(capacity=3))
+    now = datetime.now(timezone.utc)
+    newcomers = [UserResponse(id=uuid4(), name=f"new{i}", email=f"new{i}@gmail.com", role="student", created_at=now) for i in range(3)] # type: ignore
+    for user in newcomers:
+        users_db[user.id] = user
+
+    EnrollmentService.enroll_student(newcomers[0].id, courses[0].id)
+    with pytest.raises(ValueError, match="Course is full"):
+        EnrollmentService.enroll_student(newcomers[1].id, courses[0].id)
+    assert CourseService.get_seats(courses[0].id).model_dump() == {"capacity": 3, "taken": 3, "available": 0}
+    with pytest.raises(ValueError, match="below the 3 students"):
+        CourseService.partial_update_course(courses[0].id, CourseUpdate(capacity=2))
+
+    #a freed seat goes to the first pair of a batch; the rest are turned away
+    EnrollmentService.admin_force_deregister(users[0].id, courses[0].id)
+    pairs = [EnrollmentCreate(user_id=user.id, course_id=courses[0].id) for user in newcomers[1:]]
+    result = EnrollmentService.enroll_batch(pairs, atomic=False)
+    assert [item.error for item in result.results] == [None, "Course is full"]
+    assert EnrollmentService.enroll_batch(pairs, atomic=True).committed is False
+    assert enrollments_db.seats_taken(courses[0].id) == 3
+
+def test_waitlist_promotes_in_joining_order():
+    from app.schemas.course_schema import CourseUpdate
+    now = datetime.now(timezone.utc)
+    students = [UserResponse(id=uuid4(), name=f"s{i}", email=f"s{i}@gmail.com", role="student", created_at=now) for i in range(5)] # type: ignore
+    for user in students:
+        users_db[user.id] = user
+    course = CourseResponse(id=uuid4(), code="CSC500", title="Software Engineering", capacity=1, created_at=now) # type: ignore
+    courses_db[course.id] = course
+
+    with pytest.raises(ValueError, match="free seats"):
+        EnrollmentService.join_waitlist(students[1].id, course.id)
+    EnrollmentService.enroll_student(students[0].id, course.id)
+    with pytest.raises(ValueError, match="already enrolled"):
+        EnrollmentService.join_waitlist(students[0].id, course.id)
+    assert [EnrollmentService.join_waitlist(user.id, course.id).position for user in students[1:4]] == [1, 2, 3]
+    EnrollmentService.leave_waitlist(students[1].id, course.id)
+    assert EnrollmentService.waitlist_position(students[3].id, course.id).model_dump()["position"] == 2
+    with pytest.raises(ValueError, match="Not on the waitlist"):
+        EnrollmentService.waitlist_position(students[1].id, course.id)
+
+    #the freed seat goes to the head of the queue, not to whoever asks first
+    EnrollmentService.student_deregister(students[0].id, course.id)
+    assert enrollments_db.find(students[2].id, course.id) is not None
+    assert EnrollmentService.waitlist_position(students[3].id, course.id).position == 1
+    with pytest.raises(ValueError, match="Course is full"):
+        EnrollmentService.enroll_student(students[4].id, course.id)
+
+    EnrollmentService.admin_force_deregister(students[2].id, course.id)
+    assert enrollments_db.find(students[3].id, course.id) is not None
+    assert waitlists.waiting(course.id) == 0
+
+    #raising the capacity lets the queue in too
+    EnrollmentService.join_waitlist(students[4].id, course.id)
+    CourseService.partial_update_course(course.id, CourseUpdate(capacity=2))
+    assert enrollments_db.find(students[4].id, course.id) is not None
+    assert enrollments_db.seats_taken(course.id) == 2
+
+def test_students_keep_their_place_when_a_promotion_fails(monkeypatch):
+    now = datetime.now(timezone.utc)
+    students = [UserResponse(id=uuid4(), name=f"s{i}", email=f"s{i}@gmail.com", role="student", created_at=now) for i in range(3)] # type: ignore
+    for user in students:
+        users_db[user.id] = user
+    course = CourseResponse(id=uuid4(), code="CSC500", title="Software Engineering", capacity=1, created_at=now) # type: ignore
+    courses_db[course.id] = course
+    EnrollmentService.enroll_student(students[0].id, course.id)
+    EnrollmentService.join_waitlist(students[1].id, course.id)
+    insert = EnrollmentService._insert
+
+    def another_worker_takes_the_seat(user_id, course_id):
+        monkeypatch.setattr(EnrollmentService, "_insert", insert)
+        insert(students[2].id, course_id)
+        raise ValueError("Course is full")
+
+    monkeypatch.setattr(EnrollmentService, "_insert", staticmethod(another_worker_takes_the_seat))
+    #the deregistration went through whatever happened to the promotion
+    assert EnrollmentService.student_deregister(students[0].id, course.id)["message"]
+    assert enrollments_db.find(students[0].id, course.id) is None
+    assert EnrollmentService.waitlist_position(students[1].id, course.id).position == 1
+
+    #an unexpected error in the promotion doesn't fail the write either
+    def broken(user_id, course_id):
+        raise RuntimeError("disk I/O error")
+    monkeypatch.setattr(EnrollmentService, "_insert", staticmethod(broken))
+    assert EnrollmentService.student_deregister(students[2].id, course.id)["message"]
+    assert enrollments_db.seats_taken(course.id) == 0
+    assert waitlists.head(course.id) == students[1].id
+
+def test_cascaded_deletes_promote_the_waitlist():
+    now = datetime.now(timezone.utc)
+    students = [UserResponse(id=uuid4(), name=f"s{i}", email=f"s{i}@gmail.com", role="student", created_at=now) for i in range(4)] # type: ignore
+    for user in students:
+        users_db[user.id] = user
+    course = CourseResponse(id=uuid4(), code="CSC500", title="Software Engineering", capacity=1, created_at=now) # type: ignore
+    courses_db[course.id] = course
+    EnrollmentService.enroll_student(students[0].id, course.id)
+    for user in students[1:3]:
+        EnrollmentService.join_waitlist(user.id, course.id)
+
+    UserService.delete_user(students[0].id)
+    assert enrollments_db.find(students[1].id, course.id) is not None
+    assert waitlists.waiting(course.id) == 1
+
+    #an enrollment orphaned before deletes cascaded frees its seat when purged
+    del users_db[students[1].id]
+    assert EnrollmentService.purge_orphaned_enrollments() == 1
+    assert enrollments_db.find(students[2].id, course.id) is not None
+    assert waitlists.waiting(course.id) == 0
+    with pytest.raises(ValueError, match="Course is full"):
+        EnrollmentService.enroll_student(students[3].id, course.id)
+
+def test_batches_do_not_take_seats_ahead_of_the_waitlist():
+    from app.schemas.enrollment_schema import EnrollmentCreate
+    now = datetime.now(timezone.utc)
+    students = [UserResponse(id=uuid4(), name=f"s{i}", email=f"s{i}@gmail.com", role="student", created_at=now) for i in range(3)] # type: ignore
+    for user in students:
+        users_db[user.id] = user
+    course = CourseResponse(id=uuid4(), code="CSC500", title="Software Engineering", capacity=1, created_at=now) # type: ignore
+    courses_db[course.id] = course
+    EnrollmentService.enroll_student(students[0].id, course.id)
+    EnrollmentService.join_waitlist(students[1].id, course.id)
+    #a seat is free but not yet promoted into
+    courses_db[course.id] = course.model_copy(update={"capacity": 2})
+
+    result = EnrollmentService.enroll_batch([EnrollmentCreate(user_id=students[2].id, course_id=course.id)], atomic=False)
+    assert [item.error for item in result.results] == ["Course is full"]
+    assert waitlists.waiting(course.id) == 1
+    assert enrollments_db.seats_taken(course.id) == 1
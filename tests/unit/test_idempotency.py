@@ -0,0 +1,35 @@
+from app.core.idempotency import IN_FLIGHT, MISMATCH, NEW, REPLAY, IdempotencyTable, StoredResponse
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_keys_replay_until_they_expire():
+    clock = Clock()
+    table = IdempotencyTable(capacity=10, ttl=60, clock=clock)
+    response = StoredResponse(201, [], b"{}")
+    assert table.begin("a", b"body") == (NEW, None)
+    assert table.begin("a", b"body") == (IN_FLIGHT, None)
+    table.finish("a", response)
+    assert table.begin("a", b"body") == (REPLAY, response)
+    assert table.begin("a", b"other body") == (MISMATCH, None)
+
+    clock.now = 60
+    assert table.begin("a", b"other body") == (NEW, None)
+    #a failed request gives its key back
+    table.release("a")
+    assert len(table) == 0
+
+def test_table_keeps_only_the_newest_keys():
+    table = IdempotencyTable(capacity=3, ttl=60, clock=Clock())
+    for key in "abcd":
+        table.begin(key, b"")
+        table.finish(key, StoredResponse(200, [], b""))
+    assert len(table) == 3
+    assert table.begin("a", b"")[0] == NEW
+    assert table.begin("d", b"")[0] == REPLAY
@@ -0,0 +1,200 @@
+from app.repositories.journal import Journal
+from app.repositories.memory_repository import MemoryCourseStore, MemoryEnrollmentStore, MemoryUserStore
+from app.schemas.user_schema import UserResponse
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse
+from datetime import datetime, timezone
+from uuid import uuid4
+import pytest
+
+
+def open_stores(directory, **options):
+    stores = (MemoryUserStore(), MemoryCourseStore(), MemoryEnrollmentStore())
+    journal = Journal(directory, {store.name: store for store in stores}, **options)
+    stats = journal.recover()
+    for store in stores:
+        store.journal = journal
+    return journal, stats, stores
+
+def make_user(email="john@gmail.com"):
+    return UserResponse(id=uuid4(), name="john", email=email, role="student", created_at=datetime.now(timezone.utc)) # type: ignore
+
+def test_recover_replays_log(tmp_path):
+    journal, stats, (users, courses, enrollments) = open_stores(tmp_path)
+    assert stats.replayed == 0
+    user = make_user()
+    gone = make_user("gone@gmail.com")
+    course = CourseResponse(id=uuid4(), code="CSC101", title="intro", capacity=30, created_at=datetime.utcnow())
+    users[user.id] = user
+    users[gone.id] = gone
+    courses[course.id] = course
+    enrollment = EnrollmentResponse(id=uuid4(), user_id=user.id, course_id=course.id, enrolled_on=datetime.now(timezone.utc))
+    enrollments[enrollment.id] = enrollment
+    del users[gone.id]
+    journal.close()
+
+    journal, stats, (users, courses, enrollments) = open_stores(tmp_path)
+    assert stats.replayed == 5
+    assert list(users.values()) == [user]
+    assert courses.get_by_code("csc101") == course
+    assert enrollments.find(user.id, course.id) == enrollment
+    journal.close()
+
+def test_snapshot_compacts_log(tmp_path):
+    journal, _, (users, _, _) = open_stores(tmp_path)
+    first = make_user()
+    users[first.id] = first
+    journal.snapshot()
+    second = make_user("second@gmail.com")
+    users[second.id] = second
+    journal.close()
+
+    assert len(list(tmp_path.glob("snapshot-*.ndjson"))) == 1
+    assert len(list(tmp_path.glob("wal-*.log"))) == 1
+
+    journal, stats, (users, _, _) = open_stores(tmp_path)
+    assert stats.snapshot_rows == 1
+    assert stats.replayed == 1
+    assert [u.id for u in users.values()] == [first.id, second.id]
+    journal.close()
+
+def test_periodic_snapshot(tmp_path):
+    journal, _, (users, _, _) = open_stores(tmp_path, snapshot_every=3)
+    for index in range(4):
+        user = make_user(f"user{index}@gmail.com")
+        users[user.id] = user
+    journal.close()
+
+    journal, stats, (users, _, _) = open_stores(tmp_path)
+    assert stats.snapshot_seq == 3
+    assert len(users) == 4
+    journal.close()
+
+def test_torn_tail_is_dropped(tmp_path):
+    journal, _, (users, _, _) = open_stores(tmp_path)
+    user = make_user()
+    users[user.id] = user
+    journal.close()
+    segment = sorted(tmp_path.glob("wal-*.log"))[-1]
+    with open(segment, "ab") as log:
+        log.write(b'[2,"users","put",["abc')
+
+    journal, stats, (users, _, _) = open_stores(tmp_path)
+    assert stats.replayed == 1
+    later = make_user("later@gmail.com")
+    users[later.id] = later
+    journal.close()
+
+    journal, stats, (users, _, _) = open_stores(tmp_path)
+    assert len(users) == 2
+    journal.close()
+
+def test_binary_snapshot_is_decoded_lazily(tmp_path):
+    journal, _, (users, courses, enrollments) = open_stores(tmp_path, snapshot_format="binary")
+    user = make_user()
+    other = make_user("other@gmail.com")
+    users[user.id] = user
+    users[other.id] = other
+    course = CourseResponse(id=uuid4(), code="CSC101", title="intro", capacity=30, created_at=datetime.utcnow())
+    courses[course.id] = course
+    enrollment = EnrollmentResponse(id=uuid4(), user_id=user.id, course_id=course.id, enrolled_on=datetime.now(timezone.utc))
+    enrollments[enrollment.id] = enrollment
+    journal.snapshot()
+    journal.close()
+    assert len(list(tmp_path.glob("snapshot-*.bin"))) == 1
+
+    journal, stats, (users, courses, enrollments) = open_stores(tmp_path, snapshot_format="binary")
+    assert stats.snapshot_rows == 4
+    assert len(users) == 2 and users._rows == {}
+
+    assert users[user.id] == user
+    assert users.get_by_email("OTHER@gmail.com") == other
+    assert courses.get_by_code("csc101") == course
+    assert enrollments.find(user.id, course.id) == enrollment
+    assert enrollments.for_course(course.id) == [enrollment]
+    assert enrollments.seats_taken(course.id) == 1
+    assert [u.id for u in users.values()] == [user.id, other.id]
+    journal.close()
+
+def test_writes_over_binary_snapshot(tmp_path):
+    journal, _, (users, _, _) = open_stores(tmp_path, snapshot_format="binary")
+    user = make_user()
+    gone = make_user("gone@gmail.com")
+    users[user.id] = user
+    users[gone.id] = gone
+    journal.snapshot()
+    journal.close()
+
+    journal, _, (users, _, _) = open_stores(tmp_path, snapshot_format="binary")
+    with pytest.raises(ValueError):
+        duplicate = make_user("JOHN@gmail.com")
+        users[duplicate.id] = duplicate
+    del users[gone.id]
+    assert gone.id not in users
+    assert users.owner_of("gone@gmail.com") is None
+    renamed = user.model_copy(update={"email": "renamed@gmail.com"})
+    users[user.id] = renamed
+    assert users.owner_of("john@gmail.com") is None
+    assert len(users) == 1
+    journal.snapshot()
+    journal.close()
+
+    journal, stats, (users, _, _) = open_stores(tmp_path, snapshot_format="binary")
+    assert stats.replayed == 0
+    assert list(users.values()) == [renamed]
+    journal.close()
+
+def test_paging_over_binary_snapshot(tmp_path):
+    journal, _, (users, _, _) = open_stores(tmp_path, snapshot_format="binary")
+    snapshot_users = [make_user(f"user{i}@gmail.com") for i in range(4)]
+    for user in snapshot_users:
+        users[user.id] = user
+    journal.snapshot()
+    journal.close()
+
+    journal, _, (users, _, _) = open_stores(tmp_path, snapshot_format="binary")
+    del users[snapshot_users[1].id]
+    renamed = snapshot_users[2].model_copy(update={"name": "renamed"})
+    users[renamed.id] = renamed
+    newer = make_user("newer@gmail.com")
+    users[newer.id] = newer
+    expected = [snapshot_users[0], renamed, snapshot_users[3], newer]
+
+    walked, position = [], None
+    while True:
+        page, position = users.page(position, 2)
+        walked.extend(page)
+        if position is None:
+            break
+    assert walked == expected == list(users.values())
+    journal.close()
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_waitlists_survive_a_restart(tmp_path, snapshot_format):
+    from app.core.waitlists import Waitlists
+
+    def reopen():
+        waitlists = Waitlists()
+        journal = Journal(tmp_path, {waitlists.name: waitlists}, snapshot_format=snapshot_format)
+        journal.recover()
+        waitlists.journal = journal
+        return journal, waitlists
+
+    journal, waitlists = reopen()
+    course_id, other_id = uuid4(), uuid4()
+    users = [uuid4() for _ in range(4)]
+    for user_id in users[:3]:
+        waitlists.join(course_id, user_id)
+    waitlists.join(other_id, users[0])
+    waitlists.leave(course_id, users[1])
+    journal.snapshot()
+    waitlists.join(course_id, users[3])
+    waitlists.leave(course_id, users[0])
+    waitlists.drop_course(other_id)
+    journal.close()
+
+    journal, waitlists = reopen()
+    assert [waitlists.position(course_id, user_id) for user_id in users] == [None, None, 1, 2]
+    assert waitlists.head(course_id) == users[2]
+    assert waitlists.waiting(other_id) == 0
+    journal.close()
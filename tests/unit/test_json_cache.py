@@ -0,0 +1,44 @@
+from app.core.json_cache import JsonFragments
+from app.schemas.course_schema import CourseResponse
+from datetime import datetime
+from uuid import uuid4
+
+
+def make_course(code="CSC101", title="intro"):
+    return CourseResponse(id=uuid4(), code=code, title=title, created_at=datetime(2024, 9, 1))
+
+def test_fragments_are_reused_until_invalidated():
+    cache = JsonFragments()
+    course = make_course()
+    first = cache.dump(course, cache.clock())
+    assert first == course.model_dump_json().encode()
+    #a cached fragment is returned as is, even for a newer object
+    renamed = course.model_copy(update={"title": "renamed"})
+    assert cache.dump(renamed, cache.clock()) is first
+
+    cache.invalidate(course.id)
+    assert b"renamed" in cache.dump(renamed, cache.clock())
+
+def test_reader_older_than_a_write_does_not_fill():
+    cache = JsonFragments()
+    course = make_course()
+    since = cache.clock()
+    cache.invalidate(course.id)
+    #serialized from a model read before the write: returned but not kept
+    assert cache.dump(course, since) == course.model_dump_json().encode()
+    assert len(cache) == 0
+
+def test_list_and_page_assembly():
+    cache = JsonFragments()
+    courses = [make_course("CSC101"), make_course("CSC102")]
+    assert cache.dump_list([], 0) == b"[]"
+    assert cache.dump_list(courses, 0) == b"[" + b",".join(c.model_dump_json().encode() for c in courses) + b"]"
+    assert cache.dump_page(courses[:1], None, 0) == b'{"items":[' + courses[0].model_dump_json().encode() + b'],"next_cursor":null}'
+
+def test_json_cache_is_refused_with_sqlite():
+    import pytest
+    from pydantic import ValidationError
+    from app.core.config import Settings
+    with pytest.raises(ValidationError, match="json_cache needs the memory backend"):
+        Settings(storage_backend="sqlite", json_cache=True)
+    assert Settings(storage_backend="memory", json_cache=True).json_cache
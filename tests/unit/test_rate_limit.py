@@ -0,0 +1,55 @@
+from app.core.rate_limit import Limit, TokenBuckets
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_buckets_allow_a_burst_then_refill_at_the_rate():
+    clock = Clock()
+    buckets = TokenBuckets({"reads": Limit(rate=2, burst=3), "writes": Limit(rate=1, burst=1)}, clock=clock)
+    assert [buckets.take("alice", "reads") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("alice", "reads") == 0.5
+    #other callers and other route classes have their own buckets
+    assert buckets.take("bob", "reads") == 0
+    assert buckets.take("alice", "writes") == 0
+    assert buckets.take("alice", "writes") == 1.0
+
+    clock.now = 0.5
+    assert buckets.take("alice", "reads") == 0
+    assert buckets.take("alice", "reads") == 0.5
+
+def test_idle_buckets_are_dropped_once_they_would_be_full():
+    clock = Clock()
+    buckets = TokenBuckets({"reads": Limit(rate=1, burst=10)}, idle=1, clock=clock)
+    assert buckets.idle == 10
+    for identity in ("alice", "bob"):
+        buckets.take(identity, "reads")
+    clock.now = 5
+    buckets.take("carol", "reads")
+    assert len(buckets) == 3
+    clock.now = 12
+    buckets.take("carol", "reads")
+    assert len(buckets) == 1
+
+def test_table_is_capped_at_capacity():
+    buckets = TokenBuckets({"reads": Limit(rate=1, burst=1)}, capacity=2, clock=Clock())
+    for identity in ("alice", "bob", "carol"):
+        buckets.take(identity, "reads")
+    assert len(buckets) == 2
+    #alice was dropped, so she starts over with a full bucket
+    assert buckets.take("alice", "reads") == 0
+    assert buckets.take("carol", "reads") == 1.0
+
+def test_settings_refuse_rates_that_cannot_refill():
+    import pytest
+    from pydantic import ValidationError
+    from app.core.config import Settings
+    for bad in ({"rate_limit_reads": 0}, {"rate_limit_writes": -1}, {"rate_limit_admin_burst": 0}, {"rate_limit_buckets": 0}):
+        with pytest.raises(ValidationError, match=next(iter(bad))):
+            Settings(**bad)
+    assert Settings(rate_limit_reads=0.5, rate_limit_reads_burst=1).rate_limit_reads == 0.5
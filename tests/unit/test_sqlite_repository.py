@@ -0,0 +1,280 @@
+from app.repositories.sqlite_repository import (
+    SqliteChanges,
+    SqliteCourseStore,
+    SqliteDatabase,
+    SqliteEnrollmentStore,
+    SqliteUserStore,
+    SqliteWaitlistStore,
+)
+from app.schemas.user_schema import UserResponse
+from app.schemas.course_schema import CourseResponse
+from app.schemas.enrollment_schema import EnrollmentResponse
+from datetime import datetime, timezone
+from uuid import uuid4
+import pytest
+
+
+@pytest.fixture
+def database(tmp_path):
+    db = SqliteDatabase(str(tmp_path / "enrollment.db"))
+    yield db
+    db.close()
+
+def make_user(email="john@gmail.com"):
+    return UserResponse(id=uuid4(), name="john", email=email, role="student", created_at=datetime.now(timezone.utc)) # type: ignore
+
+def add_parents(database, rows):
+    #the database refuses enrollments whose user or course doesn't exist
+    users, courses = SqliteUserStore(database), SqliteCourseStore(database)
+    for row in rows:
+        if row.user_id not in users:
+            users[row.user_id] = make_user(f"{row.user_id.hex}@gmail.com").model_copy(update={"id": row.user_id})
+        if row.course_id not in courses:
+            courses[row.course_id] = CourseResponse(
+                id=row.course_id, code=f"PAR{len(courses):03d}", title="course", created_at=datetime.now(timezone.utc)
+            )
+
+def test_database_uses_wal(database):
+    mode = database.connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+def test_user_round_trip_and_email_index(database):
+    users = SqliteUserStore(database)
+    user = make_user()
+    users[user.id] = user
+
+    assert users[user.id] == user
+    assert user.id in users
+    assert users.get_by_email("JOHN@gmail.com") == user
+    with pytest.raises(ValueError) as exc:
+        duplicate = make_user("John@Gmail.com")
+        users[duplicate.id] = duplicate
+    assert str(exc.value) == "A user with this email already exist"
+
+    del users[user.id]
+    assert users.get(user.id) is None
+    assert users.owner_of("john@gmail.com") is None
+
+def test_course_upsert_keeps_order(database):
+    courses = SqliteCourseStore(database)
+    first = CourseResponse(id=uuid4(), code="CSC101", title="intro", created_at=datetime.now(timezone.utc))
+    second = CourseResponse(id=uuid4(), code="CSC102", title="next", created_at=datetime.now(timezone.utc))
+    courses[first.id] = first
+    courses[second.id] = second
+
+    first.title = "renamed"
+    courses[first.id] = first
+    assert [c.id for c in courses.values()] == [first.id, second.id]
+    assert courses.get_by_code("csc101").title == "renamed"
+    assert len(courses) == 2
+
+def test_enrollment_indexes(database):
+    enrollments = SqliteEnrollmentStore(database)
+    user_id, course_id = uuid4(), uuid4()
+    enrollment = EnrollmentResponse(id=uuid4(), user_id=user_id, course_id=course_id, enrolled_on=datetime.now(timezone.utc))
+    add_parents(database, [enrollment])
+    enrollments[enrollment.id] = enrollment
+
+    assert enrollments.find(user_id, course_id) == enrollment
+    assert enrollments.for_user(user_id) == [enrollment]
+    assert enrollments.for_course(course_id) == [enrollment]
+    with pytest.raises(ValueError):
+        duplicate = EnrollmentResponse(id=uuid4(), user_id=user_id, course_id=course_id, enrolled_on=datetime.now(timezone.utc))
+        enrollments[duplicate.id] = duplicate
+
+def test_seat_counts_and_capacity_are_kept_by_the_database(database):
+    courses, enrollments = SqliteCourseStore(database), SqliteEnrollmentStore(database)
+    now = datetime.now(timezone.utc)
+    course = CourseResponse(id=uuid4(), code="CSC500", title="Software Engineering", capacity=2, created_at=now)
+    courses[course.id] = course
+    rows = [EnrollmentResponse(id=uuid4(), user_id=uuid4(), course_id=course.id, enrolled_on=now) for _ in range(3)]
+    add_parents(database, rows)
+
+    enrollments.put_many(rows[:2])
+    assert courses[course.id].capacity == 2
+    assert enrollments.seats_taken(course.id) == 2
+    #even without the services' locks, a full course takes no one else
+    with pytest.raises(ValueError, match="Course is full"):
+        enrollments[rows[2].id] = rows[2]
+    enrollments[rows[0].id] = rows[0]
+    del enrollments[rows[0].id]
+    enrollments[rows[2].id] = rows[2]
+    assert enrollments.seats_taken(course.id) == 2
+    assert enrollments.delete_for_course(course.id) == 2
+    assert enrollments.seats_taken(course.id) == 0
+
+def test_migration_adds_capacity_and_counts_existing_seats(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE courses (seq INTEGER PRIMARY KEY AUTOINCREMENT, id BLOB NOT NULL UNIQUE, code TEXT NOT NULL,
+            code_key TEXT NOT NULL UNIQUE, title TEXT NOT NULL, created_at TEXT NOT NULL, updated_at TEXT);
+        CREATE TABLE enrollments (seq INTEGER PRIMARY KEY AUTOINCREMENT, id BLOB NOT NULL UNIQUE, user_id BLOB NOT NULL,
+            course_id BLOB NOT NULL, enrolled_on TEXT NOT NULL, UNIQUE (user_id, course_id));
+    """)
+    course_id = uuid4()
+    conn.execute("INSERT INTO courses (id, code, code_key, title, created_at) VALUES (?, 'CSC500', 'csc500', 'se', ?)",
+                 (course_id.bytes, datetime.now(timezone.utc).isoformat()))
+    for _ in range(3):
+        conn.execute("INSERT INTO enrollments (id, user_id, course_id, enrolled_on) VALUES (?, ?, ?, ?)",
+                     (uuid4().bytes, uuid4().bytes, course_id.bytes, datetime.now(timezone.utc).isoformat()))
+    conn.commit()
+    conn.close()
+
+    db = SqliteDatabase(path)
+    assert SqliteCourseStore(db)[course_id].capacity is None
+    assert SqliteEnrollmentStore(db).seats_taken(course_id) == 3
+    db.close()
+    #opening again finds nothing left to migrate
+    db = SqliteDatabase(path)
+    assert SqliteEnrollmentStore(db).seats_taken(course_id) == 3
+    db.close()
+
+def test_course_etags_move_with_writes_from_another_worker(tmp_path):
+    from app.core.versioning import StoredVersions
+    path = str(tmp_path / "shared.db")
+    worker_a, worker_b = SqliteDatabase(path), SqliteDatabase(path)
+    courses_a, versions_b = SqliteCourseStore(worker_a), StoredVersions(SqliteCourseStore(worker_b))
+    course = CourseResponse(id=uuid4(), code="CSC500", title="se", created_at=datetime.now(timezone.utc))
+    courses_a[course.id] = course
+    served, catalog = versions_b.entity_etag(course.id), versions_b.collection_etag()
+    assert StoredVersions(courses_a).entity_etag(course.id) == served
+
+    #worker A renames the course; worker B's ETags have moved on
+    courses_a[course.id] = course.model_copy(update={"title": "software engineering"})
+    assert versions_b.entity_etag(course.id) != served
+    assert versions_b.collection_etag() != catalog
+    served = versions_b.entity_etag(course.id)
+    del courses_a[course.id]
+    assert versions_b.entity_etag(course.id) != served
+    assert versions_b.entity_etag(uuid4()).endswith('-0"')
+    worker_a.close()
+    worker_b.close()
+
+def test_change_feed_covers_writes_from_another_worker(tmp_path):
+    from app.core.changes import StoredChangeLog
+    worker_a = SqliteDatabase(str(tmp_path / "enrollment.db"))
+    worker_b = SqliteDatabase(str(tmp_path / "enrollment.db"))
+    log_a = StoredChangeLog(SqliteChanges(worker_a, capacity=3))
+    users_b = SqliteUserStore(worker_b)
+
+    user = make_user()
+    users_b[user.id] = user
+    users_b[user.id] = user.model_copy(update={"name": "johnny"})
+    del users_b[user.id]
+    assert [(e.seq, e.entity, e.id, e.op) for e in log_a.since(0, 10)] == [
+        (1, "user", user.id, "created"), (2, "user", user.id, "updated"), (3, "user", user.id, "deleted"),
+    ]
+    assert log_a.since(1, 1)[0].seq == 2
+    assert log_a.since(3, 10) == []
+    assert log_a.since(4, 10) is None
+
+    #only the newest 3 are kept: a client at 0 missed one
+    users_b[uuid4()] = make_user("jane@gmail.com")
+    assert len(log_a) == 3
+    assert log_a.since(0, 10) is None
+    assert [e.seq for e in log_a.since(1, 10)] == [2, 3, 4]
+    worker_a.close()
+    worker_b.close()
+
+    #the log and its epoch outlive the workers
+    reopened = SqliteDatabase(str(tmp_path / "enrollment.db"))
+    log = StoredChangeLog(SqliteChanges(reopened, capacity=3))
+    assert log.epoch == log_a.epoch
+    assert log.latest() == 4
+    reopened.close()
+
+def test_waitlists_are_shared_by_workers(tmp_path):
+    worker_a = SqliteDatabase(str(tmp_path / "enrollment.db"))
+    worker_b = SqliteDatabase(str(tmp_path / "enrollment.db"))
+    queue_a, queue_b = SqliteWaitlistStore(worker_a), SqliteWaitlistStore(worker_b)
+    course_id = uuid4()
+    users = [uuid4() for _ in range(3)]
+
+    assert [queue_a.join(course_id, user_id) for user_id in users] == [1, 2, 3]
+    with pytest.raises(ValueError):
+        queue_b.join(course_id, users[0])
+    assert queue_b.waiting(course_id) == 3
+    assert queue_b.leave(course_id, users[0])
+    assert not queue_a.leave(course_id, users[0])
+    assert queue_a.head(course_id) == users[1]
+    assert [queue_a.position(course_id, user_id) for user_id in users] == [None, 1, 2]
+    queue_b.drop_course(course_id)
+    assert queue_a.head(course_id) is None and queue_a.waiting(course_id) == 0
+    worker_a.close()
+    worker_b.close()
+
+def test_enrollment_bulk_deletes(database):
+    enrollments = SqliteEnrollmentStore(database)
+    user_id, course_id = uuid4(), uuid4()
+    now = datetime.now(timezone.utc)
+    rows = [
+        EnrollmentResponse(id=uuid4(), user_id=user_id, course_id=uuid4(), enrolled_on=now),
+        EnrollmentResponse(id=uuid4(), user_id=user_id, course_id=course_id, enrolled_on=now),
+        EnrollmentResponse(id=uuid4(), user_id=uuid4(), course_id=course_id, enrolled_on=now),
+    ]
+    add_parents(database, rows)
+    for enrollment in rows:
+        enrollments[enrollment.id] = enrollment
+
+    assert enrollments.delete_for_user(user_id) == 2
+    assert enrollments.delete_for_course(course_id) == 1
+    assert len(enrollments) == 0
+
+def test_enrollments_need_their_user_and_course(database):
+    users, enrollments = SqliteUserStore(database), SqliteEnrollmentStore(database)
+    enrollment = EnrollmentResponse(id=uuid4(), user_id=uuid4(), course_id=uuid4(), enrolled_on=datetime.now(timezone.utc))
+    add_parents(database, [enrollment])
+    #another worker deletes the user between an enroll's check and its insert
+    users.delete_with_enrollments(enrollment.user_id, enrollments)
+    with pytest.raises(ValueError, match="User does not exist"):
+        enrollments[enrollment.id] = enrollment
+    assert len(enrollments) == 0
+
+def test_pages_follow_seq(database):
+    users = SqliteUserStore(database)
+    enrollments = SqliteEnrollmentStore(database)
+    created = [make_user(f"user{i}@gmail.com") for i in range(3)]
+    for user in created:
+        users[user.id] = user
+    course_id = uuid4()
+    rows = [EnrollmentResponse(id=uuid4(), user_id=user.id, course_id=course_id, enrolled_on=datetime.now(timezone.utc)) for user in created]
+    add_parents(database, rows)
+    for enrollment in rows:
+        enrollments[enrollment.id] = enrollment
+
+    page, position = users.page(None, 2)
+    assert page == created[:2]
+    assert users.page(position, 2) == (created[2:], None)
+    page, position = enrollments.page_for_course(course_id, None, 1)
+    assert page == rows[:1]
+    assert enrollments.page_for_course(course_id, position, 5) == (rows[1:], None)
+    plan = database.connection().execute(
+        "EXPLAIN QUERY PLAN SELECT seq FROM enrollments WHERE seq > 0 AND course_id = ? ORDER BY seq LIMIT 2",
+        (course_id.bytes,),
+    ).fetchall()
+    assert "enrollments_course_idx" in str(plan)
+
+def test_get_many_chunks_and_skips_unknown(database):
+    users = SqliteUserStore(database)
+    created = [make_user(f"user{i}@gmail.com") for i in range(1200)]
+    users.put_many(created)
+    unknown = uuid4()
+
+    found = users.get_many([user.id for user in created] + [unknown])
+    assert len(found) == 1200
+    assert found[created[999].id] == created[999]
+    assert unknown not in found
+    assert users.get_many([]) == {}
+
+def test_data_survives_reopen(tmp_path):
+    path = str(tmp_path / "enrollment.db")
+    db = SqliteDatabase(path)
+    user = make_user()
+    SqliteUserStore(db)[user.id] = user
+    db.close()
+
+    reopened = SqliteDatabase(path)
+    assert SqliteUserStore(reopened)[user.id] == user
+    reopened.close()
@@ -90,4 +90,111 @@ def test_delete_user_not_found():
     non_existent_id = uuid4() 
     with pytest.raises(ValueError) as exc: 
         UserService.delete_user(non_existent_id) 
-    assert str(exc.value) == "User not found."
\ No newline at end of file
+    assert str(exc.value) == "User not found."
+def test_create_user_duplicate_email_case_insensitive():
+    UserService.create_user(
+        UserCreate(name="John Doe", email="john@gmail.com", role="student")
+    )
+    with pytest.raises(ValueError) as exc:
+        UserService.create_user(
+            UserCreate(name="Johnny", email="JOHN@gmail.com", role="student")
+        )
+    assert str(exc.value) == "A user with this email already exist"
+
+def test_update_user_email_taken():
+    user1 = UserService.create_user(
+        UserCreate(name="John Doe", email="john@gmail.com", role="student")
+    )
+    user2 = UserService.create_user(
+        UserCreate(name="Jane Smith", email="jane@gmail.com", role="student")
+    )
+    with pytest.raises(ValueError):
+        UserService.update_user(user2.id, UserUpdate(email="john@gmail.com"))
+    assert users_db[user2.id].email == "jane@gmail.com"
+
+    UserService.update_user(user1.id, UserUpdate(email="johnny@gmail.com"))
+    assert UserService.get_user_by_email("JOHNNY@gmail.com").id == user1.id
+    with pytest.raises(ValueError):
+        UserService.get_user_by_email("john@gmail.com")
+
+def test_delete_user_frees_email():
+    user = UserService.create_user(
+        UserCreate(name="John Doe", email="john@gmail.com", role="student")
+    )
+    UserService.delete_user(user.id)
+    recreated = UserService.create_user(
+        UserCreate(name="John Doe", email="john@gmail.com", role="student")
+    )
+    assert recreated.id != user.id
+
+def test_users_page_walks_in_insertion_order():
+    created = [UserService.create_user(UserCreate(name=f"user{i}", email=f"user{i}@gmail.com", role="student")) for i in range(5)]
+    UserService.delete_user(created[1].id)
+    UserService.update_user(created[0].id, UserUpdate(name="renamed"))
+
+    first = UserService.get_users_page(2)
+    second = UserService.get_users_page(2, first.next_cursor)
+    assert [u.id for u in first.items] == [created[0].id, created[2].id]
+    assert first.items[0].name == "renamed"
+    assert [u.id for u in second.items] == [created[3].id, created[4].id]
+    assert second.next_cursor is None
+    with pytest.raises(ValueError):
+        UserService.get_users_page(2, "not-a-cursor")
+
+def test_import_users_atomic_stores_all_or_nothing():
+    UserService.create_user(UserCreate(name="Taken", email="taken@gmail.com", role="student"))
+    rows = [
+        {"name": "Ada", "email": "ada@gmail.com", "role": "student"},
+        {"name": "Bob", "email": "TAKEN@gmail.com", "role": "student"},
+        {"name": "Cy", "email": "ada@gmail.com", "role": "admin"},
+        {"name": "Dee", "email": "not-an-email", "role": "student"},
+    ]
+    summary = UserService.import_users(rows, batch_size=2)
+    assert (summary.received, summary.created, summary.failed, summary.committed) == (4, 0, 4, False)
+    assert [error.row for error in summary.errors] == [2, 3, 4]
+    assert len(users_db) == 1
+
+    summary = UserService.import_users([rows[0], rows[3] | {"email": "dee@gmail.com"}])
+    assert (summary.created, summary.committed, summary.errors) == (2, True, [])
+    assert users_db.get_by_email("dee@gmail.com").name == "dee"
+
+def test_import_users_per_row_keeps_valid_rows():
+    rows = [{"name": f"User {i}", "email": f"user{i}@gmail.com", "role": "student"} for i in range(5)]
+    rows[3] = {"name": "Dup", "email": "user1@gmail.com", "role": "student"}
+    summary = UserService.import_users(rows + [ValueError("Row is not valid JSON")], atomic=False, batch_size=2)
+    assert (summary.received, summary.created, summary.failed, summary.committed) == (6, 4, 2, True)
+    assert [(error.row, error.detail) for error in summary.errors] == [
+        (4, "A user with this email already exist"), (6, "Row is not valid JSON")
+    ]
+    assert len(users_db) == 4
+
+@pytest.mark.parametrize("email", [
+    "A.B+c@Gmail.COM", " x@y.org ", "a..b@gmail.com", ".a@gmail.com", "a@localhost", "a@-bad.com",
+    "John <j@gmail.com>", "ü@gmail.com", "a@xn--bcher-kva.de", "a@gmail..com", "a@[1.2.3.4]",
+])
+def test_import_rows_accept_the_same_emails_as_user_create(email):
+    from app.schemas.user_schema import UserImportRow
+    def checked(model):
+        try:
+            return model(name="n", email=email, role="student").email
+        except ValueError:
+            return None
+    assert checked(UserImportRow) == checked(UserCreate)
+
+def test_put_many_is_all_or_nothing():
+    now = datetime.now(timezone.utc)
+    existing = UserResponse(id=uuid4(), name="old", email="old@gmail.com", role="student", created_at=now)
+    users_db[existing.id] = existing
+    renamed = existing.model_copy(update={"name": "new"})
+    fresh = UserResponse(id=uuid4(), name="fresh", email="fresh@gmail.com", role="student", created_at=now)
+    clash = UserResponse(id=uuid4(), name="clash", email="OLD@gmail.com", role="student", created_at=now)
+
+    with pytest.raises(ValueError):
+        users_db.put_many([renamed, fresh, clash])
+    assert users_db[existing.id].name == "old"
+    assert fresh.id not in users_db
+    assert len(users_db) == 1
+
+    users_db.put_many([renamed, fresh])
+    assert users_db[existing.id].name == "new"
+    assert users_db.get_by_email("fresh@gmail.com") == fresh
@@ -0,0 +1,40 @@
+import random
+from uuid import uuid4
+from app.core.waitlists import Waitlists
+import pytest
+
+
+def test_waitlist_is_first_in_first_out():
+    waitlists = Waitlists()
+    course_id = uuid4()
+    users = [uuid4() for _ in range(3)]
+    assert [waitlists.join(course_id, user_id) for user_id in users] == [1, 2, 3]
+    with pytest.raises(ValueError, match="already on the waitlist"):
+        waitlists.join(course_id, users[0])
+
+    #leaving from the middle moves everyone behind up
+    assert waitlists.leave(course_id, users[1])
+    assert not waitlists.leave(course_id, users[1])
+    assert [waitlists.position(course_id, user_id) for user_id in users] == [1, None, 2]
+    assert waitlists.head(course_id) == users[0]
+    waitlists.leave(course_id, users[0])
+    assert waitlists.head(course_id) == users[2]
+    assert waitlists.waiting(course_id) == 1
+    waitlists.leave(course_id, users[2])
+    assert waitlists.head(course_id) is None and waitlists.waiting(course_id) == 0
+
+def test_positions_match_a_list_through_renumbering():
+    waitlists = Waitlists()
+    course_id = uuid4()
+    rng = random.Random(7)
+    model = []
+    for _ in range(3000):
+        if model and rng.random() < 0.45:
+            user_id = model.pop(0) if rng.random() < 0.5 else model.pop(rng.randrange(len(model)))
+            assert waitlists.leave(course_id, user_id)
+        else:
+            user_id = uuid4()
+            model.append(user_id)
+            assert waitlists.join(course_id, user_id) == len(model)
+        assert waitlists.head(course_id) == (model[0] if model else None)
+    assert [waitlists.position(course_id, user_id) for user_id in model] == list(range(1, len(model) + 1))